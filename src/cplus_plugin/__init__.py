@@ -22,6 +22,7 @@
 """
 import os
 import sys
+import time
 
 LIB_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "lib"))
 if LIB_DIR not in sys.path:
@@ -35,6 +36,7 @@ def classFactory(iface):  # pylint: disable=invalid-name
     :type iface: QgsInterface
     """
     #
+    load_start = time.perf_counter()
     from .main import QgisCplus
 
-    return QgisCplus(iface)
+    return QgisCplus(iface, load_start=load_start)
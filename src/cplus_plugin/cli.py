@@ -0,0 +1,697 @@
+# -*- coding: utf-8 -*-
+"""
+Command line interface for running scenario analyses without the
+plugin user interface e.g. on headless servers:
+
+    python -m cplus_plugin.cli run scenario.json
+
+    python -m cplus_plugin.cli sweep scenario.json grid.json
+
+The scenario file defines the scenario name, extent and implementation
+models. Models are either the UUIDs of the models in the plugin settings
+or complete model definitions. The grid file of a sweep has the lists
+of carbon coefficient, suitability index and priority group values whose
+combinations are analyzed. Progress, log messages and timings are
+written to the standard output as JSON lines.
+"""
+import argparse
+import dataclasses
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import typing
+import uuid
+
+from qgis.PyQt import QtCore
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsFeedback,
+    QgsUserProfileManager,
+)
+
+from .conf import settings_manager, Settings
+from .definitions.constants import (
+    PATHWAYS_ATTRIBUTE,
+    PRIORITY_LAYERS_SEGMENT,
+    UUID_ATTRIBUTE,
+)
+from .lib.analysis.engine import create_analysis_context, ScenarioAnalysisEngine
+from .lib.analysis.sweep import parameter_combinations, ScenarioSweep
+from .models.analysis import PriorityWeight
+from .models.base import ImplementationModel, Scenario, SpatialExtent
+from .models.helpers import create_implementation_model, create_ncs_pathway
+from .utils import FileUtils
+
+# Name of the QGIS profile whose settings are used by default
+DEFAULT_PROFILE_NAME = "default"
+
+
+class ScenarioConfigError(Exception):
+    """Raised when the scenario configuration is invalid."""
+
+
+class JsonLinesReporter:
+    """Writes the analysis events to a stream as JSON lines, each event
+    includes the time elapsed since the reporter was created.
+    """
+
+    def __init__(self, stream: typing.TextIO = None):
+        self._stream = stream or sys.stdout
+        self._start = time.perf_counter()
+        self._lock = threading.RLock()
+        self._progress = None
+
+    @property
+    def elapsed(self) -> float:
+        """Returns the time elapsed since the reporter was created.
+
+        :returns: Elapsed time in seconds.
+        :rtype: float
+        """
+        return time.perf_counter() - self._start
+
+    def emit(self, event: str, **values):
+        """Writes an event to the stream.
+
+        :param event: Name of the event.
+        :type event: str
+
+        :param values: JSON serializable values of the event.
+        :type values: dict
+        """
+        record = {"event": event, "elapsed": round(self.elapsed, 3)}
+        record.update(values)
+        with self._lock:
+            self._stream.write(f"{json.dumps(record, default=str)}\n")
+            self._stream.flush()
+
+    def progress(self, value: float):
+        """Writes a progress event once the progress changes by a
+        whole percent.
+
+        :param value: Progress percentage.
+        :type value: float
+        """
+        percent = int(value)
+        with self._lock:
+            if percent == self._progress:
+                return
+            self._progress = percent
+            self.emit("progress", progress=percent)
+
+    def message(self, message: str, tag: str, level: Qgis.MessageLevel):
+        """Writes the QGIS log messages of the plugin as log events.
+
+        :param message: Log message.
+        :type message: str
+
+        :param tag: Log message tag.
+        :type tag: str
+
+        :param level: Log message level.
+        :type level: Qgis.MessageLevel
+        """
+        if tag != "qgis_cplus":
+            return
+        level_name = "info" if level == Qgis.Info else "warning"
+        self.emit("log", level=level_name, message=message)
+
+
+def load_scenario_config(path: str) -> typing.Dict:
+    """Loads the scenario configuration from a JSON file.
+
+    :param path: Path of the scenario file.
+    :type path: str
+
+    :returns: Scenario configuration.
+    :rtype: dict
+    """
+    try:
+        with open(path) as config_file:
+            config = json.load(config_file)
+    except (OSError, ValueError) as ex:
+        raise ScenarioConfigError(f"Unable to read scenario file {path}, {ex}")
+
+    if not isinstance(config, dict):
+        raise ScenarioConfigError(f"Scenario file {path} must contain an object")
+
+    return config
+
+
+def _config_model(model_config: typing.Union[str, dict]) -> ImplementationModel:
+    """Creates an implementation model from its UUID in the plugin
+    settings or its definition in the scenario configuration.
+
+    :param model_config: UUID or definition of the model.
+    :type model_config: str, dict
+
+    :returns: Implementation model.
+    :rtype: ImplementationModel
+    """
+    if isinstance(model_config, str):
+        model = settings_manager.get_implementation_model(model_config)
+        if model is None:
+            raise ScenarioConfigError(
+                f"Implementation model {model_config} not found in the settings"
+            )
+        return model
+
+    if not isinstance(model_config, dict) or UUID_ATTRIBUTE not in model_config:
+        raise ScenarioConfigError(f"Invalid implementation model {model_config}")
+
+    model_dict = dict(model_config)
+    model_dict.setdefault("name", model_dict[UUID_ATTRIBUTE])
+    model_dict.setdefault("description", "")
+    pathway_configs = model_dict.pop(PATHWAYS_ATTRIBUTE, [])
+    try:
+        model = create_implementation_model(model_dict)
+    except (TypeError, ValueError) as ex:
+        raise ScenarioConfigError(f"Invalid implementation model {model_config}, {ex}")
+    for pathway_config in pathway_configs:
+        if isinstance(pathway_config, str):
+            pathway = settings_manager.get_ncs_pathway(pathway_config)
+        else:
+            pathway_dict = dict(pathway_config)
+            pathway_dict.setdefault("name", pathway_dict.get(UUID_ATTRIBUTE))
+            pathway_dict.setdefault("description", "")
+            try:
+                pathway = create_ncs_pathway(pathway_dict)
+            except (TypeError, ValueError) as ex:
+                raise ScenarioConfigError(f"Invalid NCS pathway {pathway_config}, {ex}")
+        if pathway is None:
+            raise ScenarioConfigError(
+                f"NCS pathway {pathway_config} of the implementation model "
+                f"{model.name} not found"
+            )
+        if not model.add_ncs_pathway(pathway):
+            raise ScenarioConfigError(
+                f"NCS pathway {pathway.name} of the implementation model "
+                f"{model.name} is invalid or duplicated"
+            )
+
+    return model
+
+
+def _priority_layer_groups(
+    group_values: typing.Dict[str, float]
+) -> typing.List[typing.Dict]:
+    """Returns the priority groups in the settings and their layers with
+    the values in the scenario configuration taking precedence.
+
+    :param group_values: Coefficients indexed by priority group name.
+    :type group_values: dict
+
+    :returns: Priority groups in the format used by the scenario.
+    :rtype: list
+    """
+    if not isinstance(group_values, dict):
+        raise ScenarioConfigError(
+            f"The priority groups must map group names to values, "
+            f"not {group_values}"
+        )
+    try:
+        group_values = {name: float(value) for name, value in group_values.items()}
+    except (TypeError, ValueError) as ex:
+        raise ScenarioConfigError(f"Invalid priority group values, {ex}")
+
+    groups = []
+    for group in settings_manager.get_priority_groups():
+        name = group.get("name")
+        groups.append(
+            {
+                "name": name,
+                "value": group_values.get(name, group.get("value")),
+                "layers": [
+                    layer.get("name")
+                    for layer in settings_manager.find_layers_by_group(name)
+                ],
+            }
+        )
+
+    # Groups that are only defined in the configuration
+    names = [group["name"] for group in groups]
+    for name, value in group_values.items():
+        if name not in names:
+            groups.append({"name": name, "value": value, "layers": []})
+
+    return groups
+
+
+def _config_priority_weights(
+    model_config: dict, group_values: typing.Dict[str, float]
+) -> typing.List[PriorityWeight]:
+    """Resolves the priority weights of an implementation model defined
+    in the scenario configuration. Each priority layer has a path and the
+    groups it belongs to.
+
+    :param model_config: Definition of the model.
+    :type model_config: dict
+
+    :param group_values: Coefficients indexed by priority group name.
+    :type group_values: dict
+
+    :returns: Priority weights whose coefficients are greater than zero.
+    :rtype: list
+    """
+    weights = []
+    for layer in model_config.get(PRIORITY_LAYERS_SEGMENT, []):
+        path = layer.get("path")
+        if not path or not os.path.exists(path):
+            raise ScenarioConfigError(f"Priority weighting layer {path} not found")
+        for group in layer.get("groups", []):
+            value = group_values.get(group.get("name"), group.get("value", 0))
+            try:
+                coefficient = float(value)
+            except (TypeError, ValueError) as ex:
+                raise ScenarioConfigError(
+                    f"Invalid value {value} of the priority group "
+                    f"{group.get('name')}, {ex}"
+                )
+            if coefficient > 0:
+                weights.append(PriorityWeight(path, coefficient))
+
+    return weights
+
+
+def create_config_scenario(config: typing.Dict) -> Scenario:
+    """Creates the scenario defined in the configuration, all the
+    implementation models in the settings are used if the configuration
+    does not list any.
+
+    :param config: Scenario configuration.
+    :type config: dict
+
+    :returns: Scenario to be analyzed.
+    :rtype: Scenario
+    """
+    extent = config.get("extent")
+    if not isinstance(extent, list) or len(extent) != 4:
+        raise ScenarioConfigError(
+            "The scenario extent must be a list of xmin, xmax, ymin and ymax"
+        )
+
+    model_configs = config.get("implementation_models")
+    if model_configs is None:
+        models = settings_manager.get_all_implementation_models()
+    else:
+        models = [_config_model(model_config) for model_config in model_configs]
+    if not models:
+        raise ScenarioConfigError("The scenario has no implementation models")
+
+    for model in models:
+        if not model.pathways and not model.path:
+            raise ScenarioConfigError(
+                f"No defined model pathways or a model layer "
+                f"for the model {model.name}"
+            )
+
+    try:
+        bbox = [float(value) for value in extent]
+    except (TypeError, ValueError) as ex:
+        raise ScenarioConfigError(f"Invalid scenario extent {extent}, {ex}")
+
+    return Scenario(
+        uuid=uuid.uuid4(),
+        name=config.get("name", "Scenario"),
+        description=config.get("description", ""),
+        extent=SpatialExtent(bbox=bbox),
+        models=models,
+        priority_layer_groups=_priority_layer_groups(config.get("priority_groups", {})),
+    )
+
+
+def scenario_output_directory(config: typing.Dict, prefix: str = "scenario") -> str:
+    """Returns the directory where the scenario outputs will be saved,
+    a new directory is created in the base directory if the configuration
+    does not specify one.
+
+    :param config: Scenario configuration.
+    :type config: dict
+
+    :param prefix: Prefix of the name of the new directory.
+    :type prefix: str
+
+    :returns: Scenario directory.
+    :rtype: str
+    """
+    directory = config.get("output_directory")
+    if not directory:
+        base_dir = settings_manager.get_value(Settings.BASE_DIR)
+        if not base_dir:
+            raise ScenarioConfigError(
+                "The scenario output directory is not defined and "
+                "the plugin base data directory is not set"
+            )
+        directory = (
+            f"{base_dir}/"
+            f'{prefix}_{datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")}'
+        )
+    FileUtils.create_new_dir(directory)
+
+    return directory
+
+
+def create_config_context(
+    config: typing.Dict,
+    scenario: Scenario,
+    scenario_directory: str,
+    feedback: QgsFeedback = None,
+):
+    """Creates the analysis context using the plugin settings and
+    the values in the scenario configuration.
+
+    :param config: Scenario configuration.
+    :type config: dict
+
+    :param scenario: Scenario to be analyzed.
+    :type scenario: Scenario
+
+    :param scenario_directory: Directory where the outputs will be saved.
+    :type scenario_directory: str
+
+    :param feedback: Feedback for progress and cancelling the analysis.
+    :type feedback: QgsFeedback
+
+    :returns: Analysis context.
+    :rtype: AnalysisContext
+    """
+    ordered_model_ids = [
+        str(model.uuid)
+        for model in settings_manager.get_implementation_models_snapshot().items
+    ]
+    context = create_analysis_context(
+        scenario,
+        scenario_directory,
+        ordered_model_ids,
+        feedback,
+    )
+
+    overrides = {}
+    try:
+        if "carbon_coefficient" in config:
+            overrides["carbon_coefficient"] = float(config["carbon_coefficient"])
+        if "suitability_index" in config:
+            overrides["suitability_index"] = float(config["suitability_index"])
+        if "memory_budget_mb" in config:
+            overrides["memory_budget"] = int(config["memory_budget_mb"]) * 1024 * 1024
+    except (TypeError, ValueError) as ex:
+        raise ScenarioConfigError(f"Invalid analysis parameters, {ex}")
+
+    group_values = config.get("priority_groups", {})
+    priority_weights = dict(context.priority_weights)
+    for model_config in config.get("implementation_models") or []:
+        if isinstance(model_config, dict):
+            priority_weights[
+                str(model_config[UUID_ATTRIBUTE])
+            ] = _config_priority_weights(model_config, group_values)
+    overrides["priority_weights"] = priority_weights
+
+    return dataclasses.replace(context, **overrides)
+
+
+def run_scenario(config: typing.Dict, reporter: JsonLinesReporter) -> bool:
+    """Runs the analysis of the scenario in the configuration.
+
+    :param config: Scenario configuration.
+    :type config: dict
+
+    :param reporter: Reporter of the analysis events.
+    :type reporter: JsonLinesReporter
+
+    :returns: True if the analysis completed successfully else False.
+    :rtype: bool
+    """
+    timings = {}
+    cpu_start = time.process_time()
+
+    stage_start = time.perf_counter()
+    scenario = create_config_scenario(config)
+    scenario_directory = scenario_output_directory(config)
+    feedback = QgsFeedback()
+    # Progress is reported from the analysis worker threads
+    feedback.progressChanged.connect(reporter.progress, type=QtCore.Qt.DirectConnection)
+    context = create_config_context(config, scenario, scenario_directory, feedback)
+    timings["setup"] = time.perf_counter() - stage_start
+
+    reporter.emit(
+        "started",
+        scenario=scenario.name,
+        scenario_directory=scenario_directory,
+        implementation_models=[model.name for model in scenario.models],
+    )
+
+    stage_start = time.perf_counter()
+    engine = ScenarioAnalysisEngine(context)
+    success = engine.run()
+    timings["analysis"] = time.perf_counter() - stage_start
+
+    reporter.emit(
+        "finished",
+        success=success,
+        output=(engine.output or {}).get("OUTPUT"),
+        implementation_models={model.name: model.path for model in scenario.models},
+        timings={name: round(value, 3) for name, value in timings.items()},
+        stage_timings={
+            name: round(value, 3) for name, value in engine.stage_timings().items()
+        },
+        cpu_time=round(time.process_time() - cpu_start, 3),
+        manifest=engine.manifest_path,
+    )
+
+    return success
+
+
+def combination_config(
+    config: typing.Dict, parameters: typing.Dict[str, typing.Any]
+) -> typing.Dict:
+    """Returns the scenario configuration with the values of a
+    sweep combination.
+
+    :param config: Scenario configuration.
+    :type config: dict
+
+    :param parameters: Parameters of the combination.
+    :type parameters: dict
+
+    :returns: Scenario configuration of the combination.
+    :rtype: dict
+    """
+    combination = dict(config)
+    for name, value in parameters.items():
+        if name != "priority_groups":
+            combination[name] = value
+    combination["priority_groups"] = dict(
+        config.get("priority_groups", {}), **parameters.get("priority_groups", {})
+    )
+
+    return combination
+
+
+def run_sweep(
+    config: typing.Dict,
+    grid: typing.Dict,
+    reporter: JsonLinesReporter,
+    max_parallel: int = None,
+) -> bool:
+    """Runs the analysis of the scenario in the configuration for each
+    combination of the parameter grid.
+
+    :param config: Scenario configuration.
+    :type config: dict
+
+    :param grid: Lists of values of the carbon coefficient, suitability
+    index and priority groups.
+    :type grid: dict
+
+    :param reporter: Reporter of the sweep events.
+    :type reporter: JsonLinesReporter
+
+    :param max_parallel: Maximum number of combinations analyzed at
+    the same time.
+    :type max_parallel: int
+
+    :returns: True if all the combinations were analyzed successfully.
+    :rtype: bool
+    """
+    unknown = set(grid) - {"carbon_coefficient", "suitability_index", "priority_groups"}
+    if unknown:
+        raise ScenarioConfigError(f"Unknown sweep parameters {sorted(unknown)}")
+
+    # Checks the scenario before starting the combinations
+    create_config_scenario(config)
+    combinations = parameter_combinations(grid)
+    output_directory = scenario_output_directory(config, "sweep")
+
+    def create_context(parameters, scenario_directory):
+        combination = combination_config(config, parameters)
+        scenario = create_config_scenario(combination)
+        scenario.name = f"{scenario.name} {os.path.basename(scenario_directory)}"
+        return create_config_context(
+            combination, scenario, scenario_directory, QgsFeedback()
+        )
+
+    feedback = QgsFeedback()
+    feedback.progressChanged.connect(reporter.progress, type=QtCore.Qt.DirectConnection)
+    sweep = ScenarioSweep(
+        combinations, create_context, output_directory, max_parallel, feedback
+    )
+    reporter.emit(
+        "started",
+        scenario=config.get("name", "Scenario"),
+        output_directory=output_directory,
+        combinations=len(combinations),
+    )
+
+    start = time.perf_counter()
+    success = sweep.run()
+    reporter.emit(
+        "finished",
+        success=success,
+        summary=sweep.summary_path,
+        results=[
+            {
+                "index": result.index,
+                "success": result.success,
+                "duration": round(result.duration, 3),
+            }
+            for result in sweep.results
+        ],
+        timings={"sweep": round(time.perf_counter() - start, 3)},
+    )
+
+    return success
+
+
+def configure_settings(profile_dir: str = None):
+    """Reads the QGIS and plugin settings from the given QGIS profile.
+
+    The settings manager is created when the plugin is imported, before
+    the settings location is known, so its settings are recreated once
+    the location has been set.
+
+    :param profile_dir: Directory of the QGIS profile, the default
+    profile is used if not specified.
+    :type profile_dir: str
+    """
+    # Same names as the QGIS desktop application so that the plugin
+    # settings are read from the profile.
+    QtCore.QCoreApplication.setOrganizationName("QGIS")
+    QtCore.QCoreApplication.setApplicationName("QGIS3")
+    if not profile_dir:
+        profile_dir = os.path.join(
+            QgsUserProfileManager.resolveProfilesFolder(), DEFAULT_PROFILE_NAME
+        )
+    QtCore.QSettings.setDefaultFormat(QtCore.QSettings.IniFormat)
+    QtCore.QSettings.setPath(
+        QtCore.QSettings.IniFormat, QtCore.QSettings.UserScope, profile_dir
+    )
+    settings_manager.reload_settings()
+
+
+def start_application(profile_dir: str = None) -> QgsApplication:
+    """Starts a QGIS application without the user interface that reads
+    the settings of the given QGIS profile.
+
+    :param profile_dir: Directory of the QGIS profile, the default
+    profile is used if not specified.
+    :type profile_dir: str
+
+    :returns: Initialized QGIS application.
+    :rtype: QgsApplication
+    """
+    configure_settings(profile_dir)
+
+    if "QGIS_PREFIX_PATH" in os.environ:
+        QgsApplication.setPrefixPath(os.environ["QGIS_PREFIX_PATH"], True)
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    return app
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates the command line arguments parser.
+
+    :returns: Arguments parser.
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m cplus_plugin.cli",
+        description="Runs CPLUS scenario analyses without the QGIS interface.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Runs a scenario analysis.")
+    run_parser.add_argument("scenario", help="Path of the scenario JSON file.")
+
+    sweep_parser = subparsers.add_parser(
+        "sweep", help="Runs a scenario analysis for each combination of parameters."
+    )
+    sweep_parser.add_argument("scenario", help="Path of the scenario JSON file.")
+    sweep_parser.add_argument(
+        "grid",
+        help="Path of the JSON file with the lists of values of the carbon "
+        "coefficient, suitability index and priority groups.",
+    )
+    sweep_parser.add_argument(
+        "--parallel",
+        type=int,
+        default=None,
+        help="Maximum number of combinations analyzed at the same time.",
+    )
+
+    for sub_parser in (run_parser, sweep_parser):
+        sub_parser.add_argument(
+            "--profile-dir",
+            default=None,
+            help="QGIS profile directory whose plugin settings are used.",
+        )
+        sub_parser.add_argument(
+            "--output-dir",
+            default=None,
+            help="Directory where the outputs are saved.",
+        )
+
+    return parser
+
+
+def main(argv: typing.List[str] = None) -> int:
+    """Runs the command line interface.
+
+    :param argv: Command line arguments, defaults to sys.argv.
+    :type argv: list
+
+    :returns: Exit code, 0 if the analysis completed successfully.
+    :rtype: int
+    """
+    args = create_parser().parse_args(argv)
+    reporter = JsonLinesReporter()
+
+    app = start_application(args.profile_dir)
+    app.messageLog().messageReceived.connect(
+        reporter.message, type=QtCore.Qt.DirectConnection
+    )
+    try:
+        config = load_scenario_config(args.scenario)
+        if args.output_dir:
+            config["output_directory"] = args.output_dir
+        if args.command == "sweep":
+            grid = load_scenario_config(args.grid)
+            success = run_sweep(config, grid, reporter, args.parallel)
+        else:
+            success = run_scenario(config, reporter)
+    except ScenarioConfigError as ex:
+        reporter.emit("error", message=str(ex))
+        success = False
+    finally:
+        app.exitQgis()
+
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,12 +3,15 @@
     Handles storage and retrieval of the plugin QgsSettings.
 """
 
+import collections
 import contextlib
+import copy
 import dataclasses
 import enum
 import json
 import os.path
 from pathlib import Path
+import threading
 import typing
 import uuid
 
@@ -41,6 +44,12 @@ from .models.helpers import (
 
 from .utils import log
 
+# Marks the settings removed in a transaction
+_REMOVED = object()
+
+# Marks the settings without buffered changes
+_NOT_PENDING = object()
+
 
 @contextlib.contextmanager
 def qgis_settings(group_root: str, settings=None):
@@ -134,6 +143,10 @@ class Settings(enum.Enum):
     # Advanced settings
     BASE_DIR = "advanced/base_dir"
 
+    # Hash of the default model components and base directory the
+    # model settings were last initialized with
+    MODEL_SETTINGS_HASH = "model_settings_hash"
+
     # Scenario basic details
     SCENARIO_NAME = "scenario_name"
     SCENARIO_DESCRIPTION = "scenario_description"
@@ -145,6 +158,262 @@ class Settings(enum.Enum):
     # Pathway suitability index value
     PATHWAY_SUITABILITY_INDEX = "pathway_suitability_index"
 
+    # Maximum number of concurrent analysis tasks, zero uses all the CPUs
+    ANALYSIS_MAX_WORKERS = "advanced/analysis_max_workers"
+
+    # Largest width and height in pixels of the tiles computed by the analysis
+    ANALYSIS_TILE_SIZE = "advanced/analysis_tile_size"
+
+    # Whether to compute the analysis tiles in worker processes
+    ANALYSIS_USE_PROCESSES = "advanced/analysis_use_processes"
+
+    # Memory in MB used by the analysis tiles and the GDAL cache
+    MEMORY_BUDGET_MB = "advanced/memory_budget_mb"
+
+    # Maximum size of the analysis cache in MB, zero disables the cache
+    ANALYSIS_CACHE_SIZE = "advanced/analysis_cache_size"
+
+    # Whether to save the intermediate analysis layers
+    INTERMEDIATE_OUTPUTS = "advanced/intermediate_outputs"
+
+    # Output rasters profile
+    OUTPUT_TILED = "output/tiled"
+    OUTPUT_BLOCK_SIZE = "output/block_size"
+    OUTPUT_COMPRESSION = "output/compression"
+    OUTPUT_BIGTIFF = "output/bigtiff"
+    OUTPUT_COG = "output/cog"
+
+
+@dataclasses.dataclass(frozen=True)
+class SettingsSnapshot:
+    """Objects created from settings collections and the versions of
+    the collections they were created from. The objects are shared by
+    all the readers of the snapshot and should not be changed.
+    """
+
+    version: typing.Tuple[int, ...]
+    items: typing.Tuple
+
+
+class SettingsRepository:
+    """In-memory copy of the collections stored in the plugin settings
+    i.e. priority layers, priority groups, NCS pathways and implementation
+    models, indexed by UUID, name and priority group.
+
+    Each collection is read from the settings the first time it is used
+    and the settings manager updates it on every write so that lookups
+    do not walk the settings tree.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Items of each collection indexed by UUID
+        self._items: typing.Dict[str, typing.Dict[str, dict]] = {}
+        # UUID of the first item with a given name
+        self._names: typing.Dict[str, typing.Dict[str, str]] = {}
+        # UUIDs of the items that belong to a priority group
+        self._groups: typing.Dict[str, typing.Dict[str, typing.List[str]]] = {}
+        self._versions = collections.Counter()
+        # Snapshots indexed by name
+        self._snapshots: typing.Dict[str, SettingsSnapshot] = {}
+
+    def _collection(
+        self, collection: str, loader: typing.Callable[[], typing.Dict[str, dict]]
+    ) -> typing.Dict[str, dict]:
+        """Returns the items of a collection, loading them if needed."""
+        if collection not in self._items:
+            self._items[collection] = loader()
+            self._index(collection)
+
+        return self._items[collection]
+
+    def _index(self, collection: str):
+        """Rebuilds the name and group indexes of a collection."""
+        names = {}
+        groups = {}
+        for key, item in sorted(self._items[collection].items()):
+            names.setdefault(item.get("name"), key)
+            for group in item.get("groups") or []:
+                groups.setdefault(group.get("name"), []).append(key)
+        self._names[collection] = names
+        self._groups[collection] = groups
+
+    def get(
+        self, collection: str, loader: typing.Callable, key
+    ) -> typing.Optional[dict]:
+        """Returns a copy of the item with the given UUID.
+
+        :param collection: Name of the collection.
+        :type collection: str
+
+        :param loader: Function that reads the items of the collection
+        from the settings indexed by UUID.
+        :type loader: Callable
+
+        :param key: UUID of the item.
+        :type key: str
+
+        :returns: Item attribute values or None if not found.
+        :rtype: dict
+        """
+        with self._lock:
+            return copy.deepcopy(self._collection(collection, loader).get(str(key)))
+
+    def values(self, collection: str, loader: typing.Callable) -> typing.List[dict]:
+        """Returns copies of all the items of the collection ordered by UUID.
+
+        :param collection: Name of the collection.
+        :type collection: str
+
+        :param loader: Function that reads the items of the collection.
+        :type loader: Callable
+
+        :returns: Items attribute values.
+        :rtype: list
+        """
+        with self._lock:
+            items = self._collection(collection, loader)
+            return [copy.deepcopy(items[key]) for key in sorted(items)]
+
+    def key_by_name(
+        self, collection: str, loader: typing.Callable, name: str
+    ) -> typing.Optional[str]:
+        """Returns the UUID of the first item with the given name.
+
+        :param collection: Name of the collection.
+        :type collection: str
+
+        :param loader: Function that reads the items of the collection.
+        :type loader: Callable
+
+        :param name: Name of the item.
+        :type name: str
+
+        :returns: UUID of the item or None if not found.
+        :rtype: str
+        """
+        with self._lock:
+            self._collection(collection, loader)
+            return self._names[collection].get(name)
+
+    def keys_by_group(
+        self, collection: str, loader: typing.Callable, group: str
+    ) -> typing.List[str]:
+        """Returns the UUIDs of the items that belong to a priority group.
+
+        :param collection: Name of the collection.
+        :type collection: str
+
+        :param loader: Function that reads the items of the collection.
+        :type loader: Callable
+
+        :param group: Name of the priority group.
+        :type group: str
+
+        :returns: UUIDs of the items ordered by UUID.
+        :rtype: list
+        """
+        with self._lock:
+            self._collection(collection, loader)
+            return list(self._groups[collection].get(group, []))
+
+    def put(self, collection: str, key, item: dict):
+        """Adds or replaces an item after it has been saved in the settings.
+
+        :param collection: Name of the collection.
+        :type collection: str
+
+        :param key: UUID of the item.
+        :type key: str
+
+        :param item: Item attribute values as read from the settings.
+        :type item: dict
+        """
+        with self._lock:
+            self._versions[collection] += 1
+            # Collections that have not been loaded are read when first used
+            if collection in self._items:
+                self._items[collection][str(key)] = item
+                self._index(collection)
+
+    def remove(self, collection: str, key):
+        """Removes an item after it has been removed from the settings.
+
+        :param collection: Name of the collection.
+        :type collection: str
+
+        :param key: UUID of the item.
+        :type key: str
+        """
+        with self._lock:
+            self._versions[collection] += 1
+            if self._items.get(collection, {}).pop(str(key), None) is not None:
+                self._index(collection)
+
+    def clear(self, collection: str = None):
+        """Discards a collection or all the collections so that they are
+        read again from the settings when next used.
+
+        :param collection: Name of the collection, all the collections
+        are discarded if not specified.
+        :type collection: str
+        """
+        with self._lock:
+            if collection is None:
+                names = set(self._versions) | set(self._items)
+            else:
+                names = {collection}
+            for name in names:
+                self._versions[name] += 1
+                self._items.pop(name, None)
+                self._names.pop(name, None)
+                self._groups.pop(name, None)
+
+    def version(self, collection: str) -> int:
+        """Returns the number of changes made to a collection.
+
+        :param collection: Name of the collection.
+        :type collection: str
+
+        :returns: Version of the collection, it changes whenever an
+        item is saved or removed.
+        :rtype: int
+        """
+        with self._lock:
+            return self._versions[collection]
+
+    def snapshot(
+        self,
+        name: str,
+        collections_: typing.Sequence[str],
+        factory: typing.Callable[[], typing.Iterable],
+    ) -> SettingsSnapshot:
+        """Returns the objects created by the factory from the given
+        collections, the objects are only created again after an item
+        of the collections has been saved or removed.
+
+        :param name: Name of the snapshot.
+        :type name: str
+
+        :param collections_: Names of the collections the objects are
+        created from.
+        :type collections_: list
+
+        :param factory: Function that creates the objects.
+        :type factory: Callable
+
+        :returns: Snapshot of the objects.
+        :rtype: SettingsSnapshot
+        """
+        with self._lock:
+            version = tuple(self._versions[collection] for collection in collections_)
+            snapshot = self._snapshots.get(name)
+            if snapshot is None or snapshot.version != version:
+                snapshot = SettingsSnapshot(version, tuple(factory()))
+                self._snapshots[name] = snapshot
+
+            return snapshot
+
 
 class SettingsManager(QtCore.QObject):
     """Manages saving/loading settings for the plugin in QgsSettings."""
@@ -162,6 +431,164 @@ class SettingsManager(QtCore.QObject):
     scenarios_settings_updated = QtCore.pyqtSignal()
     priority_layers_changed = QtCore.pyqtSignal()
     settings_updated = QtCore.pyqtSignal([str, object], [Settings, object])
+    # Values of the settings changed by set_value indexed by name, emitted
+    # once for all the settings changed in a transaction
+    settings_changed = QtCore.pyqtSignal(dict)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._repository = SettingsRepository()
+        self._transaction_depth = 0
+        # Buffered values indexed by settings key in the order written
+        self._pending_writes: typing.Dict[str, typing.Any] = {}
+        self._pending_changes: typing.Dict[str, typing.Any] = {}
+        self._pending_priority_layers_changed = False
+
+    def reload_settings(self):
+        """Recreates the settings of the manager after the location of the
+        QGIS settings has been changed e.g. when the application names or
+        the settings path are set after the plugin has been imported. The
+        in-memory collections are read again from the new settings.
+        """
+        self.settings = QgsSettings()
+        self._pending_writes = {}
+        self._pending_changes = {}
+        self._pending_priority_layers_changed = False
+        self._repository.clear()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Context manager that buffers the settings written with
+        set_value, remove and the NCS pathway and implementation model
+        operations. The buffered values are read back within the
+        transaction and written to the settings once when the outermost
+        transaction exits, then settings_updated is emitted once for each
+        changed setting with its last value and settings_changed once with
+        all the changed settings. The buffered values are discarded if the
+        outermost transaction exits with an exception.
+
+        Priority layers and groups are written immediately, only their
+        change signal is emitted once at the end of the transaction.
+
+        :yields: Settings manager
+        :ytype: SettingsManager
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._transaction_depth == 1:
+                self._rollback()
+            raise
+        finally:
+            self._transaction_depth -= 1
+
+        if self._transaction_depth == 0:
+            self._commit()
+
+    def _commit(self):
+        """Writes the buffered settings and emits the change signals."""
+        writes, self._pending_writes = self._pending_writes, {}
+        for key, value in writes.items():
+            if value is _REMOVED:
+                self.settings.remove(key)
+            else:
+                self.settings.setValue(key, value)
+        if writes:
+            self.settings.sync()
+
+        changes, self._pending_changes = self._pending_changes, {}
+        for name, value in changes.items():
+            self.settings_updated.emit(name, value)
+        if changes:
+            self.settings_changed.emit(changes)
+
+        if self._pending_priority_layers_changed:
+            self._pending_priority_layers_changed = False
+            self.priority_layers_changed.emit()
+
+    def _rollback(self):
+        """Discards the buffered settings."""
+        self._pending_writes = {}
+        self._pending_changes = {}
+        self._pending_priority_layers_changed = False
+        # Collections may hold values that were only buffered
+        self._repository.clear()
+
+    def _write_setting(self, key: str, value):
+        """Writes a value to the settings or buffers it in a transaction.
+
+        :param key: Full settings key
+        :type key: str
+
+        :param value: Value of the setting
+        :type value: Any
+        """
+        if self._transaction_depth == 0:
+            self.settings.setValue(key, value)
+            return
+
+        # Keep the order of the writes
+        self._pending_writes.pop(key, None)
+        self._pending_writes[key] = value
+
+    def _remove_setting(self, key: str):
+        """Removes a setting and its children from the settings or
+        buffers the removal in a transaction.
+
+        :param key: Full settings key
+        :type key: str
+        """
+        if self._transaction_depth == 0:
+            self.settings.remove(key)
+            return
+
+        for pending_key in list(self._pending_writes):
+            if pending_key == key or pending_key.startswith(f"{key}/"):
+                del self._pending_writes[pending_key]
+        self._pending_writes[key] = _REMOVED
+
+    def _pending_value(self, key: str):
+        """Returns the value of a setting buffered in a transaction.
+
+        :param key: Full settings key
+        :type key: str
+
+        :returns: Buffered value, _REMOVED if the setting or one of its
+        groups has been removed and _NOT_PENDING if it has not changed.
+        :rtype: Any
+        """
+        if not self._pending_writes:
+            return _NOT_PENDING
+
+        if key in self._pending_writes:
+            return self._pending_writes[key]
+
+        segments = key.split("/")
+        for index in range(1, len(segments)):
+            group = "/".join(segments[:index])
+            if self._pending_writes.get(group, _NOT_PENDING) is _REMOVED:
+                return _REMOVED
+
+        return _NOT_PENDING
+
+    def _pending_children(self, group: str) -> typing.Dict[str, typing.Any]:
+        """Returns the values buffered in a transaction for the keys
+        directly under a settings group.
+
+        :param group: Full settings key of the group
+        :type group: str
+
+        :returns: Buffered values or _REMOVED indexed by child key
+        :rtype: dict
+        """
+        children = {}
+        for key, value in self._pending_writes.items():
+            child_key = key[len(group) + 1 :]
+            if key.startswith(f"{group}/") and "/" not in child_key:
+                children[child_key] = value
+
+        return children
 
     def set_value(self, name: str, value):
         """Adds a new setting key and value on the plugin specific settings.
@@ -172,11 +599,17 @@ class SettingsManager(QtCore.QObject):
         :param value: Value of the setting
         :type value: Any
         """
-        self.settings.setValue(f"{self.BASE_GROUP_NAME}/{name}", value)
+        self._write_setting(f"{self.BASE_GROUP_NAME}/{name}", value)
+        self._invalidate_repository(name)
         if isinstance(name, Settings):
             name = name.value
 
+        if self._transaction_depth > 0:
+            self._pending_changes[name] = value
+            return
+
         self.settings_updated.emit(name, value)
+        self.settings_changed.emit({name: value})
 
     def get_value(self, name: str, default=None, setting_type=None):
         """Gets value of the setting with the passed name.
@@ -193,6 +626,17 @@ class SettingsManager(QtCore.QObject):
         :returns: Value of the setting
         :rtype: Any
         """
+        pending_value = self._pending_value(f"{self.BASE_GROUP_NAME}/{name}")
+        if pending_value is _REMOVED:
+            return default
+        if pending_value is not _NOT_PENDING:
+            if setting_type and not isinstance(pending_value, setting_type):
+                try:
+                    return setting_type(pending_value)
+                except (TypeError, ValueError):
+                    return default
+            return pending_value
+
         if setting_type:
             return self.settings.value(
                 f"{self.BASE_GROUP_NAME}/{name}", default, setting_type
@@ -205,11 +649,38 @@ class SettingsManager(QtCore.QObject):
         :param name: Name of the setting key
         :type name: str
         """
-        self.settings.remove(f"{self.BASE_GROUP_NAME}/{name}")
+        self._remove_setting(f"{self.BASE_GROUP_NAME}/{name}")
+        self._invalidate_repository(name, removed=True)
+
+    def _invalidate_repository(self, name, removed: bool = False):
+        """Keeps the in-memory collections coherent with a setting
+        that has been changed or removed by name.
+
+        :param name: Name of the setting key
+        :type name: str
+
+        :param removed: Whether the setting has been removed
+        :type removed: bool
+        """
+        segments = str(name).split("/")
+        if segments[0] not in (
+            self.PRIORITY_GROUP_NAME,
+            self.PRIORITY_LAYERS_GROUP_NAME,
+            self.NCS_PATHWAY_BASE,
+            self.IMPLEMENTATION_MODEL_BASE,
+        ):
+            return
+
+        if removed and len(segments) == 2:
+            self._repository.remove(*segments)
+        else:
+            self._repository.clear(segments[0])
 
     def delete_settings(self):
         """Deletes the all the plugin settings."""
+        self._pending_writes = {}
         self.settings.remove(f"{self.BASE_GROUP_NAME}")
+        self._repository.clear()
 
     def _get_scenario_settings_base(self, identifier):
         """Gets the scenario settings base url.
@@ -347,8 +818,9 @@ class SettingsManager(QtCore.QObject):
             f"{str(identifier)}"
         )
 
-    def get_priority_layer(self, identifier) -> typing.Dict:
-        """Retrieves the priority layer that matches the passed identifier.
+    def _read_priority_layer(self, identifier) -> typing.Dict:
+        """Reads the priority layer that matches the passed identifier
+        from the plugin settings.
 
         :param identifier: Priority layers identifier
         :type identifier: uuid.UUID
@@ -356,7 +828,6 @@ class SettingsManager(QtCore.QObject):
         :returns: Priority layers dict
         :rtype: dict
         """
-
         settings_key = self._get_priority_layers_settings_base(identifier)
         with qgis_settings(settings_key) as settings:
             groups_key = f"{settings_key}/groups"
@@ -379,63 +850,71 @@ class SettingsManager(QtCore.QObject):
             priority_layer["groups"] = groups
         return priority_layer
 
+    def _load_priority_layers(self) -> typing.Dict[str, typing.Dict]:
+        """Reads all the priority layers from the plugin settings.
+
+        :returns: Priority layers indexed by UUID
+        :rtype: dict
+        """
+        with qgis_settings(
+            f"{self.BASE_GROUP_NAME}/" f"{self.PRIORITY_LAYERS_GROUP_NAME}"
+        ) as settings:
+            return {
+                layer_id: self._read_priority_layer(layer_id)
+                for layer_id in settings.childGroups()
+            }
+
+    def get_priority_layer(self, identifier) -> typing.Dict:
+        """Retrieves the priority layer that matches the passed identifier.
+
+        :param identifier: Priority layers identifier
+        :type identifier: uuid.UUID
+
+        :returns: Priority layers dict
+        :rtype: dict
+        """
+        priority_layer = self._repository.get(
+            self.PRIORITY_LAYERS_GROUP_NAME, self._load_priority_layers, identifier
+        )
+        if priority_layer is None:
+            priority_layer = {
+                "uuid": str(identifier),
+                "name": None,
+                "description": None,
+                "path": None,
+                "selected": False,
+                "groups": [],
+            }
+        return priority_layer
+
     def get_priority_layers(self) -> typing.List:
         """Gets all the available priority layers in the plugin.
 
         :returns: Priority layers list
         :rtype: list
         """
-        priority_layer_list = []
-        with qgis_settings(
-            f"{self.BASE_GROUP_NAME}/" f"{self.PRIORITY_LAYERS_GROUP_NAME}"
-        ) as settings:
-            for uuid in settings.childGroups():
-                priority_layer_settings = self._get_priority_layers_settings_base(uuid)
-                with qgis_settings(priority_layer_settings) as priority_settings:
-                    groups_key = f"{priority_layer_settings}/groups"
-                    groups = []
-
-                    with qgis_settings(groups_key) as groups_settings:
-                        for name in groups_settings.childGroups():
-                            group_settings_key = f"{groups_key}/{name}"
-                            with qgis_settings(group_settings_key) as group_settings:
-                                stored_group = {}
-                                stored_group["name"] = group_settings.value("name")
-                                stored_group["value"] = group_settings.value("value")
-                                groups.append(stored_group)
-                    layer = {
-                        "uuid": uuid,
-                        "name": priority_settings.value("name"),
-                        "description": priority_settings.value("description"),
-                        "path": priority_settings.value("path"),
-                        "selected": priority_settings.value("selected", type=bool),
-                        "groups": groups,
-                    }
-                    priority_layer_list.append(layer)
-        return priority_layer_list
-
-    def find_layer_by_name(self, name) -> typing.Dict:
+        return self._repository.values(
+            self.PRIORITY_LAYERS_GROUP_NAME, self._load_priority_layers
+        )
+
+    def find_layer_by_name(self, name) -> typing.Optional[typing.Dict]:
         """Finds a priority layer setting inside
         the plugin QgsSettings by name.
 
         :param name: Priority layers identifier
         :type name: str
 
-        :returns: Priority layers dict
+        :returns: Priority layers dict or None if there is no
+        layer with the given name
         :rtype: dict
         """
-        with qgis_settings(
-            f"{self.BASE_GROUP_NAME}/" f"{self.PRIORITY_LAYERS_GROUP_NAME}"
-        ) as settings:
-            for layer_id in settings.childGroups():
-                layer_settings_key = self._get_priority_layers_settings_base(layer_id)
-                with qgis_settings(layer_settings_key) as layer_settings:
-                    layer_name = layer_settings.value("name")
-                    if layer_name == name:
-                        found_id = uuid.UUID(layer_id)
-                        break
+        layer_id = self._repository.key_by_name(
+            self.PRIORITY_LAYERS_GROUP_NAME, self._load_priority_layers, name
+        )
+        if layer_id is None:
+            return None
 
-        return self.get_priority_layer(found_id)
+        return self.get_priority_layer(uuid.UUID(layer_id))
 
     def find_layers_by_group(self, group) -> typing.List:
         """Finds priority layers inside the plugin QgsSettings
@@ -447,24 +926,10 @@ class SettingsManager(QtCore.QObject):
         :returns: Priority layers list
         :rtype: list
         """
-        layers = []
-        with qgis_settings(
-            f"{self.BASE_GROUP_NAME}/" f"{self.PRIORITY_LAYERS_GROUP_NAME}"
-        ) as settings:
-            for layer_id in settings.childGroups():
-                priority_layer_settings = self._get_priority_layers_settings_base(
-                    layer_id
-                )
-                with qgis_settings(priority_layer_settings) as priority_settings:
-                    groups_key = f"{priority_layer_settings}/groups"
-
-                    with qgis_settings(groups_key) as groups_settings:
-                        for name in groups_settings.childGroups():
-                            group_settings_key = f"{groups_key}/{name}"
-                            with qgis_settings(group_settings_key) as group_settings:
-                                if group == group_settings.value("name"):
-                                    layers.append(self.get_priority_layer(layer_id))
-        return layers
+        layer_ids = self._repository.keys_by_group(
+            self.PRIORITY_LAYERS_GROUP_NAME, self._load_priority_layers, group
+        )
+        return [self.get_priority_layer(layer_id) for layer_id in layer_ids]
 
     def save_priority_layer(self, priority_layer):
         """Save the priority layer into the plugin settings.
@@ -493,7 +958,15 @@ class SettingsManager(QtCore.QObject):
                     group_settings.setValue("name", group["name"])
                     group_settings.setValue("value", group["value"])
 
-        self.priority_layers_changed.emit()
+        self._repository.put(
+            self.PRIORITY_LAYERS_GROUP_NAME,
+            priority_layer["uuid"],
+            self._read_priority_layer(priority_layer["uuid"]),
+        )
+        if self._transaction_depth > 0:
+            self._pending_priority_layers_changed = True
+        else:
+            self.priority_layers_changed.emit()
 
     def set_current_priority_layer(self, identifier):
         """Set current priority layer
@@ -504,13 +977,21 @@ class SettingsManager(QtCore.QObject):
         with qgis_settings(
             f"{self.BASE_GROUP_NAME}/" f"{self.PRIORITY_LAYERS_GROUP_NAME}/"
         ) as settings:
-            for priority_layer in settings.childGroups():
+            priority_layers = settings.childGroups()
+            for priority_layer in priority_layers:
                 settings_key = self._get_priority_layers_settings_base(identifier)
                 with qgis_settings(settings_key) as layer_settings:
                     layer_settings.setValue(
                         "selected", str(priority_layer) == str(identifier)
                     )
 
+        if priority_layers:
+            self._repository.put(
+                self.PRIORITY_LAYERS_GROUP_NAME,
+                identifier,
+                self._read_priority_layer(identifier),
+            )
+
     def delete_priority_layers(self):
         """Deletes all the plugin priority settings."""
         with qgis_settings(
@@ -519,6 +1000,8 @@ class SettingsManager(QtCore.QObject):
             for priority_layer in settings.childGroups():
                 settings.remove(priority_layer)
 
+        self._repository.clear(self.PRIORITY_LAYERS_GROUP_NAME)
+
     def delete_priority_layer(self, identifier):
         """Removes priority layer that match the passed identifier
 
@@ -532,6 +1015,8 @@ class SettingsManager(QtCore.QObject):
                 if str(priority_layer) == str(identifier):
                     settings.remove(priority_layer)
 
+        self._repository.remove(self.PRIORITY_LAYERS_GROUP_NAME, identifier)
+
     def _get_priority_groups_settings_base(self, identifier) -> str:
         """Gets the priority group settings base url.
 
@@ -548,27 +1033,54 @@ class SettingsManager(QtCore.QObject):
             f"{str(identifier)}"
         )
 
-    def find_group_by_name(self, name) -> typing.Dict:
-        """Finds a priority group setting inside the plugin QgsSettings by name.
+    def _read_priority_group(self, identifier) -> typing.Dict:
+        """Reads the priority group that matches the passed identifier
+        from the plugin settings.
 
-        :param name: Name of the group
-        :type name: str
+        :param identifier: Priority group identifier
+        :type identifier: str
 
         :returns: Priority group
         :rtype: typing.Dict
         """
+        settings_key = self._get_priority_groups_settings_base(identifier)
+        with qgis_settings(settings_key) as settings:
+            priority_group = {"uuid": str(identifier)}
+            priority_group["name"] = settings.value("name")
+            priority_group["value"] = settings.value("value")
+        return priority_group
+
+    def _load_priority_groups(self) -> typing.Dict[str, typing.Dict]:
+        """Reads all the priority groups from the plugin settings.
+
+        :returns: Priority groups indexed by UUID
+        :rtype: dict
+        """
         with qgis_settings(
             f"{self.BASE_GROUP_NAME}/" f"{self.PRIORITY_GROUP_NAME}"
         ) as settings:
-            for group_id in settings.childGroups():
-                group_settings_key = self._get_priority_groups_settings_base(group_id)
-                with qgis_settings(group_settings_key) as group_settings_key:
-                    group_name = group_settings_key.value("name")
-                    if group_name == name:
-                        found_id = uuid.UUID(group_id)
-                        break
+            return {
+                group_id: self._read_priority_group(group_id)
+                for group_id in settings.childGroups()
+            }
+
+    def find_group_by_name(self, name) -> typing.Optional[typing.Dict]:
+        """Finds a priority group setting inside the plugin QgsSettings by name.
+
+        :param name: Name of the group
+        :type name: str
+
+        :returns: Priority group or None if there is no group
+        with the given name
+        :rtype: typing.Dict
+        """
+        group_id = self._repository.key_by_name(
+            self.PRIORITY_GROUP_NAME, self._load_priority_groups, name
+        )
+        if group_id is None:
+            return None
 
-        return self.get_priority_group(found_id)
+        return self.get_priority_group(uuid.UUID(group_id))
 
     def get_priority_group(self, identifier) -> typing.Dict:
         """Retrieves the priority group that matches the passed identifier.
@@ -579,12 +1091,10 @@ class SettingsManager(QtCore.QObject):
         :returns: Priority group
         :rtype: typing.Dict
         """
-
-        settings_key = self._get_priority_groups_settings_base(identifier)
-        with qgis_settings(settings_key) as settings:
-            priority_group = {"uuid": identifier}
-            priority_group["name"] = settings.value("name")
-            priority_group["value"] = settings.value("value")
+        priority_group = self._repository.get(
+            self.PRIORITY_GROUP_NAME, self._load_priority_groups, identifier
+        ) or {"name": None, "value": None}
+        priority_group["uuid"] = identifier
         return priority_group
 
     def get_priority_groups(self) -> typing.List[typing.Dict]:
@@ -593,20 +1103,9 @@ class SettingsManager(QtCore.QObject):
         :returns: List of the priority groups instances
         :rtype: list
         """
-        priority_groups = []
-        with qgis_settings(
-            f"{self.BASE_GROUP_NAME}/" f"{self.PRIORITY_GROUP_NAME}"
-        ) as settings:
-            for uuid in settings.childGroups():
-                priority_layer_settings = self._get_priority_groups_settings_base(uuid)
-                with qgis_settings(priority_layer_settings) as priority_settings:
-                    group = {
-                        "uuid": uuid,
-                        "name": priority_settings.value("name"),
-                        "value": priority_settings.value("value"),
-                    }
-                    priority_groups.append(group)
-        return priority_groups
+        return self._repository.values(
+            self.PRIORITY_GROUP_NAME, self._load_priority_groups
+        )
 
     def save_priority_group(self, priority_group):
         """Save the priority group into the plugin settings
@@ -621,6 +1120,12 @@ class SettingsManager(QtCore.QObject):
             settings.setValue("name", priority_group["name"])
             settings.setValue("value", priority_group["value"])
 
+        self._repository.put(
+            self.PRIORITY_GROUP_NAME,
+            priority_group["uuid"],
+            self._read_priority_group(priority_group["uuid"]),
+        )
+
     def delete_priority_groups(self):
         """Deletes all the plugin priority groups settings."""
         with qgis_settings(
@@ -629,6 +1134,8 @@ class SettingsManager(QtCore.QObject):
             for priority_group in settings.childGroups():
                 settings.remove(priority_group)
 
+        self._repository.clear(self.PRIORITY_GROUP_NAME)
+
     def _get_ncs_pathway_settings_base(self) -> str:
         """Returns the path for NCS pathway settings.
 
@@ -651,10 +1158,15 @@ class SettingsManager(QtCore.QObject):
         ncs_str = json.dumps(ncs_pathway)
 
         ncs_uuid = ncs_pathway[UUID_ATTRIBUTE]
+        ncs_dict = json.loads(ncs_str)
+        # Unchanged pathways are not written again
+        if ncs_dict == self.get_ncs_pathway_dict(ncs_uuid):
+            return
+
         ncs_root = self._get_ncs_pathway_settings_base()
+        self._write_setting(f"{ncs_root}/{ncs_uuid}", ncs_str)
 
-        with qgis_settings(ncs_root) as settings:
-            settings.setValue(ncs_uuid, ncs_str)
+        self._repository.put(self.NCS_PATHWAY_BASE, ncs_uuid, ncs_dict)
 
     def get_ncs_pathway(self, ncs_uuid: str) -> typing.Union[NcsPathway, None]:
         """Gets an NCS pathway object matching the given unique identified.
@@ -686,39 +1198,110 @@ class SettingsManager(QtCore.QObject):
         identifier else an empty dictionary if not found.
         :rtype: dict
         """
-        ncs_pathway_dict = {}
+        ncs_pathway_dict = self._repository.get(
+            self.NCS_PATHWAY_BASE, self._load_ncs_pathways, ncs_uuid
+        )
 
-        ncs_root = self._get_ncs_pathway_settings_base()
+        return ncs_pathway_dict or {}
+
+    def _load_json_values(self, settings_root: str, description: str) -> dict:
+        """Reads all the JSON values in a settings group in one pass and
+        parses them as a single JSON array.
+
+        :param settings_root: Settings group of the values.
+        :type settings_root: str
+
+        :param description: Description of the values used in the
+        message logged for invalid values.
+        :type description: str
 
-        with qgis_settings(ncs_root) as settings:
-            ncs_model = settings.value(ncs_uuid, dict())
-            if len(ncs_model) > 0:
+        :returns: Parsed JSON objects indexed by settings key, invalid
+        values are skipped.
+        :rtype: dict
+        """
+        with qgis_settings(settings_root) as settings:
+            json_values = {key: settings.value(key, "") for key in settings.childKeys()}
+        for key, value in self._pending_children(settings_root).items():
+            if value is _REMOVED:
+                json_values.pop(key, None)
+            else:
+                json_values[key] = value
+        json_values = {
+            key: value
+            for key, value in json_values.items()
+            if isinstance(value, str) and value
+        }
+
+        try:
+            values = json.loads(f"[{','.join(json_values.values())}]")
+        except json.JSONDecodeError:
+            values = None
+        if values is None or len(values) != len(json_values):
+            # Parse the values separately to only skip the invalid ones
+            values = []
+            for value in json_values.values():
                 try:
-                    ncs_pathway_dict = json.loads(ncs_model)
+                    values.append(json.loads(value))
                 except json.JSONDecodeError:
-                    log("NCS pathway JSON is invalid")
+                    log(f"{description} JSON is invalid")
+                    values.append(None)
 
-        return ncs_pathway_dict
+        return {
+            key: value
+            for key, value in zip(json_values, values)
+            if isinstance(value, dict)
+        }
 
-    def get_all_ncs_pathways(self) -> typing.List[NcsPathway]:
-        """Get all the NCS pathway objects stored in settings.
+    def _load_ncs_pathways(self) -> typing.Dict[str, dict]:
+        """Reads the attribute values of all the NCS pathways in settings.
 
-        :returns: Returns all the NCS pathway objects.
+        :returns: NCS pathway attribute values indexed by UUID, invalid
+        entries are skipped.
+        :rtype: dict
+        """
+        return self._load_json_values(
+            self._get_ncs_pathway_settings_base(), "NCS pathway"
+        )
+
+    def _create_ncs_pathways(self) -> typing.List[NcsPathway]:
+        """Creates the NCS pathway objects of all the pathways in settings.
+
+        :returns: NCS pathway objects sorted by name.
         :rtype: list
         """
         ncs_pathways = []
 
-        ncs_root = self._get_ncs_pathway_settings_base()
-
-        with qgis_settings(ncs_root) as settings:
-            keys = settings.childKeys()
-            for k in keys:
-                ncs_pathway = self.get_ncs_pathway(k)
-                if ncs_pathway is not None:
-                    ncs_pathways.append(ncs_pathway)
+        for ncs_dict in self._repository.values(
+            self.NCS_PATHWAY_BASE, self._load_ncs_pathways
+        ):
+            ncs_pathway = create_ncs_pathway(ncs_dict)
+            if ncs_pathway is not None:
+                ncs_pathways.append(ncs_pathway)
 
         return sorted(ncs_pathways, key=lambda ncs: ncs.name)
 
+    def get_ncs_pathways_snapshot(self) -> SettingsSnapshot:
+        """Gets the NCS pathway objects stored in settings, the objects
+        are created once and shared until a pathway is saved or removed.
+
+        The objects should not be changed, use
+        :py:meth:`get_all_ncs_pathways` for objects that can be edited.
+
+        :returns: Snapshot of the NCS pathway objects sorted by name.
+        :rtype: SettingsSnapshot
+        """
+        return self._repository.snapshot(
+            self.NCS_PATHWAY_BASE, [self.NCS_PATHWAY_BASE], self._create_ncs_pathways
+        )
+
+    def get_all_ncs_pathways(self) -> typing.List[NcsPathway]:
+        """Get all the NCS pathway objects stored in settings.
+
+        :returns: Returns all the NCS pathway objects.
+        :rtype: list
+        """
+        return copy.deepcopy(list(self.get_ncs_pathways_snapshot().items))
+
     def update_ncs_pathways(self):
         """Updates the path attribute of all NCS pathway settings
         based on the BASE_DIR settings to reflect the absolute path
@@ -727,8 +1310,9 @@ class SettingsManager(QtCore.QObject):
         be updated.
         """
         ncs_pathways = self.get_all_ncs_pathways()
-        for ncs in ncs_pathways:
-            self.update_ncs_pathway(ncs)
+        with self.transaction():
+            for ncs in ncs_pathways:
+                self.update_ncs_pathway(ncs)
 
     def update_ncs_pathway(self, ncs_pathway: NcsPathway):
         """Updates the attributes of the NCS pathway object
@@ -770,8 +1354,7 @@ class SettingsManager(QtCore.QObject):
 
             ncs_pathway.carbon_paths = abs_carbon_paths
 
-        # Remove then re-insert
-        self.remove_ncs_pathway(str(ncs_pathway.uuid))
+        # Replaces the saved pathway if it has changed
         self.save_ncs_pathway(ncs_pathway)
 
     def remove_ncs_pathway(self, ncs_uuid: str):
@@ -823,10 +1406,26 @@ class SettingsManager(QtCore.QObject):
         implementation_model_str = json.dumps(implementation_model)
 
         implementation_model_uuid = implementation_model[UUID_ATTRIBUTE]
+        implementation_model_dict = json.loads(implementation_model_str)
+        # Unchanged models are not written again
+        if implementation_model_dict == self._repository.get(
+            self.IMPLEMENTATION_MODEL_BASE,
+            self._load_implementation_models,
+            implementation_model_uuid,
+        ):
+            return
+
         implementation_model_root = self._get_implementation_model_settings_base()
+        self._write_setting(
+            f"{implementation_model_root}/{implementation_model_uuid}",
+            implementation_model_str,
+        )
 
-        with qgis_settings(implementation_model_root) as settings:
-            settings.setValue(implementation_model_uuid, implementation_model_str)
+        self._repository.put(
+            self.IMPLEMENTATION_MODEL_BASE,
+            implementation_model_uuid,
+            implementation_model_dict,
+        )
 
     def get_implementation_model(
         self, implementation_model_uuid: str
@@ -842,53 +1441,100 @@ class SettingsManager(QtCore.QObject):
         identifier else None if not found.
         :rtype: ImplementationModel
         """
-        implementation_model = None
+        implementation_model_dict = self._repository.get(
+            self.IMPLEMENTATION_MODEL_BASE,
+            self._load_implementation_models,
+            implementation_model_uuid,
+        )
+        if implementation_model_dict is None:
+            return None
 
-        implementation_model_root = self._get_implementation_model_settings_base()
+        return self._create_implementation_model(implementation_model_dict)
 
-        with qgis_settings(implementation_model_root) as settings:
-            implementation_model = settings.value(implementation_model_uuid, None)
-            ncs_uuids = []
-            if implementation_model is not None:
-                implementation_model_dict = {}
-                try:
-                    implementation_model_dict = json.loads(implementation_model)
-                except json.JSONDecodeError:
-                    log("Implementation model JSON is invalid.")
+    def _create_implementation_model(
+        self, implementation_model_dict: dict
+    ) -> typing.Union[ImplementationModel, None]:
+        """Creates an implementation model object from its attribute
+        values in settings and adds the NCS pathways it references.
 
-                if PATHWAYS_ATTRIBUTE in implementation_model_dict:
-                    ncs_uuids = implementation_model_dict[PATHWAYS_ATTRIBUTE]
+        :param implementation_model_dict: Implementation model
+        attribute values.
+        :type implementation_model_dict: dict
 
-                implementation_model = create_implementation_model(
-                    implementation_model_dict
-                )
-                if implementation_model is not None:
-                    for ncs_uuid in ncs_uuids:
-                        ncs = self.get_ncs_pathway(ncs_uuid)
-                        if ncs is not None:
-                            implementation_model.add_ncs_pathway(ncs)
+        :returns: Implementation model object or None if the attribute
+        values are invalid.
+        :rtype: ImplementationModel
+        """
+        ncs_uuids = implementation_model_dict.get(PATHWAYS_ATTRIBUTE, [])
+
+        implementation_model = create_implementation_model(implementation_model_dict)
+        if implementation_model is not None:
+            for ncs_uuid in ncs_uuids:
+                ncs = self.get_ncs_pathway(ncs_uuid)
+                if ncs is not None:
+                    implementation_model.add_ncs_pathway(ncs)
 
         return implementation_model
 
-    def get_all_implementation_models(self) -> typing.List[ImplementationModel]:
-        """Get all the implementation model objects stored in settings.
+    def _load_implementation_models(self) -> typing.Dict[str, dict]:
+        """Reads the attribute values of all the implementation models
+        in settings.
 
-        :returns: Returns all the implementation model objects.
+        :returns: Implementation model attribute values indexed by UUID,
+        invalid entries are skipped.
+        :rtype: dict
+        """
+        return self._load_json_values(
+            self._get_implementation_model_settings_base(), "Implementation model"
+        )
+
+    def _create_implementation_models(self) -> typing.List[ImplementationModel]:
+        """Creates the implementation model objects of all the models
+        in settings.
+
+        :returns: Implementation model objects sorted by name.
         :rtype: list
         """
         implementation_models = []
 
-        implementation_model_root = self._get_implementation_model_settings_base()
-
-        with qgis_settings(implementation_model_root) as settings:
-            keys = settings.childKeys()
-            for k in keys:
-                implementation_model = self.get_implementation_model(k)
-                if implementation_model is not None:
-                    implementation_models.append(implementation_model)
+        for implementation_model_dict in self._repository.values(
+            self.IMPLEMENTATION_MODEL_BASE, self._load_implementation_models
+        ):
+            implementation_model = self._create_implementation_model(
+                implementation_model_dict
+            )
+            if implementation_model is not None:
+                implementation_models.append(implementation_model)
 
         return sorted(implementation_models, key=lambda imp_model: imp_model.name)
 
+    def get_implementation_models_snapshot(self) -> SettingsSnapshot:
+        """Gets the implementation model objects stored in settings, the
+        objects are created once and shared until a model or an NCS
+        pathway is saved or removed.
+
+        The objects should not be changed, use
+        :py:meth:`get_all_implementation_models` for objects that can
+        be edited.
+
+        :returns: Snapshot of the implementation model objects sorted
+        by name.
+        :rtype: SettingsSnapshot
+        """
+        return self._repository.snapshot(
+            self.IMPLEMENTATION_MODEL_BASE,
+            [self.IMPLEMENTATION_MODEL_BASE, self.NCS_PATHWAY_BASE],
+            self._create_implementation_models,
+        )
+
+    def get_all_implementation_models(self) -> typing.List[ImplementationModel]:
+        """Get all the implementation model objects stored in settings.
+
+        :returns: Returns all the implementation model objects.
+        :rtype: list
+        """
+        return copy.deepcopy(list(self.get_implementation_models_snapshot().items))
+
     def update_implementation_model(self, implementation_model: ImplementationModel):
         """Updates the attributes of the Implementation object
         in settings. On the path, the BASE_DIR in settings
@@ -913,8 +1559,7 @@ class SettingsManager(QtCore.QObject):
                 abs_pwl_path = str(os.path.normpath(abs_pwl_path))
                 layer[PATH_ATTRIBUTE] = abs_pwl_path
 
-        # Remove then re-insert
-        self.remove_implementation_model(str(implementation_model.uuid))
+        # Replaces the saved model if it has changed
         self.save_implementation_model(implementation_model)
 
     def update_implementation_models(self):
@@ -925,8 +1570,9 @@ class SettingsManager(QtCore.QObject):
         """
         models = self.get_all_implementation_models()
 
-        for implementation_model in models:
-            self.update_implementation_model(implementation_model)
+        with self.transaction():
+            for implementation_model in models:
+                self.update_implementation_model(implementation_model)
 
     def remove_implementation_model(self, implementation_model_uuid: str):
         """Removes an implementation model settings entry using the UUID.
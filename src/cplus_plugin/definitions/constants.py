@@ -7,6 +7,12 @@ Definitions for application constants.
 NCS_PATHWAY_SEGMENT = "ncs_pathways"
 NCS_CARBON_SEGMENT = "ncs_carbon"
 PRIORITY_LAYERS_SEGMENT = "priority_layers"
+ANALYSIS_CACHE_SEGMENT = "analysis_cache"
+ANALYSIS_STATE_FILE_NAME = "last_scenario_analysis.json"
+RASTER_STATISTICS_FILE_NAME = "raster_statistics.json"
+RUN_MANIFEST_FILE_NAME = "run_manifest.json"
+ANALYSIS_GRID_FILE_NAME = "analysis_grid.json"
+INPUT_WINDOWS_SEGMENT = "input_windows"
 
 # Naming for outputs sub-folder relative to base directory
 OUTPUTS_SEGMENT = "outputs"
@@ -44,6 +44,15 @@ REMOVE_LAYER_ICON_PATH = ":/plugins/cplus_plugin/cplus_right_arrow.svg"
 SCENARIO_OUTPUT_FILE_NAME = "cplus_scenario_output"
 SCENARIO_OUTPUT_LAYER_NAME = "scenario_result"
 
+# Maximum size of the analysis cache in megabytes
+DEFAULT_ANALYSIS_CACHE_SIZE = 2048
+
+# Largest width and height in pixels of the tiles computed by the analysis
+DEFAULT_ANALYSIS_TILE_SIZE = 1024
+
+# Memory in megabytes used by the analysis tiles and the GDAL cache
+DEFAULT_MEMORY_BUDGET = 2048
+
 STYLES_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__))) + "/styles/"
 LAYER_STYLES = {
     "scenario_result": STYLES_PATH + "0_default_scenario_style.qml",
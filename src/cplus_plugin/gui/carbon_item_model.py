@@ -6,10 +6,9 @@ import os
 import typing
 from pathlib import Path
 
-from qgis.core import QgsRasterLayer
-
 from qgis.PyQt import QtCore, QtGui
 
+from ..lib.layer_info import layer_info
 from ..utils import FileUtils, tr
 
 
@@ -53,8 +52,7 @@ class CarbonLayerItem(QtGui.QStandardItem):
 
         # Check validity
         if p.exists():
-            layer = QgsRasterLayer(layer_path)
-            if layer.isValid():
+            if layer_info(layer_path).valid:
                 self._is_valid = True
                 self.setIcon(QtGui.QIcon())
             else:
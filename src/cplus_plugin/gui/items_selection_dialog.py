@@ -66,7 +66,7 @@ class ItemsSelectionDialog(QtWidgets.QDialog, DialogUi):
 
     def set_items(self):
         """Sets the item list in the dialog"""
-        models = settings_manager.get_all_implementation_models()
+        models = settings_manager.get_implementation_models_snapshot().items
 
         for model in models:
             list_widget_item = QtWidgets.QListWidgetItem(model.name)
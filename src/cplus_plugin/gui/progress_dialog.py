@@ -128,6 +128,27 @@ class ProgressDialog(QtWidgets.QDialog, Ui_DlgProgress):
             except RuntimeError:
                 log(tr("Error setting value to a progress bar"), notify=False)
 
+    def update_remaining_time(self, seconds) -> None:
+        """Shows the estimated remaining time next to the progress value.
+
+        :param seconds: Remaining time in seconds, None only shows
+        the progress value.
+        :type seconds: float
+        """
+        if not self.progress_bar:
+            return
+
+        if seconds is None:
+            self.progress_bar.setFormat("%p%")
+            return
+
+        minutes, seconds = divmod(int(round(seconds)), 60)
+        if minutes:
+            remaining = tr("{} min {} s remaining").format(minutes, seconds)
+        else:
+            remaining = tr("{} s remaining").format(seconds)
+        self.progress_bar.setFormat(f"%p% - {remaining}")
+
     def change_status_message(self, message="Processing", entity="scenario") -> None:
         """Updates the status message
 
@@ -233,6 +254,7 @@ class ProgressDialog(QtWidgets.QDialog, Ui_DlgProgress):
         """Post-steps when processing were cancelled."""
 
         self.analysis_running = False
+        self.update_remaining_time(None)
 
         # Change cancel button to the close button status
         self.btn_cancel.setText(tr("Close"))
@@ -242,6 +264,7 @@ class ProgressDialog(QtWidgets.QDialog, Ui_DlgProgress):
         """Post-steps when processing succeeded."""
 
         self.analysis_running = False
+        self.update_remaining_time(None)
         self.change_status_message(self.analysis_finished_message)
 
         # Change cancel button to the close button status
@@ -10,10 +10,6 @@ import uuid
 
 import datetime
 
-from functools import partial
-
-from pathlib import Path
-
 from qgis.PyQt import (
     QtCore,
     QtGui,
@@ -32,12 +28,9 @@ from qgis.core import (
     QgsGeometry,
     QgsProject,
     QgsProcessing,
-    QgsProcessingAlgRunnerTask,
-    QgsProcessingContext,
     QgsProcessingFeedback,
     QgsRasterLayer,
     QgsRectangle,
-    QgsTask,
     QgsWkbTypes,
     QgsLayerTreeLayer,
 )
@@ -55,8 +48,10 @@ from .priority_group_widget import PriorityGroupWidget
 from .priority_layer_dialog import PriorityLayerDialog
 
 from ..models.base import Scenario, ScenarioResult, ScenarioState, SpatialExtent
+from ..models.helpers import clone_implementation_model
 from ..conf import settings_manager, Settings
 
+from ..lib.analysis.engine import create_analysis_context, ScenarioAnalysisTask
 from ..lib.reports.manager import report_manager
 
 from .components.custom_tree_widget import CustomTreeWidget
@@ -64,7 +59,6 @@ from .components.custom_tree_widget import CustomTreeWidget
 from ..resources import *
 
 from ..utils import (
-    clean_filename,
     open_documentation,
     tr,
     log,
@@ -79,15 +73,12 @@ from ..definitions.defaults import (
     ICON_PATH,
     QGIS_GDAL_PROVIDER,
     REMOVE_LAYER_ICON_PATH,
-    SCENARIO_OUTPUT_FILE_NAME,
     SCENARIO_OUTPUT_LAYER_NAME,
     USER_DOCUMENTATION_SITE,
     LAYER_STYLES,
     LAYER_STYLES_WEIGHTED,
 )
 from ..definitions.constants import (
-    NCS_CARBON_SEGMENT,
-    PRIORITY_LAYERS_SEGMENT,
     IM_GROUP_LAYER_NAME,
     IM_WEIGHTED_GROUP_NAME,
     NCS_PATHWAYS_GROUP_LAYER_NAME,
@@ -132,7 +123,6 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
         self.initialize_priority_layers()
 
         self.position_feedback = QgsProcessingFeedback()
-        self.processing_context = QgsProcessingContext()
 
         self.scenario_result = None
 
@@ -588,23 +578,19 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
         self.analysis_scenario_name = self.scenario_name.text()
         self.analysis_scenario_description = self.scenario_description.text()
 
-        self.position_feedback = QgsProcessingFeedback()
-        self.processing_context = QgsProcessingContext()
-
         for group in settings_manager.get_priority_groups():
             group_layer_dict = {
                 "name": group.get("name"),
                 "value": group.get("value"),
                 "layers": [],
             }
-            for layer in settings_manager.get_priority_layers():
-                group_names = [group.get("name") for group in layer.get("groups", [])]
-                if group.get("name") in group_names:
-                    group_layer_dict["layers"].append(layer.get("name"))
+            for layer in settings_manager.find_layers_by_group(group.get("name")):
+                group_layer_dict["layers"].append(layer.get("name"))
             self.analysis_priority_layers_groups.append(group_layer_dict)
 
+        # Copies are used since the analysis updates the model paths
         self.analysis_implementation_models = [
-            item.implementation_model
+            clone_implementation_model(item.implementation_model)
             for item in self.implementation_model_widget.selected_im_items()
         ]
 
@@ -708,29 +694,30 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
 
         self.processing_cancelled = False
 
-        self.run_pathways_analysis(
-            self.analysis_implementation_models,
-            self.analysis_priority_layers_groups,
-            self.analysis_extent,
-        )
-
-    def run_highest_position_analysis(self):
-        """Runs the highest position analysis which is last step
-        in scenario analysis. Uses the models set by the current ongoing
-        analysis.
+        self.run_scenario_analysis()
 
+    def run_scenario_analysis(self):
+        """Runs the scenario analysis task on the implementation models,
+        priority layers groups and extent set by the current analysis.
         """
         if self.processing_cancelled:
             # Will not proceed if processing has been cancelled by the user
             return
 
-        passed_extent_box = self.analysis_extent.bbox
-        passed_extent = QgsRectangle(
-            passed_extent_box[0],
-            passed_extent_box[2],
-            passed_extent_box[1],
-            passed_extent_box[3],
-        )
+        for model in self.analysis_implementation_models:
+            if not model.pathways and (model.path is None or model.path == ""):
+                self.show_message(
+                    tr(
+                        f"No defined model pathways or a"
+                        f" model layer for the model {model.name}"
+                    ),
+                    level=Qgis.Critical,
+                )
+                log(
+                    f"No defined model pathways or a "
+                    f"model layer for the model {model.name}"
+                )
+                return
 
         scenario = Scenario(
             uuid=uuid.uuid4(),
@@ -746,8 +733,6 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
         )
 
         try:
-            layers = {}
-
             self.progress_dialog.progress_bar.setMinimum(0)
             self.progress_dialog.progress_bar.setMaximum(100)
             self.progress_dialog.progress_bar.setValue(0)
@@ -755,85 +740,26 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
             self.progress_dialog.scenario_name = tr(f"<b>{scenario.name}</b>")
             self.progress_dialog.scenario_id = str(scenario.uuid)
             self.progress_dialog.change_status_message(
-                tr("Calculating the highest position")
+                tr("Processing calculations"), tr("implementation models")
             )
 
+            self.position_feedback = QgsProcessingFeedback()
             self.position_feedback.progressChanged.connect(self.update_progress_bar)
 
-            for model in self.analysis_implementation_models:
-                if model.path is not None and model.path is not "":
-                    raster_layer = QgsRasterLayer(model.path, model.name)
-                    layers[model.name] = (
-                        raster_layer if raster_layer is not None else None
-                    )
-                else:
-                    for pathway in model.pathways:
-                        layers[model.name] = QgsRasterLayer(pathway.path)
-
-            source_crs = QgsCoordinateReferenceSystem("EPSG:4326")
-            dest_crs = list(layers.values())[0].crs() if len(layers) > 0 else source_crs
-            transform = QgsCoordinateTransform(
-                source_crs, dest_crs, QgsProject.instance()
-            )
-            transformed_extent = transform.transformBoundingBox(passed_extent)
-
-            extent_string = (
-                f"{transformed_extent.xMinimum()},{transformed_extent.xMaximum()},"
-                f"{transformed_extent.yMinimum()},{transformed_extent.yMaximum()}"
-                f" [{dest_crs.authid()}]"
-            )
-
-            output_file = (
-                f"{self.scenario_directory}/"
-                f"{SCENARIO_OUTPUT_FILE_NAME}_{str(scenario.uuid)[:4]}.tif"
-            )
-
-            # Preparing the input rasters for the highest position
-            # analysis in a correct order
-
-            models_names = [model.name for model in self.analysis_implementation_models]
-            all_models_names = [
-                model.name
+            ordered_model_ids = [
+                str(model.uuid)
                 for model in self.implementation_model_widget.implementation_models()
             ]
-            sources = []
-
-            absolute_path = f"{FileUtils.plugin_dir()}/app_data/layers/null_raster.tif"
-            null_raster_file = os.path.normpath(absolute_path)
-
-            for model_name in all_models_names:
-                if model_name in models_names:
-                    sources.append(layers[model_name].source())
-                else:
-                    sources.append(null_raster_file)
-
-            log(f"Layers sources {[Path(source).stem for source in sources]}")
-
-            alg_params = {
-                "IGNORE_NODATA": True,
-                "INPUT_RASTERS": sources,
-                "EXTENT": extent_string,
-                "OUTPUT_NODATA_VALUE": -9999,
-                "REFERENCE_LAYER": list(layers.values())[0]
-                if len(layers) >= 1
-                else None,
-                "OUTPUT": output_file,
-            }
-
-            log(f"Used parameters for highest position analysis {alg_params}")
-
-            alg = QgsApplication.processingRegistry().algorithmById(
-                "native:highestpositioninrasterstack"
+            context = create_analysis_context(
+                scenario,
+                self.scenario_directory,
+                ordered_model_ids,
+                self.position_feedback,
             )
 
-            # self.processing_cancelled = False
-            self.task = QgsProcessingAlgRunnerTask(
-                alg,
-                alg_params,
-                self.processing_context,
-                feedback=self.position_feedback,
-            )
-            self.task.executed.connect(self.scenario_results)
+            self.task = ScenarioAnalysisTask(tr("Running scenario analysis"), context)
+            self.task.taskCompleted.connect(self.on_analysis_task_completed)
+            self.task.taskTerminated.connect(self.on_analysis_task_terminated)
             QgsApplication.taskManager().addTask(self.task)
 
         except Exception as err:
@@ -851,6 +777,24 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
                 )
             )
 
+    def on_analysis_task_completed(self):
+        """Slot raised when the scenario analysis task has
+        completed successfully.
+        """
+        self.scenario_results(True, self.task.result)
+
+    def on_analysis_task_terminated(self):
+        """Slot raised when the scenario analysis task has been
+        cancelled or has failed.
+        """
+        if self.processing_cancelled:
+            return
+
+        self.progress_dialog.change_status_message(
+            tr("Scenario analysis failed, check logs for more information.")
+        )
+        log(tr("Scenario analysis task failed."), info=False)
+
     def transform_extent(self, extent, source_crs, dest_crs):
         """Transforms the passed extent into the destination crs
 
@@ -869,951 +813,6 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
 
         return transformed_extent
 
-    def main_task(self):
-        """Serves as a QgsTask function for the main task that contains
-        smaller sub-tasks running the actual processing calculations.
-        """
-
-        log("Running from main task.")
-
-    def run_pathways_analysis(self, models, priority_layers_groups, extent):
-        """Runs the required model pathways analysis on the passed
-         implementation models. The analysis involves adding the pathways
-         carbon layers into the pathway layer.
-
-         If the pathway layer has more than one carbon layer, the resulting
-         weighted pathway will contain the sum of the pathway layer values
-         with the average of the pathway carbon layers values.
-
-        :param models: List of the selected implementation models
-        :type models: typing.List[ImplementationModel]
-
-        :param priority_layers_groups: Used priority layers groups and their values
-        :type priority_layers_groups: dict
-
-        :param extent: The selected extent from user
-        :type extent: SpatialExtent
-        """
-        if self.processing_cancelled:
-            # Will not proceed if processing has been cancelled by the user
-            return False
-
-        models_function = partial(
-            self.run_pathways_normalization, models, priority_layers_groups, extent
-        )
-        main_task = QgsTask.fromFunction(
-            "Main task for running pathways combination with carbon layers",
-            self.main_task,
-            on_finished=models_function,
-        )
-
-        main_task.taskCompleted.connect(models_function)
-
-        previous_sub_tasks = []
-
-        self.progress_dialog.analysis_finished_message = tr("Calculating carbon layers")
-        self.progress_dialog.scenario_name = tr(f"models pathways")
-        pathways = []
-        models_paths = []
-
-        for model in models:
-            if not model.pathways and (model.path is None or model.path is ""):
-                self.show_message(
-                    tr(
-                        f"No defined model pathways or a"
-                        f" model layer for the model {model.name}"
-                    ),
-                    level=Qgis.Critical,
-                )
-                log(
-                    f"No defined model pathways or a "
-                    f"model layer for the model {model.name}"
-                )
-                main_task.cancel()
-                return False
-            for pathway in model.pathways:
-                if not (pathway in pathways):
-                    pathways.append(pathway)
-
-            if model.path is not None and model.path is not "":
-                models_paths.append(model.path)
-
-        if not pathways and len(models_paths) > 0:
-            self.run_pathways_normalization(models, priority_layers_groups, extent)
-            return
-
-        new_carbon_directory = f"{self.scenario_directory}/pathways_carbon_layers"
-
-        suitability_index = float(
-            settings_manager.get_value(Settings.PATHWAY_SUITABILITY_INDEX, default=0)
-        )
-
-        carbon_coefficient = float(
-            settings_manager.get_value(Settings.CARBON_COEFFICIENT, default=0.0)
-        )
-
-        base_dir = settings_manager.get_value(Settings.BASE_DIR)
-
-        FileUtils.create_new_dir(new_carbon_directory)
-        pathway_count = 0
-
-        for pathway in pathways:
-            basenames = []
-            layers = []
-            path_basename = Path(pathway.path).stem
-            layers.append(pathway.path)
-
-            file_name = clean_filename(pathway.name.replace(" ", "_"))
-
-            output_file = (
-                f"{new_carbon_directory}/{file_name}_{str(uuid.uuid4())[:4]}.tif"
-            )
-
-            if suitability_index > 0:
-                basenames.append(f'{suitability_index} * "{path_basename}@1"')
-            else:
-                basenames.append(f'"{path_basename}@1"')
-
-            carbon_names = []
-
-            for carbon_path in pathway.carbon_paths:
-                if base_dir not in carbon_path:
-                    carbon_path = f"{base_dir}/{NCS_CARBON_SEGMENT}/{carbon_path}"
-                carbon_full_path = Path(carbon_path)
-                if not carbon_full_path.exists():
-                    continue
-                layers.append(carbon_path)
-                carbon_names.append(f'"{carbon_full_path.stem}@1"')
-
-            if len(carbon_names) == 1 and carbon_coefficient > 0:
-                basenames.append(f"{carbon_coefficient} * ({carbon_names[0]})")
-
-            # Setting up calculation to use carbon layers average when
-            # a pathway has more than one carbon layer.
-            if len(carbon_names) > 1 and carbon_coefficient > 0:
-                basenames.append(
-                    f"{carbon_coefficient} * ("
-                    f'({" + ".join(carbon_names)}) / '
-                    f"{len(pathway.carbon_paths)})"
-                )
-            expression = " + ".join(basenames)
-
-            box = QgsRectangle(
-                float(extent.bbox[0]),
-                float(extent.bbox[2]),
-                float(extent.bbox[1]),
-                float(extent.bbox[3]),
-            )
-
-            source_crs = QgsCoordinateReferenceSystem("EPSG:4326")
-            dest_crs = QgsRasterLayer(layers[0]).crs()
-            transform = QgsCoordinateTransform(
-                source_crs, dest_crs, QgsProject.instance()
-            )
-            transformed_extent = transform.transformBoundingBox(box)
-
-            extent_string = (
-                f"{transformed_extent.xMinimum()},{transformed_extent.xMaximum()},"
-                f"{transformed_extent.yMinimum()},{transformed_extent.yMaximum()}"
-                f" [{dest_crs.authid()}]"
-            )
-            analysis_done = partial(
-                self.pathways_analysis_done,
-                pathway_count,
-                models,
-                extent_string,
-                priority_layers_groups,
-                pathways,
-                pathway,
-                (pathway_count == len(pathways) - 1),
-            )
-
-            if carbon_coefficient <= 0 and suitability_index <= 0:
-                self.run_pathways_normalization(
-                    models, priority_layers_groups, extent_string
-                )
-                return
-
-            # Actual processing calculation
-            alg_params = {
-                "CELLSIZE": 0,
-                "CRS": None,
-                "EXPRESSION": expression,
-                "EXTENT": extent_string,
-                "LAYERS": layers,
-                "OUTPUT": output_file,
-            }
-
-            log(
-                f"Used parameters for combining pathways"
-                f" and carbon layers generation: {alg_params}"
-            )
-
-            alg = QgsApplication.processingRegistry().algorithmById(
-                "qgis:rastercalculator"
-            )
-
-            self.task = QgsProcessingAlgRunnerTask(
-                alg, alg_params, self.processing_context, self.position_feedback
-            )
-            self.position_feedback.progressChanged.connect(self.update_progress_bar)
-
-            main_task.addSubTask(
-                self.task, previous_sub_tasks, QgsTask.ParentDependsOnSubTask
-            )
-            previous_sub_tasks.append(self.task)
-            self.task.executed.connect(analysis_done)
-
-            pathway_count = pathway_count + 1
-
-        QgsApplication.taskManager().addTask(main_task)
-
-    def pathways_analysis_done(
-        self,
-        pathway_count,
-        models,
-        extent,
-        priority_layers_groups,
-        pathways,
-        pathway,
-        last_pathway,
-        success,
-        output,
-    ):
-        """Slot that handles post calculations for the models pathways and
-         carbon layers.
-
-        :param model_index: List index of the target model
-        :type model_index: int
-
-        :param pathway: Target pathway
-        :type pathway: NCSPathway
-
-        :param models: List of the selected implementation models
-        :type models: typing.List[ImplementationModel]
-
-        :param priority_layers_groups: Used priority layers
-        groups and their values
-        :type priority_layers_groups: dict
-
-        :param last_pathway: Whether the pathway is the last from
-         the models pathway list
-        :type last_pathway: bool
-
-        :param success: Whether the scenario analysis was successful
-        :type success: bool
-
-        :param output: Analysis output results
-        :type output: dict
-        """
-        if output is not None and output.get("OUTPUT") is not None:
-            pathway.path = output.get("OUTPUT")
-
-        if (pathway_count == len(pathways) - 1) and last_pathway:
-            self.run_pathways_normalization(models, priority_layers_groups, extent)
-
-    def run_pathways_normalization(self, models, priority_layers_groups, extent):
-        """Runs the normalization on the models pathways layers,
-        adjusting band values measured on different scale, the resulting scale
-        is computed using the below formula
-        Normalized_Pathway = (Carbon coefficient + Suitability index) * (
-                            (Model layer value) - (Model band minimum value)) /
-                            (Model band maximum value - Model band minimum value))
-
-        If the carbon coefficient and suitability index are both zero then
-        the computation won't take them into account in the normalization
-        calculation.
-
-        :param models: List of the analyzed implementation models
-        :type models: typing.List[ImplementationModel]
-
-        :param priority_layers_groups: Used priority layers groups and their values
-        :type priority_layers_groups: dict
-
-        :param extent: selected extent from user
-        :type extent: str
-        """
-        if self.processing_cancelled:
-            # Will not proceed if processing has been cancelled by the user
-            return False
-
-        pathway_count = 0
-
-        priority_function = partial(
-            self.run_models_analysis, models, priority_layers_groups, extent
-        )
-        main_task = QgsTask.fromFunction(
-            "Running pathways normalization",
-            self.main_task,
-            on_finished=priority_function,
-        )
-
-        previous_sub_tasks = []
-
-        self.progress_dialog.analysis_finished_message = tr("Normalization")
-        self.progress_dialog.scenario_name = tr("pathways")
-
-        pathways = []
-        models_paths = []
-
-        for model in models:
-            if not model.pathways and (model.path is None or model.path is ""):
-                self.show_message(
-                    tr(
-                        f"No defined model pathways or a"
-                        f" model layer for the model {model.name}"
-                    ),
-                    level=Qgis.Critical,
-                )
-                log(
-                    f"No defined model pathways or a "
-                    f"model layer for the model {model.name}"
-                )
-                main_task.cancel()
-                return False
-            for pathway in model.pathways:
-                if not (pathway in pathways):
-                    pathways.append(pathway)
-
-            if model.path is not None and model.path is not "":
-                models_paths.append(model.path)
-
-        if not pathways and len(models_paths) > 0:
-            self.run_models_analysis(models, priority_layers_groups, extent)
-            return
-
-        carbon_coefficient = float(
-            settings_manager.get_value(Settings.CARBON_COEFFICIENT, default=0.0)
-        )
-
-        suitability_index = float(
-            settings_manager.get_value(Settings.PATHWAY_SUITABILITY_INDEX, default=0)
-        )
-
-        normalization_index = carbon_coefficient + suitability_index
-
-        for pathway in pathways:
-            layers = []
-            new_ims_directory = f"{self.scenario_directory}/normalized_pathways"
-            FileUtils.create_new_dir(new_ims_directory)
-            file_name = clean_filename(pathway.name.replace(" ", "_"))
-
-            output_file = f"{new_ims_directory}/{file_name}_{str(uuid.uuid4())[:4]}.tif"
-
-            pathway_layer = QgsRasterLayer(pathway.path, pathway.name)
-            provider = pathway_layer.dataProvider()
-            band_statistics = provider.bandStatistics(1)
-
-            min_value = band_statistics.minimumValue
-            max_value = band_statistics.maximumValue
-
-            layer_name = Path(pathway.path).stem
-
-            layers.append(pathway.path)
-
-            if normalization_index > 0:
-                expression = (
-                    f" {normalization_index} * "
-                    f'("{layer_name}@1" - {min_value}) /'
-                    f" ({max_value} - {min_value})"
-                )
-            else:
-                expression = (
-                    f'("{layer_name}@1" - {min_value}) /'
-                    f" ({max_value} - {min_value})"
-                )
-
-            analysis_done = partial(
-                self.pathways_normalization_done,
-                pathway_count,
-                models,
-                extent,
-                priority_layers_groups,
-                pathways,
-                pathway,
-                (pathway_count == len(pathways) - 1),
-            )
-
-            # Actual processing calculation
-            alg_params = {
-                "CELLSIZE": 0,
-                "CRS": None,
-                "EXPRESSION": expression,
-                "EXTENT": extent,
-                "LAYERS": layers,
-                "OUTPUT": output_file,
-            }
-
-            log(f"Used parameters for normalization of the pathways: {alg_params}")
-
-            alg = QgsApplication.processingRegistry().algorithmById(
-                "qgis:rastercalculator"
-            )
-
-            self.task = QgsProcessingAlgRunnerTask(
-                alg, alg_params, self.processing_context, self.position_feedback
-            )
-
-            self.position_feedback.progressChanged.connect(self.update_progress_bar)
-
-            main_task.addSubTask(
-                self.task, previous_sub_tasks, QgsTask.ParentDependsOnSubTask
-            )
-            previous_sub_tasks.append(self.task)
-            self.task.executed.connect(analysis_done)
-
-            pathway_count = pathway_count + 1
-
-        QgsApplication.taskManager().addTask(main_task)
-
-    def pathways_normalization_done(
-        self,
-        pathway_count,
-        models,
-        extent,
-        priority_layers_groups,
-        pathways,
-        pathway,
-        last_pathway,
-        success,
-        output,
-    ):
-        """Slot that handles normalized pathways layers.
-
-        :param model_index: List index of the target model
-        :type model_index: int
-
-        :param pathway: Target pathway
-        :type pathway: NCSPathway
-
-        :param models: List of the selected implementation models
-        :type models: typing.List[ImplementationModel]
-
-        :param priority_layers_groups: Used priority layers
-        groups and their values
-        :type priority_layers_groups: dict
-
-        :param last_pathway: Whether the pathway is the last from
-         the models pathway list
-        :type last_pathway: bool
-
-        :param success: Whether the scenario analysis was successful
-        :type success: bool
-
-        :param output: Analysis output results
-        :type output: dict
-        """
-        if output is not None and output.get("OUTPUT") is not None:
-            pathway.path = output.get("OUTPUT")
-
-        if (pathway_count == len(pathways) - 1) and last_pathway:
-            self.run_models_analysis(models, priority_layers_groups, extent)
-
-    def run_models_analysis(self, models, priority_layers_groups, extent):
-        """Runs the required model analysis on the passed
-        implementation models.
-
-        :param models: List of the selected implementation models
-        :type models: typing.List[ImplementationModel]
-
-        :param priority_layers_groups: Used priority layers
-        groups and their values
-        :type priority_layers_groups: dict
-
-        :param extent: selected extent from user
-        :type extent: SpatialExtent
-        """
-        if self.processing_cancelled:
-            # Will not proceed if processing has been cancelled by the user
-            return False
-
-        model_count = 0
-
-        priority_function = partial(
-            self.run_normalization_analysis, models, priority_layers_groups, extent
-        )
-        main_task = QgsTask.fromFunction(
-            "Running main functions", self.main_task, on_finished=priority_function
-        )
-
-        previous_sub_tasks = []
-
-        self.progress_dialog.analysis_finished_message = tr("Processing calculations")
-        self.progress_dialog.scenario_name = tr("implementation models")
-
-        for model in models:
-            new_ims_directory = f"{self.scenario_directory}/implementation_models"
-            FileUtils.create_new_dir(new_ims_directory)
-            file_name = clean_filename(model.name.replace(" ", "_"))
-
-            layers = []
-            if not model.pathways and (model.path is None and model.path is ""):
-                self.show_message(
-                    tr(
-                        f"No defined model pathways or a"
-                        f" model layer for the model {model.name}"
-                    ),
-                    level=Qgis.Critical,
-                )
-                log(
-                    f"No defined model pathways or a "
-                    f"model layer for the model {model.name}"
-                )
-                main_task.cancel()
-                return False
-
-            output_file = f"{new_ims_directory}/{file_name}_{str(uuid.uuid4())[:4]}.tif"
-
-            # Due to the implementation models base class
-            # model only one of the following blocks will be executed,
-            # the implementation model either contain a path or
-            # pathways
-
-            if model.path is not None and model.path is not "":
-                layers = [model.path]
-
-            for pathway in model.pathways:
-                layers.append(pathway.path)
-
-            analysis_done = partial(
-                self.model_analysis_done,
-                model_count,
-                model,
-                models,
-                extent,
-                priority_layers_groups,
-            )
-
-            # Actual processing calculation
-
-            alg_params = {
-                "IGNORE_NODATA": True,
-                "INPUT": layers,
-                "EXTENT": extent,
-                "OUTPUT_NODATA_VALUE": -9999,
-                "REFERENCE_LAYER": layers[0] if len(layers) > 0 else None,
-                "STATISTIC": 0,  # Sum
-                "OUTPUT": output_file,
-            }
-
-            log(
-                f"Used parameters for "
-                f"implementation models generation: {alg_params}"
-            )
-
-            alg = QgsApplication.processingRegistry().algorithmById(
-                "native:cellstatistics"
-            )
-
-            self.task = QgsProcessingAlgRunnerTask(
-                alg, alg_params, self.processing_context, self.position_feedback
-            )
-
-            self.position_feedback.progressChanged.connect(self.update_progress_bar)
-
-            main_task.addSubTask(
-                self.task, previous_sub_tasks, QgsTask.ParentDependsOnSubTask
-            )
-            previous_sub_tasks.append(self.task)
-            self.task.executed.connect(analysis_done)
-
-            model_count = model_count + 1
-
-        QgsApplication.taskManager().addTask(main_task)
-
-    def model_analysis_done(
-        self,
-        model_index,
-        model,
-        models,
-        extent,
-        priority_layers_groups,
-        success,
-        output,
-    ):
-        """Slot that handles post calculations for the models layers
-
-        :param model_index: List index of the target model
-        :type model_index: int
-
-        :param model: Target implementation model
-        :type model: ImplementationModel
-
-        :param model: List of the selected implementation models
-        :type model: typing.List[ImplementationModel]
-
-        :param priority_layers_groups: Used priority layers groups
-         and their values
-        :type priority_layers_groups: dict
-
-        :param success: Whether the scenario analysis was successful
-        :type success: bool
-
-        :param output: Analysis output results
-        :type output: dict
-        """
-        if output is not None and output.get("OUTPUT") is not None:
-            model.path = output.get("OUTPUT")
-
-        if model_index == len(models) - 1:
-            self.run_normalization_analysis(models, priority_layers_groups, extent)
-
-    def run_normalization_analysis(self, models, priority_layers_groups, extent):
-        """Runs the normalization analysis on the models layers,
-        adjusting band values measured on different scale, the resulting scale
-        is computed using the below formula
-        Normalized_Model = (Carbon coefficient + Suitability index) * (
-                            (Model layer value) - (Model band minimum value)) /
-                            (Model band maximum value - Model band minimum value))
-
-        If the carbon coefficient and suitability index are both zero then
-        the computation won't take them into account in the normalization
-        calculation.
-
-        :param models: List of the analyzed implementation models
-        :type models: typing.List[ImplementationModel]
-
-        :param priority_layers_groups: Used priority layers groups and their values
-        :type priority_layers_groups: dict
-
-        :param extent: selected extent from user
-        :type extent: str
-        """
-        if self.processing_cancelled:
-            # Will not proceed if processing has been cancelled by the user
-            return False
-
-        model_count = 0
-
-        priority_function = partial(
-            self.run_priority_analysis, models, priority_layers_groups, extent
-        )
-        main_task = QgsTask.fromFunction(
-            "Running normalization", self.main_task, on_finished=priority_function
-        )
-
-        previous_sub_tasks = []
-
-        self.progress_dialog.analysis_finished_message = tr("Normalization")
-        self.progress_dialog.scenario_name = tr("implementation models")
-
-        for model in models:
-            if model.path is None or model.path is "":
-                if not self.processing_cancelled:
-                    self.show_message(
-                        tr(
-                            f"Problem when running models normalization, "
-                            f"there is no map layer for the model {model.name}"
-                        ),
-                        level=Qgis.Critical,
-                    )
-                    log(
-                        f"Problem when running models normalization, "
-                        f"there is no map layer for the model {model.name}"
-                    )
-                else:
-                    # If the user cancelled the processing
-                    self.show_message(
-                        tr(f"Processing has been cancelled by the user."),
-                        level=Qgis.Critical,
-                    )
-                    log(f"Processing has been cancelled by the user.")
-
-                main_task.cancel()
-                return False
-
-            basenames = []
-            layers = []
-            new_ims_directory = f"{self.scenario_directory}/normalized_ims"
-            FileUtils.create_new_dir(new_ims_directory)
-            file_name = clean_filename(model.name.replace(" ", "_"))
-
-            output_file = f"{new_ims_directory}/{file_name}_{str(uuid.uuid4())[:4]}.tif"
-
-            model_layer = QgsRasterLayer(model.path, model.name)
-            provider = model_layer.dataProvider()
-            band_statistics = provider.bandStatistics(1)
-
-            min_value = band_statistics.minimumValue
-            max_value = band_statistics.maximumValue
-
-            layer_name = Path(model.path).stem
-
-            layers.append(model.path)
-
-            carbon_coefficient = float(
-                settings_manager.get_value(Settings.CARBON_COEFFICIENT, default=0.0)
-            )
-
-            suitability_index = float(
-                settings_manager.get_value(
-                    Settings.PATHWAY_SUITABILITY_INDEX, default=0
-                )
-            )
-
-            normalization_index = carbon_coefficient + suitability_index
-
-            if normalization_index > 0:
-                expression = (
-                    f" {normalization_index} * "
-                    f'("{layer_name}@1" - {min_value}) /'
-                    f" ({max_value} - {min_value})"
-                )
-
-            else:
-                expression = (
-                    f'("{layer_name}@1" - {min_value}) /'
-                    f" ({max_value} - {min_value})"
-                )
-
-            analysis_done = partial(
-                self.normalization_analysis_done,
-                model_count,
-                model,
-                models,
-                extent,
-                priority_layers_groups,
-            )
-
-            # Actual processing calculation
-            alg_params = {
-                "CELLSIZE": 0,
-                "CRS": None,
-                "EXPRESSION": expression,
-                "EXTENT": extent,
-                "LAYERS": layers,
-                "OUTPUT": output_file,
-            }
-
-            log(f"Used parameters for normalization of the models: {alg_params}")
-
-            alg = QgsApplication.processingRegistry().algorithmById(
-                "qgis:rastercalculator"
-            )
-
-            self.task = QgsProcessingAlgRunnerTask(
-                alg, alg_params, self.processing_context, self.position_feedback
-            )
-
-            self.position_feedback.progressChanged.connect(self.update_progress_bar)
-
-            main_task.addSubTask(
-                self.task, previous_sub_tasks, QgsTask.ParentDependsOnSubTask
-            )
-            previous_sub_tasks.append(self.task)
-            self.task.executed.connect(analysis_done)
-
-            model_count = model_count + 1
-
-        QgsApplication.taskManager().addTask(main_task)
-
-    def normalization_analysis_done(
-        self,
-        model_index,
-        model,
-        models,
-        extent,
-        priority_layers_groups,
-        success,
-        output,
-    ):
-        """Slot that handles normalized models layers.
-
-        :param model_index: List index of the target model
-        :type model_index: int
-
-        :param model: Target implementation model
-        :type model: ImplementationModel
-
-        :param models: List of the selected implementation models
-        :type modesls: typing.List[ImplementationModel]
-
-        :param success: Whether the scenario analysis was successful
-        :type success: bool
-
-        :param output: Analysis output results
-        :type output: dict
-        """
-        if output is not None and output.get("OUTPUT") is not None:
-            model.path = output.get("OUTPUT")
-
-        if model_index == len(models) - 1:
-            self.run_priority_analysis(models, priority_layers_groups, extent)
-
-    def run_priority_analysis(self, models, priority_layers_groups, extent):
-        """Runs the required model analysis on the passed implementation models
-
-        :param models: List of the selected implementation models
-        :type models: typing.List[ImplementationModel]
-
-        :param priority_layers_groups: Used priority layers groups and their values
-        :type priority_layers_groups: dict
-
-        :param extent: selected extent from user
-        :type extent: SpatialExtent
-        """
-        model_count = 0
-
-        main_task = QgsTask.fromFunction(
-            "Running main task for priority layers weighting",
-            self.main_task,
-            on_finished=self.run_highest_position_analysis,
-        )
-
-        main_task.taskCompleted.connect(self.run_highest_position_analysis)
-
-        previous_sub_tasks = []
-
-        self.progress_dialog.analysis_finished_message = tr(f"Weighting")
-
-        self.progress_dialog.scenario_name = tr(f"implementation models")
-
-        for model in models:
-            if model.path is None or model.path is "":
-                self.show_message(
-                    tr(
-                        f"Problem when running models weighting, "
-                        f"there is no map layer for the model {model.name}"
-                    ),
-                    level=Qgis.Critical,
-                )
-                log(
-                    f"Problem when running models normalization, "
-                    f"there is no map layer for the model {model.name}"
-                )
-                main_task.cancel()
-
-                return False
-
-            basenames = []
-            layers = []
-            selected_layers = []
-
-            analysis_done = partial(
-                self.priority_layers_analysis_done, model_count, model, models
-            )
-            layers.append(model.path)
-            basenames.append(f'"{Path(model.path).stem}@1"')
-
-            if not any(priority_layers_groups):
-                log(
-                    f"There are defined priority layers in groups,"
-                    f" skipping models weighting step."
-                )
-                self.run_highest_position_analysis()
-                return
-
-            if model.priority_layers is None or model.priority_layers is []:
-                log(
-                    f"There are no associated "
-                    f"priority weighting layers for model {model.name}"
-                )
-                continue
-
-            settings_model = settings_manager.get_implementation_model(str(model.uuid))
-
-            for layer in settings_model.priority_layers:
-                settings_layer = settings_manager.get_priority_layer(layer.get("uuid"))
-                pwl = settings_layer.get("path")
-
-                missing_pwl_message = (
-                    f"Path {pwl} for priority "
-                    f"weighting layer {layer.get('name')} "
-                    f"doesn't exist, skipping the layer "
-                    f"from the model {model.name} weighting."
-                )
-                if pwl is None:
-                    log(missing_pwl_message)
-                    continue
-
-                pwl_path = Path(pwl)
-
-                if not pwl_path.exists():
-                    log(missing_pwl_message)
-                    continue
-
-                path_basename = pwl_path.stem
-
-                for priority_layer in settings_manager.get_priority_layers():
-                    if priority_layer.get("name") == layer.get("name"):
-                        for group in priority_layer.get("groups", []):
-                            value = group.get("value")
-                            coefficient = float(value)
-                            if coefficient > 0:
-                                if pwl not in layers:
-                                    layers.append(pwl)
-                                basenames.append(f'({coefficient}*"{path_basename}@1")')
-
-            if basenames is []:
-                return
-
-            new_ims_directory = f"{self.scenario_directory}/weighted_ims"
-
-            FileUtils.create_new_dir(new_ims_directory)
-
-            file_name = clean_filename(model.name.replace(" ", "_"))
-            output_file = f"{new_ims_directory}/{file_name}_{str(uuid.uuid4())[:4]}.tif"
-            expression = " + ".join(basenames)
-
-            # Actual processing calculation
-            alg_params = {
-                "CELLSIZE": 0,
-                "CRS": None,
-                "EXPRESSION": expression,
-                "EXTENT": extent,
-                "LAYERS": layers,
-                "OUTPUT": output_file,
-            }
-
-            log(f" Used parameters for calculating weighting models {alg_params}")
-
-            alg = QgsApplication.processingRegistry().algorithmById(
-                "qgis:rastercalculator"
-            )
-
-            self.task = QgsProcessingAlgRunnerTask(
-                alg, alg_params, self.processing_context, self.position_feedback
-            )
-
-            self.position_feedback.progressChanged.connect(self.update_progress_bar)
-
-            main_task.addSubTask(
-                self.task, previous_sub_tasks, QgsTask.ParentDependsOnSubTask
-            )
-            previous_sub_tasks.append(self.task)
-
-            self.task.executed.connect(analysis_done)
-
-            model_count = model_count + 1
-
-        QgsApplication.taskManager().addTask(main_task)
-
-    def priority_layers_analysis_done(
-        self, model_index, model, models, success, output
-    ):
-        """Slot that handles post calculations for the models priority layers
-
-        :param model_index: List index of the target model
-        :type model_index: int
-
-        :param model: Target implementation model
-        :type model: ImplementationModel
-
-        :param models: List of the selected implementation models
-        :type models: typing.List[ImplementationModel]
-
-        :param success: Whether the scenario analysis was successful
-        :type success: bool
-
-        :param output: Analysis output results
-        :type output: dict
-        """
-        if output is not None and output.get("OUTPUT") is not None:
-            model.path = output.get("OUTPUT")
-
-        if model_index == len(models) - 1:
-            self.run_highest_position_analysis()
-
     def cancel_processing_task(self):
         """Cancels the current processing task."""
         self.processing_cancelled = True
@@ -1915,6 +914,13 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
                 else None
             )
             pathways_group = scenario_group.addGroup(tr(NCS_PATHWAYS_GROUP_LAYER_NAME))
+            # Normalized pathways of the run, only saved when all the
+            # intermediate layers are kept.
+            normalized_pathways = (
+                self.task.normalized_pathway_outputs
+                if isinstance(self.task, ScenarioAnalysisTask)
+                else {}
+            )
 
             # Group settings
             im_group.setExpanded(False)
@@ -1974,7 +980,10 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
                     pw_index = 0
                     for pathway in list_pathways:
                         try:
-                            # pathway_name = pathway.name
+                            # The pathway input layer is added when its
+                            # normalized layer has not been saved.
+                            if pathway.uuid in normalized_pathways:
+                                pathway.path = normalized_pathways[pathway.uuid]
                             pathway_layer = pathway.to_map_layer()
 
                             added_pw_layer = qgis_instance.addMapLayer(pathway_layer)
@@ -2025,7 +1034,6 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
             # Not doing this breaks the processing if a user tries to run
             # the processing after cancelling or if the processing fails
             self.position_feedback = QgsProcessingFeedback()
-            self.processing_context = QgsProcessingContext()
 
     def update_progress_bar(self, value):
         """Sets the value of the progress bar
@@ -2036,6 +1044,10 @@ class QgisCplusMain(QtWidgets.QDockWidget, WidgetUi):
         if self.progress_dialog and not self.processing_cancelled:
             try:
                 self.progress_dialog.update_progress_bar(int(value))
+                if isinstance(self.task, ScenarioAnalysisTask):
+                    self.progress_dialog.update_remaining_time(
+                        self.task.remaining_time if value < 100 else None
+                    )
             except RuntimeError:
                 log(tr("Error setting value to a progress bar"), notify=False)
 
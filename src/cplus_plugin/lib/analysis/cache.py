@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache of the scenario analysis intermediates.
+
+Entries are keyed by a hash of the identity of the input files, the
+analysis parameters and the analysis grid so that scenario runs with
+similar inputs can reuse the statistics and rasters of previous runs.
+"""
+import collections
+import hashlib
+import json
+import os
+import shutil
+import threading
+import typing
+
+from ...utils import log
+
+
+def file_identity(path: str) -> typing.List:
+    """Returns the values that identify the current contents of a file
+    without reading it i.e. the absolute path, modification time and size.
+
+    :param path: Path to the file.
+    :type path: str
+
+    :returns: Absolute path, modification time in nanoseconds and size
+    in bytes of the file. Time and size are None if the file does
+    not exist.
+    :rtype: list
+    """
+    abs_path = os.path.abspath(path)
+    try:
+        stat = os.stat(abs_path)
+    except OSError:
+        return [abs_path, None, None]
+
+    return [abs_path, stat.st_mtime_ns, stat.st_size]
+
+
+def cache_key(*parts) -> str:
+    """Hashes the JSON serializable parts into a cache key.
+
+    :param parts: Values that determine the contents of a cache entry.
+    :type parts: tuple
+
+    :returns: Hexadecimal SHA-256 digest of the parts.
+    :rtype: str
+    """
+    content = json.dumps(parts, sort_keys=True, default=str)
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Stores band statistics and rasters in a directory, the least
+    recently used entries are evicted once the total size of the
+    directory exceeds the maximum size.
+    """
+
+    STATISTICS_SEGMENT = "statistics"
+    RASTERS_SEGMENT = "rasters"
+
+    def __init__(self, directory: str, max_size: int):
+        self._directory = directory
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._lookups = collections.Counter()
+        os.makedirs(self._statistics_dir, exist_ok=True)
+        os.makedirs(self._rasters_dir, exist_ok=True)
+
+    @property
+    def directory(self) -> str:
+        """Returns the cache directory.
+
+        :returns: Path of the cache directory.
+        :rtype: str
+        """
+        return self._directory
+
+    def lookup_counts(self) -> typing.Dict[str, int]:
+        """Returns the number of entries found and not found in the cache.
+
+        :returns: Number of statistics_hits, statistics_misses,
+        raster_hits and raster_misses.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                name: self._lookups[name]
+                for name in (
+                    "statistics_hits",
+                    "statistics_misses",
+                    "raster_hits",
+                    "raster_misses",
+                )
+            }
+
+    @property
+    def _statistics_dir(self) -> str:
+        return os.path.join(self._directory, self.STATISTICS_SEGMENT)
+
+    @property
+    def _rasters_dir(self) -> str:
+        return os.path.join(self._directory, self.RASTERS_SEGMENT)
+
+    def _statistics_path(self, key: str) -> str:
+        return os.path.join(self._statistics_dir, f"{key}.json")
+
+    def raster_path(self, key: str) -> str:
+        """Returns the path of the cached raster with the given key.
+
+        :param key: Cache key of the raster.
+        :type key: str
+
+        :returns: Path of the raster in the cache, the file
+        might not exist.
+        :rtype: str
+        """
+        return os.path.join(self._rasters_dir, f"{key}.tif")
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """Marks the entry as recently used.
+
+        :returns: False if the entry does not exist else True.
+        :rtype: bool
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            return False
+
+        return True
+
+    @staticmethod
+    def _remove_partial(path: str):
+        """Removes the partial file of an entry that could not be added."""
+        try:
+            os.remove(path)
+        except OSError:
+            # The file was not created
+            pass
+
+    def get_statistics(self, key: str) -> typing.Optional[typing.Dict]:
+        """Returns the cached statistics with the given key.
+
+        :param key: Cache key of the statistics.
+        :type key: str
+
+        :returns: Statistics or None if there is no cache entry.
+        :rtype: dict
+        """
+        path = self._statistics_path(key)
+        with self._lock:
+            if not self._touch(path):
+                self._lookups["statistics_misses"] += 1
+                return None
+            try:
+                with open(path) as stats_file:
+                    statistics = json.load(stats_file)
+            except (OSError, ValueError) as ex:
+                log(f"Invalid analysis cache entry {path}, {ex}", info=False)
+                self._lookups["statistics_misses"] += 1
+                return None
+            self._lookups["statistics_hits"] += 1
+
+            return statistics
+
+    def put_statistics(self, key: str, statistics: typing.Dict):
+        """Adds the statistics to the cache.
+
+        :param key: Cache key of the statistics.
+        :type key: str
+
+        :param statistics: JSON serializable statistics.
+        :type statistics: dict
+        """
+        path = self._statistics_path(key)
+        with self._lock:
+            try:
+                with open(f"{path}.part", "w") as stats_file:
+                    json.dump(statistics, stats_file)
+                os.replace(f"{path}.part", path)
+            except Exception:
+                self._remove_partial(f"{path}.part")
+                raise
+
+    def get_raster(self, key: str) -> typing.Optional[str]:
+        """Returns the path of the cached raster with the given key.
+
+        :param key: Cache key of the raster.
+        :type key: str
+
+        :returns: Path of the raster or None if there is no cache entry.
+        :rtype: str
+        """
+        path = self.raster_path(key)
+        with self._lock:
+            if not self._touch(path):
+                self._lookups["raster_misses"] += 1
+                return None
+            self._lookups["raster_hits"] += 1
+
+            return path
+
+    def put_raster(self, key: str, path: str):
+        """Adds a copy of the raster to the cache. The entry is not
+        linked to the raster so that marking it as recently used or
+        updating the raster does not change the other file.
+
+        :param key: Cache key of the raster.
+        :type key: str
+
+        :param path: Path of the raster to be cached.
+        :type path: str
+        """
+        cache_path = self.raster_path(key)
+        with self._lock:
+            try:
+                shutil.copyfile(path, f"{cache_path}.part")
+                os.replace(f"{cache_path}.part", cache_path)
+            except Exception:
+                self._remove_partial(f"{cache_path}.part")
+                raise
+
+    def evict(self):
+        """Removes the least recently used entries until the cache
+        size is within the maximum size.
+        """
+        with self._lock:
+            entries = []
+            total_size = 0
+            for entry_dir in (self._statistics_dir, self._rasters_dir):
+                for entry in os.scandir(entry_dir):
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total_size += stat.st_size
+
+            for _, size, path in sorted(entries):
+                if total_size <= self._max_size:
+                    break
+                try:
+                    os.remove(path)
+                    total_size -= size
+                except OSError as ex:
+                    log(f"Unable to remove analysis cache entry {path}, {ex}")
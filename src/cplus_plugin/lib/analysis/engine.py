@@ -0,0 +1,1974 @@
+# -*- coding: utf-8 -*-
+"""
+Tiled scenario analysis engine.
+
+Fuses the carbon weighting, normalization, cell sum, priority weighting
+and highest position stages of the scenario analysis into a single
+computation that streams the input rasters tile by tile and only writes
+the implementation models and scenario output to disk.
+"""
+from concurrent import futures
+import dataclasses
+import datetime
+from functools import partial
+import math
+import os
+from pathlib import Path
+import threading
+import traceback
+import typing
+import uuid
+
+import numpy as np
+from osgeo import gdal
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsFeedback,
+    QgsProject,
+    QgsRectangle,
+    QgsTask,
+)
+
+from ...conf import settings_manager, Settings
+from ...definitions.constants import (
+    ANALYSIS_CACHE_SEGMENT,
+    ANALYSIS_STATE_FILE_NAME,
+    INPUT_WINDOWS_SEGMENT,
+    RASTER_STATISTICS_FILE_NAME,
+    RUN_MANIFEST_FILE_NAME,
+    ANALYSIS_GRID_FILE_NAME,
+)
+from ...definitions.defaults import (
+    DEFAULT_ANALYSIS_CACHE_SIZE,
+    DEFAULT_ANALYSIS_TILE_SIZE,
+    DEFAULT_IMPLEMENTATION_MODEL_PIXEL_VALUES,
+    DEFAULT_MEMORY_BUDGET,
+    SCENARIO_OUTPUT_FILE_NAME,
+)
+from ...models.analysis import (
+    AnalysisContext,
+    IntermediateOutputs,
+    output_profile,
+    OutputProfile,
+    PriorityWeight,
+)
+from ...models.base import ImplementationModel, NcsPathway, Scenario
+from ...utils import clean_filename, FileUtils, log, tr
+from .cache import AnalysisCache, cache_key, file_identity
+from .grid import (
+    is_aligned,
+    save_grid,
+    snapped_grid,
+    warp_to_grid,
+    window_file_name,
+)
+from .kernels import (
+    BandStatistics,
+    create_window,
+    existing_carbon_paths,
+    GRID_ALIGNMENT,
+    ModelInputs,
+    MODEL_STATISTICS,
+    NODATA_VALUE,
+    OUTPUTS,
+    PATHWAY_STATISTICS,
+    process_tile,
+    RasterGrid,
+    Tile,
+    TileProcessor,
+)
+from .manifest import (
+    environment,
+    process_peak_rss,
+    RunMetrics,
+    save_run_manifest,
+)
+from .memory import GdalCacheReservation, memory_plan, MemoryPlan, tile_pixel_bytes
+from .progress import ProgressAggregator
+from .scheduler import default_worker_count, TaskGraph, TaskNode
+from .state import AnalysisState, load_analysis_state, save_analysis_state
+from .statistics import save_statistics_manifest, set_band_statistics
+from .tiles import create_process_pool, grid_tiles
+
+# No data value of the UInt8 scenario output
+SCENARIO_NODATA_VALUE = 255
+
+# Seconds between the checks for cancellation while waiting for tiles
+CANCEL_POLL_INTERVAL = 0.1
+
+
+def model_pixel_values(
+    models: typing.List[ImplementationModel], ordered_model_ids: typing.List[str]
+) -> typing.Dict[str, int]:
+    """Returns the scenario output pixel value of each implementation
+    model. Default models use their value in
+    DEFAULT_IMPLEMENTATION_MODEL_PIXEL_VALUES so that the output matches
+    the scenario style and report, other models are numbered after the
+    default values in the order of the implementation models list.
+
+    :param models: Implementation models in the scenario.
+    :type models: list
+
+    :param ordered_model_ids: UUIDs of all the implementation models
+    in the order they are listed.
+    :type ordered_model_ids: list
+
+    :returns: Pixel values indexed by implementation model UUID.
+    :rtype: dict
+    """
+    model_ids = [str(model.uuid) for model in models]
+    pixel_values = {
+        model_id: DEFAULT_IMPLEMENTATION_MODEL_PIXEL_VALUES[model_id]
+        for model_id in model_ids
+        if model_id in DEFAULT_IMPLEMENTATION_MODEL_PIXEL_VALUES
+    }
+
+    next_value = max(DEFAULT_IMPLEMENTATION_MODEL_PIXEL_VALUES.values()) + 1
+    for model_id in ordered_model_ids:
+        if model_id not in model_ids or model_id in pixel_values:
+            continue
+        pixel_values[model_id] = next_value
+        next_value += 1
+
+    # Models missing from the ordered list
+    for model_id in model_ids:
+        if model_id not in pixel_values:
+            pixel_values[model_id] = next_value
+            next_value += 1
+
+    return pixel_values
+
+
+def model_priority_weights(
+    model: ImplementationModel, group_values: typing.Dict[str, float] = None
+) -> typing.List[PriorityWeight]:
+    """Resolves the priority weighting layers of the implementation model
+    and the coefficients of the priority groups they belong to.
+
+    :param model: Implementation model whose weights are to be resolved.
+    :type model: ImplementationModel
+
+    :param group_values: Coefficients indexed by priority group name that
+    are used in place of the values in the settings.
+    :type group_values: dict
+
+    :returns: Priority weights for layers that exist and whose group
+    coefficients are greater than zero.
+    :rtype: list
+    """
+    weights = []
+    settings_model = settings_manager.get_implementation_model(str(model.uuid))
+    if settings_model is None:
+        return weights
+
+    for layer in settings_model.priority_layers:
+        settings_layer = settings_manager.get_priority_layer(layer.get("uuid"))
+        pwl = settings_layer.get("path")
+        if pwl is None or not Path(pwl).exists():
+            log(
+                f"Path {pwl} for priority "
+                f"weighting layer {layer.get('name')} "
+                f"doesn't exist, skipping the layer "
+                f"from the model {model.name} weighting."
+            )
+            continue
+
+        priority_layer = settings_manager.find_layer_by_name(layer.get("name"))
+        if priority_layer is None:
+            continue
+        for group in priority_layer.get("groups", []):
+            coefficient = float(
+                (group_values or {}).get(group.get("name"), group.get("value"))
+            )
+            if coefficient > 0:
+                weights.append(PriorityWeight(pwl, coefficient))
+
+    return weights
+
+
+def supported_profile(profile: OutputProfile) -> OutputProfile:
+    """Checks that the GDAL build supports the profile, unsupported
+    compression falls back to DEFLATE and COG to tiled GeoTIFF.
+
+    :param profile: Output profile.
+    :type profile: OutputProfile
+
+    :returns: Profile supported by GDAL.
+    :rtype: OutputProfile
+    """
+    if profile.cog and gdal.GetDriverByName("COG") is None:
+        log("COG driver not available, writing tiled GeoTIFF outputs.", info=False)
+        profile = dataclasses.replace(profile, cog=False, tiled=True)
+
+    options = gdal.GetDriverByName("GTiff").GetMetadataItem("DMD_CREATIONOPTIONLIST")
+    if profile.compression not in ("", "NONE") and profile.compression not in (
+        options or ""
+    ):
+        log(
+            f"{profile.compression} compression not available, "
+            f"using DEFLATE compression.",
+            info=False,
+        )
+        profile = dataclasses.replace(profile, compression="DEFLATE")
+
+    return profile
+
+
+def create_analysis_context(
+    scenario: Scenario,
+    scenario_directory: str,
+    ordered_model_ids: typing.List[str],
+    feedback: QgsFeedback = None,
+) -> AnalysisContext:
+    """Creates the analysis context for the scenario using the
+    values in the plugin settings.
+
+    :param scenario: Scenario to be analyzed.
+    :type scenario: Scenario
+
+    :param scenario_directory: Directory where the outputs will be saved.
+    :type scenario_directory: str
+
+    :param ordered_model_ids: UUIDs of all the implementation models
+    in the order that determines the highest position output values.
+    :type ordered_model_ids: list
+
+    :param feedback: Feedback for progress and cancelling the analysis.
+    :type feedback: QgsFeedback
+
+    :returns: Analysis context for the scenario.
+    :rtype: AnalysisContext
+    """
+    # Group values of the scenario take precedence over those saved
+    # with the priority layers.
+    group_values = {
+        group.get("name"): group.get("value")
+        for group in scenario.priority_layer_groups
+        if group.get("value") is not None
+    }
+    priority_weights = {}
+    for model in scenario.models:
+        priority_weights[str(model.uuid)] = model_priority_weights(model, group_values)
+
+    base_dir = settings_manager.get_value(Settings.BASE_DIR, "")
+    cache_size = int(
+        settings_manager.get_value(
+            Settings.ANALYSIS_CACHE_SIZE, default=DEFAULT_ANALYSIS_CACHE_SIZE
+        )
+    )
+
+    return AnalysisContext(
+        scenario=scenario,
+        scenario_directory=scenario_directory,
+        base_dir=base_dir,
+        carbon_coefficient=float(
+            settings_manager.get_value(Settings.CARBON_COEFFICIENT, default=0.0)
+        ),
+        suitability_index=float(
+            settings_manager.get_value(Settings.PATHWAY_SUITABILITY_INDEX, default=0)
+        ),
+        ordered_model_ids=ordered_model_ids,
+        priority_weights=priority_weights,
+        apply_weighting=any(scenario.priority_layer_groups),
+        feedback=feedback or QgsFeedback(),
+        max_workers=int(
+            settings_manager.get_value(Settings.ANALYSIS_MAX_WORKERS, default=0)
+        )
+        or None,
+        tile_size=int(
+            settings_manager.get_value(
+                Settings.ANALYSIS_TILE_SIZE, default=DEFAULT_ANALYSIS_TILE_SIZE
+            )
+        ),
+        use_processes=settings_manager.get_value(
+            Settings.ANALYSIS_USE_PROCESSES, default=False, setting_type=bool
+        ),
+        memory_budget=int(
+            settings_manager.get_value(
+                Settings.MEMORY_BUDGET_MB, default=DEFAULT_MEMORY_BUDGET
+            )
+        )
+        * 1024
+        * 1024,
+        cache_directory=f"{base_dir}/{ANALYSIS_CACHE_SEGMENT}" if base_dir else None,
+        cache_size=cache_size * 1024 * 1024,
+        state_path=f"{base_dir}/{ANALYSIS_STATE_FILE_NAME}" if base_dir else None,
+        intermediate_outputs=IntermediateOutputs(
+            int(
+                settings_manager.get_value(
+                    Settings.INTERMEDIATE_OUTPUTS, default=IntermediateOutputs.MEMORY
+                )
+            )
+        ),
+        output_profile=output_profile(),
+    )
+
+
+class ScenarioAnalysisTask(QgsTask):
+    """Proxy class for running the scenario analysis in a background task."""
+
+    def __init__(self, description: str, context: AnalysisContext):
+        super().__init__(description)
+        self._context = context
+        self._engine = ScenarioAnalysisEngine(self._context)
+
+    @property
+    def context(self) -> AnalysisContext:
+        """Returns the analysis context used by the engine.
+
+        :returns: Analysis context object used by the engine.
+        :rtype: AnalysisContext
+        """
+        return self._context
+
+    @property
+    def result(self) -> typing.Dict:
+        """Returns the analysis outputs.
+
+        :returns: Analysis outputs with the path of the scenario
+        output under the 'OUTPUT' key or None if the analysis
+        did not complete.
+        :rtype: dict
+        """
+        return self._engine.output
+
+    @property
+    def remaining_time(self) -> typing.Optional[float]:
+        """Returns the estimated time needed to complete the analysis.
+
+        :returns: Remaining time in seconds or None if it cannot be
+        estimated yet.
+        :rtype: float
+        """
+        return self._engine.progress.remaining_time
+
+    @property
+    def normalized_pathway_outputs(self) -> typing.Dict:
+        """Returns the normalized pathway rasters saved by the analysis.
+
+        :returns: Paths of the normalized pathways indexed by pathway
+        UUID, empty unless all the intermediate layers are saved.
+        :rtype: dict
+        """
+        return self._engine.normalized_pathway_outputs
+
+    def cancel(self):
+        """Cancel the scenario analysis task."""
+        if self._context.feedback:
+            self._context.feedback.cancel()
+
+        super().cancel()
+
+    def run(self) -> bool:
+        """Runs the scenario analysis.
+
+        :returns: True if the analysis succeeded else False.
+        :rtype: bool
+        """
+        if self.isCanceled():
+            return False
+
+        return self._engine.run()
+
+
+class ScenarioAnalysisEngine:
+    """Computes the scenario outputs from the NCS pathways, carbon
+    layers, implementation model layers and priority weighting layers.
+
+    Normalization requires the minimum and maximum values of the
+    carbon weighted pathways and implementation models hence the
+    inputs are streamed three times: pathway statistics, implementation
+    model statistics and finally the outputs. Intermediate rasters
+    are only kept in memory for the current tile.
+
+    When the analysis cache is enabled, statistics and normalized or
+    weighted implementation models computed from identical inputs in
+    previous runs are reused and the stages that produce them skipped.
+    Normalized models of the last run are also reused when only the
+    priority weights have changed.
+
+    All the stages read the inputs on a single analysis grid defined by
+    the scenario extent and the first layer, which is saved in the
+    scenario directory. Inputs that are not aligned to the grid are
+    warped once by grid alignment sub-tasks before the sub-tasks that
+    read them, the warped inputs are also reused from the cache.
+
+    Each pass is split into independent sub-tasks that are run by a
+    TaskGraph: the statistics of each pathway, the statistics of each
+    model once its pathways are done and the outputs in chunks of
+    tiles once all the model statistics are available. The outputs stage
+    normalizes, weights and compares the models in a single pass over
+    each tile, reading the priority weighting layers shared by the models
+    once. Each sub-task is run exactly once and records its status
+    and timings. The tiles are
+    computed by a TileProcessor in the sub-task threads or, if enabled,
+    in a pool of worker processes. The tile size, the number of tiles in
+    flight and the GDAL cache size are picked to fit the memory budget.
+    The timings, bytes read and written, cache lookups and peak memory
+    of each run are saved in a manifest in the scenario directory.
+    """
+
+    def __init__(self, context: AnalysisContext):
+        self._context = context
+        self._feedback = context.feedback
+        self._grid = None
+        # Windows of the input layers on the grid indexed by layer path
+        self._windows = {}
+        # Layers warped to the grid indexed by the path of the source layer
+        self._alignments = {}
+        # Paths of the windows created in the scenario directory
+        self._window_outputs = []
+        # Cache keys and cached rasters of the layers warped to the grid
+        self._alignment_keys = {}
+        self._aligned_sources = {}
+        self._processor = None
+        self._pool = None
+        self._graph = None
+        self._memory_plan = None
+        # Limits the tiles being computed or written at the same time
+        self._tile_slots = None
+        self._pathways = []
+        self._pathway_stats = {}
+        self._model_stats = {}
+        # Output datasets and their statistics indexed by path
+        self._outputs = {}
+        # Paths of all the outputs created, removed if the analysis stops
+        self._created_outputs = []
+        self._output_stats = {}
+        # Paths of the outputs being computed
+        self._model_outputs = {}
+        self._scenario_output = None
+        self._output_nodata = {}
+        self._output_floating_point = {}
+        self._pixel_values = {}
+        self._position_values = None
+        self._cache = None
+        self._pathway_keys = {}
+        self._model_keys = {}
+        self._weighted_keys = {}
+        # Cached rasters used in place of computing the models
+        self._normalized_sources = {}
+        self._weighted_sources = {}
+        self._previous_state = None
+        # Normalized models written in this run
+        self._normalized_outputs = {}
+        self._normalized_paths = {}
+        # Intermediate layers saved for auditing
+        self._carbon_pathway_outputs = {}
+        self._normalized_pathway_outputs = {}
+        self._implementation_model_outputs = {}
+        self._output = None
+        self._progress = ProgressAggregator(self._feedback)
+        self._metrics = RunMetrics()
+        self._started = None
+        self._tile_count = 0
+        self._used_processes = False
+        self._write_lock = threading.Lock()
+        self._profile = supported_profile(context.output_profile)
+
+    @property
+    def context(self) -> AnalysisContext:
+        """Returns the analysis context.
+
+        :returns: Analysis context used by the engine.
+        :rtype: AnalysisContext
+        """
+        return self._context
+
+    @property
+    def output(self) -> typing.Dict:
+        """Returns the analysis outputs.
+
+        :returns: Analysis outputs or None if the analysis has
+        not completed successfully.
+        :rtype: dict
+        """
+        return self._output
+
+    @property
+    def tasks(self) -> typing.List[TaskNode]:
+        """Returns the sub-tasks of the analysis with their status
+        and timings.
+
+        :returns: Sub-tasks in the order they were added, empty if
+        the analysis has not been run.
+        :rtype: list
+        """
+        return self._graph.nodes if self._graph is not None else []
+
+    @property
+    def progress(self) -> ProgressAggregator:
+        """Returns the overall progress of the analysis stages.
+
+        :returns: Progress of the analysis with the estimated
+        remaining time.
+        :rtype: ProgressAggregator
+        """
+        return self._progress
+
+    def stage_timings(self) -> typing.Dict[str, float]:
+        """Returns the time taken by each stage of the analysis.
+
+        :returns: Duration in seconds indexed by stage name i.e.
+        pathway_statistics, model_statistics and outputs.
+        :rtype: dict
+        """
+        return self._graph.stage_timings() if self._graph is not None else {}
+
+    @property
+    def models(self) -> typing.List[ImplementationModel]:
+        """Returns the implementation models being analyzed.
+
+        :returns: Implementation models in the scenario.
+        :rtype: list
+        """
+        return self._context.scenario.models
+
+    def run(self) -> bool:
+        """Runs the analysis.
+
+        :returns: True if the analysis completed successfully else False.
+        :rtype: bool
+        """
+        success = False
+        self._started = datetime.datetime.now().isoformat(timespec="seconds")
+        self._metrics.start()
+        try:
+            success = self._run()
+        except Exception as ex:
+            log(f"Error running scenario analysis: {ex}", info=False)
+            log(traceback.format_exc(), info=False)
+        finally:
+            if self._pool is not None:
+                # Worker processes exit once their current tile is done,
+                # there is no need to wait for them if the analysis stopped.
+                self._pool.shutdown(wait=success, cancel_futures=True)
+                self._pool = None
+            self._processor = None
+            # Closes the output datasets
+            self._outputs = {}
+            if not success:
+                self._remove_partial_outputs()
+            if (
+                not success
+                or self._context.intermediate_outputs != IntermediateOutputs.KEEP_ALL
+            ):
+                self._remove_input_windows()
+            self._metrics.stop()
+            save_run_manifest(self.manifest_path, self._run_manifest(success))
+
+        return success
+
+    @property
+    def manifest_path(self) -> str:
+        """Returns the path of the run manifest.
+
+        :returns: Path of the manifest in the scenario directory.
+        :rtype: str
+        """
+        return f"{self._context.scenario_directory}/{RUN_MANIFEST_FILE_NAME}"
+
+    @property
+    def normalized_pathway_outputs(self) -> typing.Dict:
+        """Returns the normalized pathway rasters saved by the run.
+
+        :returns: Paths of the normalized pathways indexed by pathway
+        UUID, empty unless all the intermediate layers are saved.
+        :rtype: dict
+        """
+        return dict(self._normalized_pathway_outputs)
+
+    @property
+    def normalized_models(self) -> typing.Dict[str, typing.Tuple[str, str]]:
+        """Returns the normalized implementation models of the run.
+
+        :returns: Cache key and path of the normalized models indexed
+        by model UUID, empty if the analysis has not completed
+        successfully.
+        :rtype: dict
+        """
+        if self._output is None:
+            return {}
+
+        return {
+            str(model_uuid): (self._model_keys[model_uuid], path)
+            for model_uuid, path in self._normalized_paths.items()
+        }
+
+    def _run_manifest(self, success: bool) -> typing.Dict:
+        """Collects the timings, bytes read and written, cache lookups,
+        peak memory and settings of the run.
+
+        :param success: Whether the analysis completed successfully.
+        :type success: bool
+
+        :returns: JSON serializable run details.
+        :rtype: dict
+        """
+        context = self._context
+        tasks = {task.name: task for task in self.tasks}
+        stage_timings = self.stage_timings()
+
+        output_sizes = [
+            os.path.getsize(path)
+            for path in self._created_outputs
+            if os.path.exists(path)
+        ]
+        stages = {}
+        for stage in (GRID_ALIGNMENT, PATHWAY_STATISTICS, MODEL_STATISTICS, OUTPUTS):
+            stage_tasks = [task for task in tasks.values() if task.stage == stage]
+            if not stage_tasks:
+                continue
+            stages[stage] = {
+                "tasks": len(stage_tasks),
+                "wall_time": stage_timings.get(stage, 0.0),
+                "cpu_time": sum(task.cpu_time for task in stage_tasks),
+                **self._metrics.totals(stage),
+            }
+        if OUTPUTS in stages:
+            stages[OUTPUTS]["bytes_written"] = sum(output_sizes)
+
+        def task_metrics(stage, item):
+            task = tasks.get(f"{stage}_{item.uuid}")
+            metrics = {"name": item.name, "computed": task is not None}
+            if task is not None:
+                metrics.update(
+                    status=task.status.value,
+                    wall_time=task.duration,
+                    cpu_time=task.cpu_time,
+                    **self._metrics.totals(stage, item.uuid),
+                )
+            return metrics
+
+        cache = self._cache.lookup_counts() if self._cache is not None else {}
+        cache["reused_models"] = len(
+            set(self._normalized_sources) | set(self._weighted_sources)
+        )
+        cache["reused_alignments"] = len(self._aligned_sources)
+
+        grid = None
+        if self._grid is not None:
+            grid = {
+                "width": self._grid.width,
+                "height": self._grid.height,
+                "pixels": self._grid.width * self._grid.height,
+                "geo_transform": list(self._grid.geo_transform),
+                "crs_wkt": self._grid.crs_wkt,
+            }
+
+        plan = self._memory_plan
+        return {
+            "scenario": {
+                "uuid": str(context.scenario.uuid),
+                "name": context.scenario.name,
+            },
+            "started": self._started,
+            "success": success,
+            "cancelled": self._feedback.isCanceled(),
+            "wall_time": self._metrics.wall_time,
+            "cpu_time": self._metrics.cpu_time,
+            "peak_rss": self._metrics.peak_rss,
+            # Peaks since the process started, e.g. of the QGIS session
+            "process_peak_rss": process_peak_rss(),
+            "process_peak_rss_workers": process_peak_rss(children=True)
+            if self._used_processes
+            else None,
+            "grid": grid,
+            "tiles": {
+                "tile_size": plan.tile_size if plan else None,
+                "count": self._tile_count,
+                "tiles_in_flight": plan.tiles_in_flight if plan else None,
+                "gdal_cache": plan.gdal_cache if plan else None,
+                "workers": self._graph.max_workers if self._graph else None,
+                "processes": self._used_processes,
+            },
+            "stages": stages,
+            "pathways": {
+                str(pathway.uuid): task_metrics(PATHWAY_STATISTICS, pathway)
+                for pathway in self._pathways
+            },
+            "implementation_models": {
+                str(model.uuid): task_metrics(MODEL_STATISTICS, model)
+                for model in self.models
+            },
+            "outputs": {
+                "files": len(output_sizes),
+                "bytes_written": sum(output_sizes),
+            },
+            "cache": cache,
+            "settings": {
+                "carbon_coefficient": context.carbon_coefficient,
+                "suitability_index": context.suitability_index,
+                "apply_weighting": context.apply_weighting,
+                "priority_weights": {
+                    model_uuid: [dataclasses.asdict(weight) for weight in weights]
+                    for model_uuid, weights in context.priority_weights.items()
+                },
+                "ordered_model_ids": context.ordered_model_ids,
+                "max_workers": context.max_workers,
+                "tile_size": context.tile_size,
+                "use_processes": context.use_processes,
+                "memory_budget": context.memory_budget,
+                "cache_directory": context.cache_directory,
+                "cache_size": context.cache_size,
+                "shared_cache": context.shared_cache,
+                "intermediate_outputs": context.intermediate_outputs.name,
+                "output_profile": dataclasses.asdict(context.output_profile),
+            },
+            "environment": environment(),
+        }
+
+    def _run(self) -> bool:
+        """Runs the analysis passes.
+
+        :returns: True if the analysis completed successfully else False.
+        :rtype: bool
+        """
+        for model in self.models:
+            for pathway in model.pathways:
+                if pathway not in self._pathways:
+                    self._pathways.append(pathway)
+
+        reference_path = self._reference_path()
+        if not reference_path:
+            log("No input layers found for the scenario analysis.", info=False)
+            return False
+
+        self._grid = self._create_grid(reference_path)
+        log(
+            f"Scenario analysis grid {self._grid.width} x {self._grid.height} "
+            f"pixels, bounds {self._grid.bounds}"
+        )
+        save_grid(
+            f"{self._context.scenario_directory}/{ANALYSIS_GRID_FILE_NAME}",
+            self._grid,
+        )
+
+        self._cache = self._create_cache()
+        self._compute_cache_keys()
+        self._previous_state = load_analysis_state(self._context.state_path)
+        self._log_changed_inputs()
+
+        # Models whose normalized or weighted rasters are not cached
+        required_models = [
+            model for model in self.models if not self._use_cached_model(model)
+        ]
+        required_pathways = []
+        for model in required_models:
+            for pathway in model.pathways:
+                if pathway not in required_pathways:
+                    required_pathways.append(pathway)
+
+        self._create_windows(required_models, required_pathways)
+
+        self._memory_plan = self._create_memory_plan(
+            self._context.max_workers or default_worker_count()
+        )
+        graph = TaskGraph(self._memory_plan.workers, self._feedback)
+        self._graph = graph
+        self._tile_slots = threading.BoundedSemaphore(self._memory_plan.tiles_in_flight)
+        tiles = grid_tiles(self._grid, self._memory_plan.tile_size)
+        self._tile_count = len(tiles)
+        self._pathway_stats = {p.uuid: BandStatistics() for p in self._pathways}
+        self._model_stats = {m.uuid: BandStatistics() for m in self.models}
+
+        # Work of the stages is estimated from the pixels read and written
+        pixels = self._grid.width * self._grid.height
+        for path, window_path in self._alignments.items():
+            graph.add_node(
+                self._alignment_node(path),
+                partial(self._align_input, path, window_path),
+                stage=GRID_ALIGNMENT,
+            )
+            self._progress.add_work(GRID_ALIGNMENT, pixels)
+
+        for pathway in required_pathways:
+            if self._cached_statistics(
+                self._pathway_keys[pathway.uuid], self._pathway_stats[pathway.uuid]
+            ):
+                continue
+            graph.add_node(
+                f"pathway_statistics_{pathway.uuid}",
+                partial(self._compute_pathway_statistics, pathway, tiles),
+                self._alignment_dependencies(
+                    [pathway.path]
+                    + existing_carbon_paths(pathway, self._context.base_dir)
+                ),
+                stage=PATHWAY_STATISTICS,
+            )
+            self._progress.add_work(
+                PATHWAY_STATISTICS, pixels * self._pathway_work(pathway)
+            )
+
+        node_names = [node.name for node in graph.nodes]
+        for model in required_models:
+            if self._cached_statistics(
+                self._model_keys[model.uuid], self._model_stats[model.uuid]
+            ):
+                continue
+            dependencies = [
+                f"pathway_statistics_{pathway.uuid}" for pathway in model.pathways
+            ]
+            graph.add_node(
+                f"model_statistics_{model.uuid}",
+                partial(self._compute_model_statistics, model, tiles),
+                [name for name in dependencies if name in node_names]
+                + self._alignment_dependencies([model.path]),
+                stage=MODEL_STATISTICS,
+            )
+            self._progress.add_work(MODEL_STATISTICS, pixels * self._model_work(model))
+
+        # Includes the alignment of the layers only read by the outputs
+        statistics_nodes = [node.name for node in graph.nodes]
+
+        model_paths, output_path = self._create_outputs()
+        if self._context.intermediate_outputs == IntermediateOutputs.KEEP_ALL:
+            self._create_intermediate_outputs(required_models, required_pathways)
+        self._progress.add_work(OUTPUTS, pixels * self._outputs_work())
+
+        chunks = min(len(tiles), graph.max_workers)
+        chunk_size = int(math.ceil(len(tiles) / chunks))
+        for index in range(chunks):
+            graph.add_node(
+                f"outputs_{index}",
+                partial(
+                    self._compute_outputs,
+                    tiles[index * chunk_size : (index + 1) * chunk_size],
+                ),
+                statistics_nodes,
+                stage=OUTPUTS,
+            )
+
+        self._processor = self._create_processor()
+        if self._memory_plan.worker_processes:
+            self._pool = self._create_pool(self._memory_plan.worker_processes)
+            self._used_processes = self._pool is not None
+
+        log(
+            f"Running {len(graph.nodes)} scenario analysis tasks "
+            f"on {len(tiles)} tiles of {self._memory_plan.tile_size} pixels "
+            f"with up to {graph.max_workers} "
+            f"{'processes' if self._pool else 'threads'} and "
+            f"{self._memory_plan.tiles_in_flight} tiles in flight, "
+            f"{len(self.models) - len(required_models)} of "
+            f"{len(self.models)} implementation models reused"
+        )
+        with GdalCacheReservation(self._memory_plan.gdal_cache):
+            completed = graph.run()
+            log(
+                "Scenario analysis stage timings "
+                + ", ".join(
+                    f"{stage} {duration:.2f}s"
+                    for stage, duration in graph.stage_timings().items()
+                )
+            )
+            if not completed or not self._close_outputs():
+                return False
+
+        for model in self.models:
+            model.path = model_paths[model.uuid]
+
+        self._update_cache(model_paths)
+        self._save_state()
+
+        self._output = {"OUTPUT": output_path}
+        self._progress.finish()
+
+        return True
+
+    def _create_cache(self) -> typing.Optional[AnalysisCache]:
+        """Creates the analysis cache if it is enabled.
+
+        :returns: Analysis cache or None if the cache is disabled
+        or could not be created.
+        :rtype: AnalysisCache
+        """
+        if not self._context.cache_directory or self._context.cache_size <= 0:
+            return None
+
+        try:
+            return AnalysisCache(
+                self._context.cache_directory, self._context.cache_size
+            )
+        except OSError as ex:
+            log(f"Unable to create the analysis cache, {ex}", info=False)
+            return None
+
+    def _grid_identity(self) -> typing.List:
+        """Returns the values that identify the analysis grid in the
+        cache keys i.e. the CRS, geotransform, width and height.
+        """
+        return [
+            self._grid.crs_wkt,
+            list(self._grid.geo_transform),
+            self._grid.width,
+            self._grid.height,
+        ]
+
+    def _compute_cache_keys(self):
+        """Computes the keys of the pathway statistics, normalized and
+        weighted implementation models from the identity of their
+        inputs, the analysis parameters and the analysis grid.
+        """
+        grid = self._grid_identity()
+        for pathway in self._pathways:
+            self._pathway_keys[pathway.uuid] = cache_key(
+                "pathway",
+                grid,
+                file_identity(pathway.path),
+                [
+                    file_identity(path)
+                    for path in existing_carbon_paths(pathway, self._context.base_dir)
+                ],
+                len(pathway.carbon_paths),
+                self._context.carbon_coefficient,
+                self._context.suitability_index,
+            )
+
+        for model in self.models:
+            model_key = cache_key(
+                "implementation_model",
+                grid,
+                file_identity(model.path) if model.path else None,
+                [self._pathway_keys[pathway.uuid] for pathway in model.pathways],
+                self._context.normalization_index,
+            )
+            self._model_keys[model.uuid] = model_key
+            if self._context.apply_weighting:
+                weights = self._context.priority_weights.get(str(model.uuid), [])
+                self._weighted_keys[model.uuid] = cache_key(
+                    "weighted_implementation_model",
+                    model_key,
+                    [[file_identity(w.path), w.coefficient] for w in weights],
+                )
+
+    def _current_state(self) -> AnalysisState:
+        """Returns the state of the inputs of this analysis.
+
+        :returns: Analysis state with the current cache keys.
+        :rtype: AnalysisState
+        """
+        return AnalysisState(
+            pathway_keys={str(k): v for k, v in self._pathway_keys.items()},
+            model_keys={str(k): v for k, v in self._model_keys.items()},
+            weighted_keys={str(k): v for k, v in self._weighted_keys.items()},
+        )
+
+    def _log_changed_inputs(self):
+        """Logs the inputs that have changed since the last analysis."""
+        if self._previous_state is None:
+            return
+
+        changes = self._current_state().changes(self._previous_state)
+        log(
+            f"Inputs changed since the last scenario analysis: "
+            f"{len(changes['pathways'])} pathways, "
+            f"{len(changes['implementation_models'])} implementation models, "
+            f"{len(changes['weights'])} weighted implementation models"
+        )
+
+    def _save_state(self):
+        """Saves the state of this analysis for the next run. Models
+        reused from the cache without their normalized rasters keep the
+        normalized rasters of the previous state.
+        """
+        if not self._context.state_path:
+            return
+
+        state = self._current_state()
+        for model in self.models:
+            model_uuid = str(model.uuid)
+            path = self._normalized_paths.get(model.uuid)
+            if path is None and self._previous_state is not None:
+                path = self._previous_state.normalized_model_path(
+                    model_uuid, self._model_keys[model.uuid]
+                )
+            if path:
+                state.normalized_models[model_uuid] = file_identity(path)
+
+        save_analysis_state(self._context.state_path, state)
+
+    def _use_cached_model(self, model: ImplementationModel) -> bool:
+        """Looks up the weighted or normalized implementation model
+        in the cache or the normalized model in the last analysis.
+
+        :param model: Implementation model.
+        :type model: ImplementationModel
+
+        :returns: True if an existing raster will be used for the model
+        else False.
+        :rtype: bool
+        """
+        if self._cache is not None and model.uuid in self._weighted_keys:
+            path = self._cache.get_raster(self._weighted_keys[model.uuid])
+            if path:
+                self._weighted_sources[model.uuid] = path
+                return True
+
+        if self._use_shared_model(model):
+            return True
+
+        if self._cache is not None:
+            path = self._cache.get_raster(self._model_keys[model.uuid])
+            if path:
+                self._normalized_sources[model.uuid] = path
+                return True
+
+        return self._use_previous_model(model)
+
+    def _use_shared_model(self, model: ImplementationModel) -> bool:
+        """Looks up the normalized implementation model shared by
+        another run with the same inputs e.g. in a scenario sweep.
+
+        :param model: Implementation model.
+        :type model: ImplementationModel
+
+        :returns: True if the shared normalized model will be used
+        else False.
+        :rtype: bool
+        """
+        shared = self._context.shared_normalized_models.get(str(model.uuid))
+        if shared is None:
+            return False
+
+        key, path = shared
+        if key != self._model_keys[model.uuid] or not os.path.exists(path):
+            return False
+
+        self._normalized_sources[model.uuid] = path
+
+        return True
+
+    def _use_previous_model(self, model: ImplementationModel) -> bool:
+        """Looks up the normalized implementation model in the last
+        analysis e.g. when only the priority weights have changed.
+
+        :param model: Implementation model.
+        :type model: ImplementationModel
+
+        :returns: True if the normalized model of the last analysis
+        will be used else False.
+        :rtype: bool
+        """
+        if self._previous_state is None:
+            return False
+
+        path = self._previous_state.normalized_model_path(
+            str(model.uuid), self._model_keys[model.uuid]
+        )
+        if not path:
+            return False
+
+        self._normalized_sources[model.uuid] = path
+
+        return True
+
+    def _cached_statistics(self, key: str, stats: BandStatistics) -> bool:
+        """Loads the cached statistics with the given key.
+
+        :param key: Cache key of the statistics.
+        :type key: str
+
+        :param stats: Statistics to be updated with the cached values.
+        :type stats: BandStatistics
+
+        :returns: True if the statistics were found in the cache else False.
+        :rtype: bool
+        """
+        if self._cache is None:
+            return False
+
+        cached = self._cache.get_statistics(key)
+        if cached is None:
+            return False
+
+        stats.merge(BandStatistics.from_dict(cached))
+
+        return True
+
+    def _cache_statistics(self, key: str, stats: BandStatistics):
+        """Adds the statistics to the cache if it is enabled, failing to
+        add them does not stop the analysis.
+        """
+        if self._cache is None:
+            return
+
+        try:
+            self._cache.put_statistics(key, dataclasses.asdict(stats))
+        except OSError as ex:
+            log(f"Unable to update the analysis cache, {ex}", info=False)
+
+    def _update_cache(self, model_paths: typing.Dict):
+        """Adds the layers warped to the grid, normalized and weighted
+        implementation models computed in this run to the cache and
+        evicts the least recently used entries. The weighted models are not added and
+        no entries are evicted if the cache is shared by concurrent
+        runs, the normalized models could otherwise be evicted before
+        the runs that reuse them.
+
+        :param model_paths: Paths of the implementation model outputs
+        indexed by model UUID.
+        :type model_paths: dict
+        """
+        if self._cache is None:
+            return
+
+        try:
+            for path, window_path in self._alignments.items():
+                self._cache.put_raster(self._alignment_keys[path], window_path)
+
+            for model in self.models:
+                if (
+                    model.uuid not in self._normalized_sources
+                    and model.uuid not in self._weighted_sources
+                ):
+                    self._cache.put_raster(
+                        self._model_keys[model.uuid],
+                        self._normalized_paths[model.uuid],
+                    )
+
+                if (
+                    model.uuid in self._weighted_keys
+                    and model.uuid not in self._weighted_sources
+                    and not self._context.shared_cache
+                ):
+                    self._cache.put_raster(
+                        self._weighted_keys[model.uuid], model_paths[model.uuid]
+                    )
+
+            if not self._context.shared_cache:
+                self._cache.evict()
+        except OSError as ex:
+            log(f"Unable to update the analysis cache, {ex}", info=False)
+
+    def _reference_path(self) -> str:
+        """Returns the path of the layer whose CRS and resolution define
+        the analysis grid i.e. the first pathway or model layer.
+
+        :returns: Path of the reference layer or an empty string if
+        there are no input layers.
+        :rtype: str
+        """
+        if self._pathways:
+            return self._pathways[0].path
+
+        for model in self.models:
+            if model.path:
+                return model.path
+
+        return ""
+
+    def _create_grid(self, reference_path: str) -> RasterGrid:
+        """Creates the analysis grid from the scenario extent using the
+        CRS and resolution of the reference layer.
+
+        :param reference_path: Path to the reference layer.
+        :type reference_path: str
+
+        :returns: Grid for the analysis outputs.
+        :rtype: RasterGrid
+        """
+        ds = gdal.Open(reference_path)
+        crs_wkt = ds.GetProjection()
+
+        bbox = self._context.scenario.extent.bbox
+        box = QgsRectangle(
+            float(bbox[0]), float(bbox[2]), float(bbox[1]), float(bbox[3])
+        )
+        source_crs = QgsCoordinateReferenceSystem("EPSG:4326")
+        dest_crs = QgsCoordinateReferenceSystem.fromWkt(crs_wkt)
+        transform = QgsCoordinateTransform(source_crs, dest_crs, QgsProject.instance())
+        extent = transform.transformBoundingBox(box)
+
+        return snapped_grid(
+            (
+                extent.xMinimum(),
+                extent.yMinimum(),
+                extent.xMaximum(),
+                extent.yMaximum(),
+            ),
+            crs_wkt,
+            ds.GetGeoTransform(),
+        )
+
+    def _create_windows(
+        self,
+        models: typing.List[ImplementationModel],
+        pathways: typing.List[NcsPathway],
+    ):
+        """Creates the windows of the input layers that will be read
+        by the analysis in the scenario directory. The windows are
+        removed once the analysis is done unless all the intermediate
+        layers are kept.
+
+        :param models: Implementation models that will be computed.
+        :type models: list
+
+        :param pathways: Pathways of the implementation models that
+        will be computed.
+        :type pathways: list
+        """
+        paths = []
+        for pathway in pathways:
+            paths.append(pathway.path)
+            paths.extend(existing_carbon_paths(pathway, self._context.base_dir))
+
+        for model in models:
+            if model.path:
+                paths.append(model.path)
+
+        for model in self.models:
+            if model.uuid in self._weighted_sources:
+                continue
+            for weight in self._context.priority_weights.get(str(model.uuid), []):
+                paths.append(weight.path)
+
+        windows_dir = f"{self._context.scenario_directory}/{INPUT_WINDOWS_SEGMENT}"
+        FileUtils.create_new_dir(windows_dir)
+        for path in paths:
+            if path in self._windows:
+                continue
+            if not is_aligned(path, self._grid):
+                if self._use_cached_alignment(path):
+                    continue
+                # Warped once by the grid alignment stage
+                window_path = f"{windows_dir}/{window_file_name(path, 'tif')}"
+                self._alignments[path] = window_path
+                self._windows[path] = window_path
+                self._window_outputs.append(window_path)
+                continue
+            window_path = f"{windows_dir}/{window_file_name(path)}"
+            self._window_outputs.append(window_path)
+            # The window dataset is not kept, it is closed straight away
+            # which writes the VRT file.
+            create_window(path, self._grid, window_path, NODATA_VALUE)
+            self._windows[path] = window_path
+
+    def _use_cached_alignment(self, path: str) -> bool:
+        """Looks up the layer warped to the analysis grid in the cache.
+
+        :param path: Path of the layer.
+        :type path: str
+
+        :returns: True if the cached warped layer will be used
+        else False.
+        :rtype: bool
+        """
+        if self._cache is None:
+            return False
+
+        key = cache_key(
+            "aligned_input",
+            self._grid_identity(),
+            file_identity(path),
+            NODATA_VALUE,
+        )
+        self._alignment_keys[path] = key
+        cached_path = self._cache.get_raster(key)
+        if not cached_path:
+            return False
+
+        self._aligned_sources[path] = cached_path
+        self._windows[path] = cached_path
+
+        return True
+
+    def _alignment_node(self, path: str) -> str:
+        """Returns the name of the sub-task warping a layer to the grid.
+
+        :param path: Path of the layer.
+        :type path: str
+
+        :returns: Name of the grid alignment sub-task.
+        :rtype: str
+        """
+        return f"{GRID_ALIGNMENT}_{Path(self._alignments[path]).stem}"
+
+    def _alignment_dependencies(self, paths: typing.List[str]) -> typing.List[str]:
+        """Returns the grid alignment sub-tasks of the layers that are
+        warped to the grid.
+
+        :param paths: Paths of the layers read by a sub-task.
+        :type paths: list
+
+        :returns: Names of the grid alignment sub-tasks.
+        :rtype: list
+        """
+        return [
+            self._alignment_node(path) for path in paths if path in self._alignments
+        ]
+
+    def _align_input(self, path: str, window_path: str) -> bool:
+        """Warps a layer that is not aligned to the analysis grid so that
+        the later stages read its pixels without resampling.
+
+        :param path: Path of the layer.
+        :type path: str
+
+        :param window_path: Path of the warped layer.
+        :type window_path: str
+
+        :returns: True if the layer was warped else False.
+        :rtype: bool
+        """
+        if self._feedback.isCanceled():
+            return False
+
+        if not warp_to_grid(
+            path, self._grid, window_path, NODATA_VALUE, self._gdal_progress
+        ):
+            log(f"Unable to align the layer {path} to the analysis grid", info=False)
+            return False
+
+        self._progress.advance(GRID_ALIGNMENT, self._grid.width * self._grid.height)
+
+        return True
+
+    def _create_processor(self) -> TileProcessor:
+        """Creates the processor of the tiles from the inputs and
+        outputs of the analysis.
+
+        :returns: Tile processor.
+        :rtype: TileProcessor
+        """
+        return TileProcessor(
+            grid=self._grid,
+            windows=self._windows,
+            base_dir=self._context.base_dir,
+            carbon_coefficient=self._context.carbon_coefficient,
+            suitability_index=self._context.suitability_index,
+            normalization_index=self._context.normalization_index,
+            apply_weighting=self._context.apply_weighting,
+            priority_weights=self._context.priority_weights,
+            models=[ModelInputs.from_model(model) for model in self.models],
+            pathway_stats=self._pathway_stats,
+            model_stats=self._model_stats,
+            normalized_sources=self._normalized_sources,
+            weighted_sources=self._weighted_sources,
+            model_outputs=self._model_outputs,
+            normalized_outputs=self._normalized_outputs,
+            scenario_output=self._scenario_output,
+            position_values=self._position_values,
+            carbon_pathway_outputs=self._carbon_pathway_outputs,
+            normalized_pathway_outputs=self._normalized_pathway_outputs,
+            implementation_model_outputs=self._implementation_model_outputs,
+            keep_intermediates=(
+                self._context.intermediate_outputs == IntermediateOutputs.KEEP_ALL
+            ),
+        )
+
+    def _create_memory_plan(self, workers: int) -> MemoryPlan:
+        """Sizes the tiles, the GDAL cache and the number of workers to
+        fit the memory budget. If the budget is too small for a single
+        tile of the minimum size, the analysis still runs one tile at a
+        time and its peak memory exceeds the budget.
+
+        :param workers: Number of analysis threads or worker processes
+        wanted.
+        :type workers: int
+
+        :returns: Memory plan of the analysis.
+        :rtype: MemoryPlan
+        """
+        plan = memory_plan(
+            self._context.memory_budget,
+            tile_pixel_bytes(
+                self.models,
+                self._context.intermediate_outputs == IntermediateOutputs.KEEP_ALL,
+                len(self._priority_paths()),
+            ),
+            workers,
+            self._context.tile_size,
+            workers if self._context.use_processes else 0,
+        )
+        budget_mb = self._context.memory_budget // (1024 * 1024)
+        if self._context.use_processes and not plan.worker_processes:
+            log(
+                f"Memory budget of {budget_mb} MB is too small for the "
+                f"worker processes, computing the tiles in threads",
+                info=False,
+            )
+        if plan.workers < workers:
+            log(
+                f"Memory budget of {budget_mb} MB only fits "
+                f"{plan.workers} of {workers} analysis workers",
+                info=False,
+            )
+        if plan.over_budget:
+            log(
+                f"Memory budget of {budget_mb} MB is too small for a tile of "
+                f"the {len(self.models)} implementation models, computing one "
+                f"tile at a time which exceeds the memory budget",
+                info=False,
+            )
+
+        return plan
+
+    def _create_pool(self, max_workers: int):
+        """Creates the pool of worker processes, the tiles are computed
+        in the analysis threads if the pool cannot be created.
+
+        :param max_workers: Number of worker processes.
+        :type max_workers: int
+
+        :returns: Process pool executor or None.
+        :rtype: futures.ProcessPoolExecutor
+        """
+        try:
+            return create_process_pool(
+                self._processor, max_workers, self._memory_plan.worker_gdal_cache
+            )
+        except (OSError, ValueError) as ex:
+            log(
+                f"Unable to start the analysis worker processes, "
+                f"computing the tiles in threads, {ex}",
+                info=False,
+            )
+            return None
+
+    def _map_tiles(
+        self, stage: str, key, tiles: typing.List[Tile]
+    ) -> typing.Iterator[typing.Tuple[Tile, typing.Any]]:
+        """Computes a stage of the analysis on the tiles in the current
+        thread or in the worker processes.
+
+        :param stage: PATHWAY_STATISTICS, MODEL_STATISTICS or OUTPUTS.
+        :type stage: str
+
+        :param key: UUID of the pathway or model whose statistics
+        are computed.
+        :type key: uuid.UUID
+
+        :param tiles: Tiles to be computed.
+        :type tiles: list
+
+        :returns: Each tile and its result, tiles computed by the worker
+        processes are returned in the order they complete. A tile slot
+        is held until the result has been consumed.
+        :rtype: tuple
+        """
+        if self._pool is None:
+            for tile in tiles:
+                if not self._acquire_tile_slot():
+                    return
+                try:
+                    result, bytes_read, cpu_time = self._processor.process_measured(
+                        stage, key, tile
+                    )
+                    self._metrics.add_tile(stage, key, bytes_read, cpu_time)
+                    yield tile, result
+                finally:
+                    self._tile_slots.release()
+            return
+
+        pending = {}
+        remaining = list(tiles)
+        try:
+            while remaining or pending:
+                # Only waits for a free slot when no tile of the stage is
+                # pending, otherwise the slots held by the pending tiles
+                # could never be released.
+                while remaining and self._acquire_tile_slot(blocking=not pending):
+                    tile = remaining.pop(0)
+                    try:
+                        future = self._pool.submit(
+                            process_tile,
+                            stage,
+                            key,
+                            tile,
+                            self._pathway_stats,
+                            self._model_stats,
+                        )
+                    except Exception:
+                        self._tile_slots.release()
+                        raise
+                    pending[future] = tile
+                if self._feedback.isCanceled():
+                    return
+                done, _ = futures.wait(
+                    list(pending.keys()),
+                    timeout=CANCEL_POLL_INTERVAL,
+                    return_when=futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    tile = pending.pop(future)
+                    try:
+                        result, bytes_read, cpu_time = future.result()
+                        self._metrics.add_tile(stage, key, bytes_read, cpu_time)
+                        yield tile, result
+                    finally:
+                        self._tile_slots.release()
+        finally:
+            for future in pending:
+                future.cancel()
+                self._tile_slots.release()
+
+    def _acquire_tile_slot(self, blocking: bool = True) -> bool:
+        """Acquires a slot for computing a tile, the cancellation of the
+        analysis is checked while waiting for a slot to be released.
+
+        :param blocking: Whether to wait for a slot to be released.
+        :type blocking: bool
+
+        :returns: True if a slot has been acquired, False if there is
+        no free slot and blocking is False or the analysis has been
+        cancelled.
+        :rtype: bool
+        """
+        while not self._feedback.isCanceled():
+            if blocking:
+                if self._tile_slots.acquire(timeout=CANCEL_POLL_INTERVAL):
+                    return True
+            else:
+                return self._tile_slots.acquire(blocking=False)
+
+        return False
+
+    def _pathway_work(self, pathway: NcsPathway) -> int:
+        """Returns the number of layers read for each pixel of the
+        carbon weighted pathway.
+        """
+        work = 1
+        if self._context.carbon_coefficient > 0:
+            work += len(existing_carbon_paths(pathway, self._context.base_dir))
+
+        return work
+
+    def _model_work(self, model: ImplementationModel) -> int:
+        """Returns the number of layers read for each pixel of the
+        implementation model.
+        """
+        work = 1 if model.path else 0
+
+        return work + sum(self._pathway_work(pathway) for pathway in model.pathways)
+
+    def _outputs_work(self) -> int:
+        """Returns the number of layers read and written for each pixel
+        of the outputs.
+        """
+        work = len(self._outputs) + len(self._priority_paths())
+        for model in self.models:
+            if model.uuid in self._normalized_sources or (
+                model.uuid in self._weighted_sources
+            ):
+                work += 1
+            else:
+                work += self._model_work(model)
+
+        return work
+
+    def _priority_paths(self) -> typing.Set[str]:
+        """Returns the distinct priority weighting layers read by the
+        outputs stage, layers shared by the models are read once per tile.
+        """
+        if not self._context.apply_weighting:
+            return set()
+
+        return {
+            weight.path
+            for model in self.models
+            if model.uuid not in self._weighted_sources
+            for weight in self._context.priority_weights.get(str(model.uuid), [])
+        }
+
+    def _tile_processed(self, stage: str, tile: Tile, work: int) -> bool:
+        """Updates the progress after a tile has been processed.
+
+        :param stage: Stage of the analysis the tile was processed in.
+        :type stage: str
+
+        :param tile: Tile that has been processed.
+        :type tile: tuple
+
+        :param work: Number of layers read and written for each pixel.
+        :type work: int
+
+        :returns: False if the analysis has been cancelled else True.
+        :rtype: bool
+        """
+        if self._feedback.isCanceled():
+            log(tr("Scenario analysis has been cancelled."))
+            return False
+
+        self._progress.advance(stage, tile[2] * tile[3] * work)
+
+        return True
+
+    def _compute_pathway_statistics(
+        self, pathway: NcsPathway, tiles: typing.List[Tile]
+    ) -> bool:
+        """Computes the statistics of the carbon weighted pathway.
+
+        :param pathway: NCS pathway.
+        :type pathway: NcsPathway
+
+        :param tiles: Tiles of the analysis grid.
+        :type tiles: list
+
+        :returns: True if all the tiles were processed else False.
+        :rtype: bool
+        """
+        stats = self._pathway_stats[pathway.uuid]
+        work = self._pathway_work(pathway)
+        for tile, tile_stats in self._map_tiles(
+            PATHWAY_STATISTICS, pathway.uuid, tiles
+        ):
+            stats.merge(tile_stats)
+            if not self._tile_processed(PATHWAY_STATISTICS, tile, work):
+                return False
+
+        # Tiles are not computed once the analysis has been cancelled
+        if self._feedback.isCanceled():
+            return False
+
+        self._cache_statistics(self._pathway_keys[pathway.uuid], stats)
+
+        return True
+
+    def _compute_model_statistics(
+        self, model: ImplementationModel, tiles: typing.List[Tile]
+    ) -> bool:
+        """Computes the statistics of the implementation model.
+
+        :param model: Implementation model.
+        :type model: ImplementationModel
+
+        :param tiles: Tiles of the analysis grid.
+        :type tiles: list
+
+        :returns: True if all the tiles were processed else False.
+        :rtype: bool
+        """
+        stats = self._model_stats[model.uuid]
+        work = self._model_work(model)
+        for tile, tile_stats in self._map_tiles(MODEL_STATISTICS, model.uuid, tiles):
+            stats.merge(tile_stats)
+            if not self._tile_processed(MODEL_STATISTICS, tile, work):
+                return False
+
+        if self._feedback.isCanceled():
+            return False
+
+        self._cache_statistics(self._model_keys[model.uuid], stats)
+
+        return True
+
+    def _create_output(
+        self,
+        path: str,
+        data_type: int = gdal.GDT_Float32,
+        nodata: float = NODATA_VALUE,
+    ) -> gdal.Dataset:
+        """Creates an output raster on the analysis grid.
+
+        :param path: Path of the output raster.
+        :type path: str
+
+        :param data_type: GDAL data type of the output.
+        :type data_type: int
+
+        :param nodata: No data value of the output.
+        :type nodata: float
+
+        :returns: Output dataset.
+        :rtype: gdal.Dataset
+        """
+        floating_point = data_type in (gdal.GDT_Float32, gdal.GDT_Float64)
+
+        # COG rasters are copied from a tiled GeoTIFF once complete
+        create_path = f"{path}.tmp.tif" if self._profile.cog else path
+        options = dataclasses.replace(self._profile, cog=False).creation_options(
+            floating_point
+        )
+        driver = gdal.GetDriverByName("GTiff")
+        ds = driver.Create(
+            create_path,
+            self._grid.width,
+            self._grid.height,
+            1,
+            data_type,
+            options=options,
+        )
+        ds.SetGeoTransform(self._grid.geo_transform)
+        ds.SetProjection(self._grid.crs_wkt)
+        ds.GetRasterBand(1).SetNoDataValue(nodata)
+
+        self._outputs[path] = ds
+        self._created_outputs.append(path)
+        self._output_nodata[path] = nodata
+        self._output_floating_point[path] = floating_point
+        self._output_stats[path] = BandStatistics()
+
+        return ds
+
+    def _write_tiles(
+        self, output_tiles: typing.List[typing.Tuple[str, np.ndarray]], tile: Tile
+    ):
+        """Writes the tiles to the outputs and updates their statistics.
+
+        :param output_tiles: Output path and values of each tile, NaN
+        values are written as no data.
+        :type output_tiles: list
+
+        :param tile: Position of the tiles in the grid.
+        :type tile: tuple
+        """
+        tile_stats = []
+        for _, values in output_tiles:
+            stats = BandStatistics()
+            stats.update(values)
+            tile_stats.append(stats)
+
+        # Writing to the same dataset from several threads is not safe
+        with self._write_lock:
+            for (path, values), stats in zip(output_tiles, tile_stats):
+                self._output_stats[path].merge(stats)
+                self._outputs[path].GetRasterBand(1).WriteArray(
+                    np.where(np.isnan(values), self._output_nodata[path], values),
+                    tile[0],
+                    tile[1],
+                )
+
+    def _close_outputs(self) -> bool:
+        """Saves the statistics computed while writing the outputs in
+        the rasters and the statistics manifest then closes the outputs.
+
+        :returns: False if the analysis has been cancelled while
+        converting the outputs to COG else True.
+        :rtype: bool
+        """
+        for path, ds in self._outputs.items():
+            set_band_statistics(ds.GetRasterBand(1), self._output_stats[path])
+            if path == self._scenario_output:
+                ds.GetRasterBand(1).SetDefaultRAT(self._scenario_attribute_table())
+        paths = list(self._outputs.keys())
+        self._outputs = {}
+
+        if self._profile.cog:
+            for path in paths:
+                options = self._profile.creation_options(
+                    self._output_floating_point[path]
+                )
+                ds = gdal.Translate(
+                    path,
+                    f"{path}.tmp.tif",
+                    format="COG",
+                    creationOptions=options,
+                    callback=self._gdal_progress,
+                )
+                if ds is None:
+                    return False
+                ds = None
+                gdal.GetDriverByName("GTiff").Delete(f"{path}.tmp.tif")
+
+        save_statistics_manifest(
+            f"{self._context.scenario_directory}/{RASTER_STATISTICS_FILE_NAME}",
+            self._output_stats,
+        )
+
+        return True
+
+    def _gdal_progress(self, complete: float, message: str, data) -> int:
+        """GDAL progress callback that stops the operation once the
+        analysis has been cancelled.
+
+        :returns: Zero if the analysis has been cancelled else one.
+        :rtype: int
+        """
+        return 0 if self._feedback.isCanceled() else 1
+
+    def _remove_partial_outputs(self):
+        """Deletes the outputs of an analysis that has been cancelled or
+        has failed, including the sub-directories left empty.
+        """
+        directories = set()
+        for path in self._created_outputs:
+            for output_path in (path, f"{path}.tmp.tif", f"{path}.aux.xml"):
+                if not os.path.exists(output_path):
+                    continue
+                try:
+                    os.remove(output_path)
+                except OSError as ex:
+                    log(f"Unable to remove the partial output {output_path}, {ex}")
+            directories.add(os.path.dirname(path))
+
+        scenario_directory = os.path.normpath(self._context.scenario_directory)
+        for directory in directories:
+            if os.path.normpath(directory) == scenario_directory:
+                continue
+            try:
+                os.rmdir(directory)
+            except OSError:
+                # Directory is not empty
+                pass
+
+        self._created_outputs = []
+
+    def _remove_input_windows(self):
+        """Deletes the windows and the warped layers created in the
+        scenario directory, they are only kept with all the intermediate
+        layers of a successful analysis.
+        """
+        for path in self._window_outputs:
+            for window_path in (path, f"{path}.aux.xml"):
+                if not os.path.exists(window_path):
+                    continue
+                try:
+                    os.remove(window_path)
+                except OSError as ex:
+                    log(f"Unable to remove the input window {window_path}, {ex}")
+
+        try:
+            os.rmdir(f"{self._context.scenario_directory}/{INPUT_WINDOWS_SEGMENT}")
+        except OSError:
+            # Directory is not empty or does not exist
+            pass
+
+        self._window_outputs = []
+
+    def _scenario_attribute_table(self) -> gdal.RasterAttributeTable:
+        """Creates the attribute table of the scenario output that maps
+        the pixel values to the implementation models.
+
+        :returns: Raster attribute table with the value and name
+        of each implementation model.
+        :rtype: gdal.RasterAttributeTable
+        """
+        rat = gdal.RasterAttributeTable()
+        rat.CreateColumn("Value", gdal.GFT_Integer, gdal.GFU_MinMax)
+        rat.CreateColumn("Name", gdal.GFT_String, gdal.GFU_Name)
+
+        models = sorted(self.models, key=lambda m: self._pixel_values[str(m.uuid)])
+        rat.SetRowCount(len(models))
+        for row, model in enumerate(models):
+            rat.SetValueAsInt(row, 0, self._pixel_values[str(model.uuid)])
+            rat.SetValueAsString(row, 1, model.name)
+
+        return rat
+
+    def _output_path(self, segment: str, name: str) -> str:
+        """Returns a unique path for an output in a sub-directory of
+        the scenario directory.
+
+        :param segment: Name of the sub-directory.
+        :type segment: str
+
+        :param name: Name of the layer being saved.
+        :type name: str
+
+        :returns: Path of the output raster.
+        :rtype: str
+        """
+        directory = f"{self._context.scenario_directory}/{segment}"
+        FileUtils.create_new_dir(directory)
+        file_name = clean_filename(name.replace(" ", "_"))
+
+        return f"{directory}/{file_name}_{str(uuid.uuid4())[:4]}.tif"
+
+    def _create_intermediate_outputs(
+        self,
+        models: typing.List[ImplementationModel],
+        pathways: typing.List[NcsPathway],
+    ):
+        """Creates the rasters of the carbon weighted pathways, normalized
+        pathways and implementation models that are computed in this run.
+
+        :param models: Implementation models that will be computed.
+        :type models: list
+
+        :param pathways: Pathways of the implementation models that
+        will be computed.
+        :type pathways: list
+        """
+        for pathway in pathways:
+            path = self._output_path("pathways_carbon_layers", pathway.name)
+            self._carbon_pathway_outputs[pathway.uuid] = path
+            self._create_output(path)
+
+            path = self._output_path("normalized_pathways", pathway.name)
+            self._normalized_pathway_outputs[pathway.uuid] = path
+            self._create_output(path)
+
+        for model in models:
+            path = self._output_path("implementation_models", model.name)
+            self._implementation_model_outputs[model.uuid] = path
+            self._create_output(path)
+
+    def _create_outputs(self) -> typing.Tuple[typing.Dict, str]:
+        """Creates the weighted implementation model rasters and the
+        highest position scenario output.
+
+        :returns: Paths of the implementation model outputs indexed
+        by model UUID and the path of the scenario output.
+        :rtype: tuple
+        """
+        segment = "weighted_ims" if self._context.apply_weighting else "normalized_ims"
+
+        model_paths = {}
+        self._model_outputs = {}
+        for model in self.models:
+            path = self._output_path(segment, model.name)
+            model_paths[model.uuid] = path
+            self._model_outputs[model.uuid] = path
+            self._create_output(path)
+
+        # Normalized models are also saved when the weighting is applied
+        # so that they can be reused when only the weights change.
+        self._normalized_outputs = {}
+        self._normalized_paths = {}
+        for model in self.models:
+            if model.uuid in self._normalized_sources:
+                self._normalized_paths[model.uuid] = self._normalized_sources[
+                    model.uuid
+                ]
+            elif model.uuid in self._weighted_sources:
+                continue
+            elif not self._context.apply_weighting:
+                self._normalized_paths[model.uuid] = model_paths[model.uuid]
+            else:
+                path = self._output_path("normalized_ims", model.name)
+                self._normalized_paths[model.uuid] = path
+                self._normalized_outputs[model.uuid] = path
+                self._create_output(path)
+
+        scenario_uuid = str(self._context.scenario.uuid)
+        output_path = (
+            f"{self._context.scenario_directory}/"
+            f"{SCENARIO_OUTPUT_FILE_NAME}_{scenario_uuid[:4]}.tif"
+        )
+        self._scenario_output = output_path
+
+        # Highest position values are mapped to the pixel value of
+        # the implementation model at that position.
+        self._pixel_values = model_pixel_values(
+            self.models, self._context.ordered_model_ids
+        )
+        self._position_values = np.array(
+            [self._pixel_values[str(model.uuid)] for model in self.models]
+        )
+        if self._position_values.max() < SCENARIO_NODATA_VALUE:
+            self._create_output(output_path, gdal.GDT_Byte, SCENARIO_NODATA_VALUE)
+        else:
+            self._create_output(output_path, gdal.GDT_UInt16, np.iinfo(np.uint16).max)
+
+        return model_paths, output_path
+
+    def _compute_outputs(self, tiles: typing.List[Tile]) -> bool:
+        """Computes and writes the tiles of the weighted implementation
+        models and the highest position scenario output.
+
+        :param tiles: Tiles of the analysis grid.
+        :type tiles: list
+
+        :returns: True if all the tiles were processed else False.
+        :rtype: bool
+        """
+        work = self._outputs_work()
+        for tile, output_tiles in self._map_tiles(OUTPUTS, None, tiles):
+            self._write_tiles(output_tiles, tile)
+            if not self._tile_processed(OUTPUTS, tile, work):
+                return False
+
+        return not self._feedback.isCanceled()
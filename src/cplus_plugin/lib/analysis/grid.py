@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Analysis grid and the windows of the input layers on the grid.
+
+Input layers are cropped to the scenario extent and aligned to the
+analysis grid once, the analysis stages then only read the pixels
+within the scenario extent. Layers aligned to the grid are referenced
+by virtual datasets while other layers are warped to the grid once in
+the grid alignment stage so that all the stages read the same pixels
+without resampling them again.
+"""
+import dataclasses
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+import typing
+
+from osgeo import gdal
+
+from ...utils import log
+from .kernels import ALIGNMENT_TOLERANCE, RasterGrid, source_window
+
+# Creation options of the layers warped to the grid
+WARPED_CREATION_OPTIONS = ["TILED=YES", "COMPRESS=LZW", "BIGTIFF=IF_SAFER"]
+
+
+def save_grid(path: str, grid: RasterGrid):
+    """Saves the grid as JSON so that it can be reused by other tools.
+
+    :param path: Path of the grid file.
+    :type path: str
+
+    :param grid: Analysis grid.
+    :type grid: RasterGrid
+    """
+    grid_dict = dataclasses.asdict(grid)
+    grid_dict["geo_transform"] = list(grid.geo_transform)
+    # Derived values for readability
+    grid_dict["resolution"] = list(grid.resolution)
+    grid_dict["bounds"] = list(grid.bounds)
+    try:
+        with open(path, "w") as grid_file:
+            json.dump(grid_dict, grid_file, indent=4)
+    except OSError as ex:
+        log(f"Unable to save the analysis grid to {path}, {ex}", info=False)
+
+
+def snapped_grid(
+    bounds: typing.Tuple[float, float, float, float],
+    crs_wkt: str,
+    reference_transform: typing.Tuple[float, float, float, float, float, float],
+) -> RasterGrid:
+    """Creates a grid covering the bounds whose pixels coincide with
+    the pixels of the reference layer.
+
+    :param bounds: Extent to be covered as (xmin, ymin, xmax, ymax)
+    in the CRS of the reference layer.
+    :type bounds: tuple
+
+    :param crs_wkt: WKT of the reference layer CRS.
+    :type crs_wkt: str
+
+    :param reference_transform: Geotransform of the reference layer.
+    :type reference_transform: tuple
+
+    :returns: Grid snapped to the reference layer pixels.
+    :rtype: RasterGrid
+    """
+    x_min, y_min, x_max, y_max = bounds
+    ref_x, ref_y = reference_transform[0], reference_transform[3]
+    x_res = abs(reference_transform[1])
+    y_res = abs(reference_transform[5])
+
+    col = math.floor((x_min - ref_x) / x_res + ALIGNMENT_TOLERANCE)
+    row = math.floor((ref_y - y_max) / y_res + ALIGNMENT_TOLERANCE)
+    origin_x = ref_x + col * x_res
+    origin_y = ref_y - row * y_res
+
+    width = max(1, math.ceil((x_max - origin_x) / x_res - ALIGNMENT_TOLERANCE))
+    height = max(1, math.ceil((origin_y - y_min) / y_res - ALIGNMENT_TOLERANCE))
+
+    return RasterGrid(
+        crs_wkt, (origin_x, x_res, 0.0, origin_y, 0.0, -y_res), width, height
+    )
+
+
+def is_aligned(path: str, grid: RasterGrid) -> bool:
+    """Checks whether the pixels of the layer coincide with the grid
+    pixels i.e. the layer can be read without resampling.
+
+    :param path: Path of the layer.
+    :type path: str
+
+    :param grid: Analysis grid.
+    :type grid: RasterGrid
+
+    :returns: True if the layer is aligned to the grid else False,
+    layers that cannot be opened are not aligned.
+    :rtype: bool
+    """
+    ds = gdal.Open(path)
+    if ds is None:
+        return False
+
+    return source_window(ds, grid) is not None
+
+
+def window_file_name(path: str, extension: str = "vrt") -> str:
+    """Returns a unique file name for the window of the layer.
+
+    :param path: Path of the layer.
+    :type path: str
+
+    :param extension: Extension of the window file, vrt for virtual
+    datasets and tif for layers warped to the grid.
+    :type extension: str
+
+    :returns: Name of the window file.
+    :rtype: str
+    """
+    digest = hashlib.sha1(str(Path(path).resolve()).encode("utf-8")).hexdigest()
+
+    return f"{Path(path).stem}_{digest[:8]}.{extension}"
+
+
+def warp_to_grid(
+    path: str,
+    grid: RasterGrid,
+    output_path: str,
+    nodata: float = None,
+    callback: typing.Callable = None,
+) -> bool:
+    """Warps the layer to the grid using the nearest neighbour and saves
+    it as a GeoTIFF, the partial file is removed if warping fails.
+
+    :param path: Path of the layer.
+    :type path: str
+
+    :param grid: Analysis grid.
+    :type grid: RasterGrid
+
+    :param output_path: Path of the warped layer.
+    :type output_path: str
+
+    :param nodata: No data value used if the layer does not have one.
+    :type nodata: float
+
+    :param callback: GDAL progress callback, warping stops if it
+    returns zero.
+    :type callback: Callable
+
+    :returns: True if the layer was warped else False.
+    :rtype: bool
+    """
+    src = gdal.Open(path)
+    if src is None:
+        return False
+
+    src_nodata = src.GetRasterBand(1).GetNoDataValue()
+    dst_nodata = nodata if src_nodata is None else src_nodata
+
+    ds = gdal.Warp(
+        output_path,
+        src,
+        format="GTiff",
+        outputBounds=grid.bounds,
+        width=grid.width,
+        height=grid.height,
+        dstSRS=grid.crs_wkt,
+        dstNodata=dst_nodata,
+        resampleAlg="near",
+        creationOptions=WARPED_CREATION_OPTIONS,
+        callback=callback,
+    )
+    if ds is not None:
+        # Closing the dataset writes the warped layer
+        ds = None
+        return True
+
+    if os.path.exists(output_path):
+        try:
+            os.remove(output_path)
+        except OSError as ex:
+            log(f"Unable to remove the partial layer {output_path}, {ex}")
+
+    return False
@@ -0,0 +1,774 @@
+# -*- coding: utf-8 -*-
+"""
+Worker side of the tiled analysis.
+
+The tile processor and the data it is sent with only depend on NumPy
+and GDAL so that the worker processes computing the tiles do not need
+to import QGIS. Models and statistics are passed to the processor as
+plain data classes.
+"""
+import dataclasses
+import math
+from pathlib import Path
+import threading
+import time
+import typing
+from uuid import UUID
+
+import numpy as np
+from osgeo import gdal, osr
+
+from ...definitions.constants import NCS_CARBON_SEGMENT
+
+NODATA_VALUE = -9999
+
+# Column offset, row offset, width and height of a tile
+Tile = typing.Tuple[int, int, int, int]
+
+GRID_ALIGNMENT = "grid_alignment"
+PATHWAY_STATISTICS = "pathway_statistics"
+MODEL_STATISTICS = "model_statistics"
+OUTPUTS = "outputs"
+
+# Tolerance, in pixels, when comparing the alignment of grids
+ALIGNMENT_TOLERANCE = 1e-6
+
+
+@dataclasses.dataclass
+class RasterGrid:
+    """Output grid that all the inputs are aligned to."""
+
+    crs_wkt: str
+    geo_transform: typing.Tuple[float, float, float, float, float, float]
+    width: int
+    height: int
+
+    @property
+    def bounds(self) -> typing.Tuple[float, float, float, float]:
+        """Returns the grid bounds as (xmin, ymin, xmax, ymax)."""
+        x_min, x_res, _, y_max, _, y_res = self.geo_transform
+
+        return (
+            x_min,
+            y_max + self.height * y_res,
+            x_min + self.width * x_res,
+            y_max,
+        )
+
+    @property
+    def resolution(self) -> typing.Tuple[float, float]:
+        """Returns the width and height of the grid pixels."""
+        return abs(self.geo_transform[1]), abs(self.geo_transform[5])
+
+
+@dataclasses.dataclass
+class BandStatistics:
+    """Statistics of a band computed from its blocks."""
+
+    minimum: float = None
+    maximum: float = None
+    count: int = 0
+    total: float = 0.0
+    sum_squares: float = 0.0
+
+    @classmethod
+    def from_dict(cls, values: typing.Dict) -> "BandStatistics":
+        """Creates the statistics from a dictionary, unknown keys
+        are ignored.
+
+        :param values: Statistics values.
+        :type values: dict
+
+        :returns: Band statistics.
+        :rtype: BandStatistics
+        """
+        names = [field.name for field in dataclasses.fields(cls)]
+
+        return cls(**{k: v for k, v in values.items() if k in names})
+
+    @property
+    def mean(self) -> typing.Optional[float]:
+        """Returns the mean of the valid values.
+
+        :returns: Mean or None if there are no valid values.
+        :rtype: float
+        """
+        if self.count == 0:
+            return None
+
+        return self.total / self.count
+
+    @property
+    def std_dev(self) -> typing.Optional[float]:
+        """Returns the population standard deviation of the valid values.
+
+        :returns: Standard deviation or None if there are no valid values.
+        :rtype: float
+        """
+        if self.count == 0:
+            return None
+
+        variance = self.sum_squares / self.count - self.mean**2
+
+        return math.sqrt(max(variance, 0.0))
+
+    def update(self, values: np.ndarray):
+        """Updates the statistics with the valid values in the block.
+
+        :param values: Block values, invalid pixels are NaN.
+        :type values: np.ndarray
+        """
+        valid = values[~np.isnan(values)]
+        if valid.size == 0:
+            return
+
+        self.merge(
+            BandStatistics(
+                float(valid.min()),
+                float(valid.max()),
+                int(valid.size),
+                float(valid.sum()),
+                float(np.square(valid).sum()),
+            )
+        )
+
+    def merge(self, other: "BandStatistics"):
+        """Adds the statistics of another part of the band.
+
+        :param other: Statistics to be added.
+        :type other: BandStatistics
+        """
+        if other.count == 0:
+            return
+
+        if self.count == 0:
+            self.minimum = other.minimum
+            self.maximum = other.maximum
+        else:
+            self.minimum = min(self.minimum, other.minimum)
+            self.maximum = max(self.maximum, other.maximum)
+
+        self.count += other.count
+        self.total += other.total
+        self.sum_squares += other.sum_squares
+
+
+@dataclasses.dataclass
+class PriorityWeight:
+    """Priority weighting layer and the coefficient of the group
+    it contributes to in an implementation model weighting.
+    """
+
+    path: str
+    coefficient: float
+
+
+@dataclasses.dataclass
+class PathwayInputs:
+    """Layers of an NCS pathway read by the tile processor."""
+
+    uuid: UUID
+    path: str
+    carbon_paths: typing.List[str] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class ModelInputs:
+    """Layers of an implementation model read by the tile processor."""
+
+    uuid: UUID
+    path: str
+    pathways: typing.List[PathwayInputs] = dataclasses.field(default_factory=list)
+
+    @classmethod
+    def from_model(cls, model) -> "ModelInputs":
+        """Creates the inputs from an implementation model.
+
+        :param model: Implementation model.
+        :type model: ImplementationModel
+
+        :returns: Inputs of the implementation model.
+        :rtype: ModelInputs
+        """
+        return cls(
+            model.uuid,
+            model.path,
+            [
+                PathwayInputs(pathway.uuid, pathway.path, list(pathway.carbon_paths))
+                for pathway in model.pathways
+            ],
+        )
+
+
+def source_window(
+    ds: gdal.Dataset, grid: RasterGrid
+) -> typing.Optional[typing.List[int]]:
+    """Returns the pixel window of the dataset that matches the grid
+    if the dataset pixels are aligned to the grid.
+
+    :param ds: Source dataset.
+    :type ds: gdal.Dataset
+
+    :param grid: Analysis grid.
+    :type grid: RasterGrid
+
+    :returns: Column offset, row offset, width and height of the window
+    or None if the dataset needs to be warped to the grid.
+    :rtype: list
+    """
+    src_transform = ds.GetGeoTransform()
+    if src_transform[2] != 0 or src_transform[4] != 0:
+        return None
+
+    src_srs = osr.SpatialReference()
+    src_srs.ImportFromWkt(ds.GetProjection())
+    grid_srs = osr.SpatialReference()
+    grid_srs.ImportFromWkt(grid.crs_wkt)
+    if not src_srs.IsSame(grid_srs):
+        return None
+
+    x_res, y_res = grid.geo_transform[1], grid.geo_transform[5]
+    if abs(src_transform[1] - x_res) > ALIGNMENT_TOLERANCE * abs(x_res) or abs(
+        src_transform[5] - y_res
+    ) > ALIGNMENT_TOLERANCE * abs(y_res):
+        return None
+
+    col = (grid.geo_transform[0] - src_transform[0]) / x_res
+    row = (grid.geo_transform[3] - src_transform[3]) / y_res
+    if (
+        abs(col - round(col)) > ALIGNMENT_TOLERANCE
+        or abs(row - round(row)) > ALIGNMENT_TOLERANCE
+    ):
+        return None
+
+    return [int(round(col)), int(round(row)), grid.width, grid.height]
+
+
+def create_window(
+    path: str, grid: RasterGrid, output_path: str = "", nodata: float = None
+) -> gdal.Dataset:
+    """Creates a virtual dataset of the layer cropped to the grid. Layers
+    aligned to the grid reference their source pixels directly while
+    other layers are warped to the grid using the nearest neighbour.
+
+    :param path: Path of the layer.
+    :type path: str
+
+    :param grid: Analysis grid.
+    :type grid: RasterGrid
+
+    :param output_path: Path of the VRT file, the window is only kept
+    in memory if empty.
+    :type output_path: str
+
+    :param nodata: No data value used if the layer does not have one.
+    :type nodata: float
+
+    :returns: Window dataset.
+    :rtype: gdal.Dataset
+    """
+    src = gdal.Open(path)
+    src_nodata = src.GetRasterBand(1).GetNoDataValue()
+    dst_nodata = nodata if src_nodata is None else src_nodata
+
+    window = source_window(src, grid)
+    if window is not None:
+        return gdal.Translate(
+            output_path,
+            src,
+            format="VRT",
+            srcWin=window,
+            noData=dst_nodata,
+        )
+
+    return gdal.Warp(
+        output_path,
+        src,
+        format="VRT",
+        outputBounds=grid.bounds,
+        width=grid.width,
+        height=grid.height,
+        dstSRS=grid.crs_wkt,
+        dstNodata=dst_nodata,
+        resampleAlg="near",
+    )
+
+
+def normalize(values: np.ndarray, stats: BandStatistics, index: float) -> np.ndarray:
+    """Rescales the values using the band statistics i.e.
+    index * (value - minimum) / (maximum - minimum).
+
+    :param values: Values to be normalized.
+    :type values: np.ndarray
+
+    :param stats: Statistics of the band the values belong to.
+    :type stats: BandStatistics
+
+    :param index: Normalization index.
+    :type index: float
+
+    :returns: Normalized values, pixels that cannot be normalized are NaN.
+    :rtype: np.ndarray
+    """
+    if stats.minimum is None:
+        return np.full(values.shape, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = index * (values - stats.minimum) / (stats.maximum - stats.minimum)
+    normalized[~np.isfinite(normalized)] = np.nan
+
+    return normalized
+
+
+def nan_sum(arrays: typing.List[np.ndarray]) -> np.ndarray:
+    """Cell sum of the arrays ignoring NaN values. Cells where all
+    the values are NaN remain NaN.
+
+    :param arrays: Arrays of a similar shape to be added.
+    :type arrays: list
+
+    :returns: Cell sum of the arrays.
+    :rtype: np.ndarray
+    """
+    stack = np.stack(arrays)
+    total = np.nansum(stack, axis=0)
+    total[np.all(np.isnan(stack), axis=0)] = np.nan
+
+    return total
+
+
+def highest_position(arrays: typing.List[np.ndarray]) -> np.ndarray:
+    """Zero-based position of the array with the highest value in each
+    cell, NaN values are ignored and ties resolve to the first array.
+
+    :param arrays: Arrays of a similar shape to be compared.
+    :type arrays: list
+
+    :returns: Positions of the highest values, -1 where all values are NaN.
+    :rtype: np.ndarray
+    """
+    stack = np.stack(arrays)
+    no_data = np.all(np.isnan(stack), axis=0)
+    positions = np.argmax(np.where(np.isnan(stack), -np.inf, stack), axis=0)
+    positions[no_data] = -1
+
+    return positions
+
+
+def existing_carbon_paths(pathway: PathwayInputs, base_dir: str) -> typing.List[str]:
+    """Returns the paths of the pathway carbon layers that exist.
+
+    :param pathway: NCS pathway or its inputs.
+    :type pathway: PathwayInputs
+
+    :param base_dir: Plugin base data directory of relative carbon paths.
+    :type base_dir: str
+
+    :returns: Absolute paths of the existing carbon layers.
+    :rtype: list
+    """
+    carbon_paths = []
+    for carbon_path in pathway.carbon_paths:
+        if base_dir not in carbon_path:
+            carbon_path = f"{base_dir}/{NCS_CARBON_SEGMENT}/{carbon_path}"
+        if Path(carbon_path).exists():
+            carbon_paths.append(carbon_path)
+
+    return carbon_paths
+
+
+@dataclasses.dataclass
+class TileProcessor:
+    """Inputs of the analysis stages and the computation of a stage on
+    a single tile. Statistics are only read, they are merged by the
+    engine from the statistics returned for each tile.
+    """
+
+    grid: RasterGrid
+    # Windows of the input layers on the grid indexed by layer path
+    windows: typing.Dict[str, str]
+    base_dir: str
+    carbon_coefficient: float
+    suitability_index: float
+    normalization_index: float
+    apply_weighting: bool
+    priority_weights: typing.Dict[str, typing.List[PriorityWeight]]
+    models: typing.List[ModelInputs]
+    pathway_stats: typing.Dict
+    model_stats: typing.Dict
+    # Cached rasters used in place of computing the models
+    normalized_sources: typing.Dict
+    weighted_sources: typing.Dict
+    # Paths of the outputs indexed by pathway or model UUID
+    model_outputs: typing.Dict
+    normalized_outputs: typing.Dict
+    scenario_output: str
+    position_values: np.ndarray
+    carbon_pathway_outputs: typing.Dict = dataclasses.field(default_factory=dict)
+    normalized_pathway_outputs: typing.Dict = dataclasses.field(default_factory=dict)
+    implementation_model_outputs: typing.Dict = dataclasses.field(default_factory=dict)
+    keep_intermediates: bool = False
+
+    def __post_init__(self):
+        # GDAL datasets cannot be shared across threads
+        self._local = threading.local()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _dataset(self, path: str) -> gdal.Dataset:
+        """Opens the window of the layer in the given path.
+
+        :param path: Path to the raster layer.
+        :type path: str
+
+        :returns: Virtual dataset matching the analysis grid.
+        :rtype: gdal.Dataset
+        """
+        datasets = self._local.__dict__.setdefault("datasets", {})
+        if path in datasets:
+            return datasets[path]
+
+        if path in self.windows:
+            ds = gdal.Open(self.windows[path])
+        else:
+            # Rasters from previous runs are only kept in memory
+            ds = create_window(path, self.grid, nodata=NODATA_VALUE)
+        datasets[path] = ds
+
+        return ds
+
+    def read(self, path: str, tile: Tile) -> np.ndarray:
+        """Reads a tile of the layer in the given path.
+
+        :param path: Path to the raster layer.
+        :type path: str
+
+        :param tile: Tile to be read.
+        :type tile: tuple
+
+        :returns: Tile values where no data pixels are NaN.
+        :rtype: np.ndarray
+        """
+        band = self._dataset(path).GetRasterBand(1)
+        raw_values = band.ReadAsArray(*tile)
+        self._local.bytes_read = (
+            getattr(self._local, "bytes_read", 0) + raw_values.nbytes
+        )
+        values = raw_values.astype(np.float64)
+        nodata = band.GetNoDataValue()
+        if nodata is not None:
+            values[values == nodata] = np.nan
+
+        return values
+
+    def carbon_weighted_pathway(self, pathway: PathwayInputs, tile: Tile) -> np.ndarray:
+        """Combines the pathway with the average of its carbon layers
+        i.e. suitability_index * pathway + carbon_coefficient * carbon_mean.
+
+        :param pathway: NCS pathway.
+        :type pathway: PathwayInputs
+
+        :param tile: Tile to be computed.
+        :type tile: tuple
+
+        :returns: Carbon weighted pathway tile.
+        :rtype: np.ndarray
+        """
+        values = self.read(pathway.path, tile)
+        if self.suitability_index > 0:
+            values = self.suitability_index * values
+
+        carbon_paths = existing_carbon_paths(pathway, self.base_dir)
+        if self.carbon_coefficient > 0 and carbon_paths:
+            carbon_total = sum(
+                self.read(carbon_path, tile) for carbon_path in carbon_paths
+            )
+            # Average uses the number of defined carbon layers
+            divisor = len(pathway.carbon_paths) if len(carbon_paths) > 1 else 1
+            values = values + self.carbon_coefficient * (carbon_total / divisor)
+
+        return values
+
+    def implementation_model(
+        self,
+        model: ModelInputs,
+        tile: Tile,
+        intermediates: typing.Dict = None,
+    ) -> np.ndarray:
+        """Computes the cell sum of the model layer or normalized pathways.
+
+        :param model: Implementation model.
+        :type model: ModelInputs
+
+        :param tile: Tile to be computed.
+        :type tile: tuple
+
+        :param intermediates: Tiles of the intermediate layers being
+        saved indexed by output path, updated with the tiles of the
+        pathways and model.
+        :type intermediates: dict
+
+        :returns: Implementation model tile.
+        :rtype: np.ndarray
+        """
+        arrays = []
+        if model.path:
+            arrays.append(self.read(model.path, tile))
+
+        for pathway in model.pathways:
+            values = self.carbon_weighted_pathway(pathway, tile)
+            normalized = normalize(
+                values, self.pathway_stats[pathway.uuid], self.normalization_index
+            )
+            arrays.append(normalized)
+            if (
+                intermediates is not None
+                and pathway.uuid in self.carbon_pathway_outputs
+            ):
+                intermediates[self.carbon_pathway_outputs[pathway.uuid]] = values
+                intermediates[
+                    self.normalized_pathway_outputs[pathway.uuid]
+                ] = normalized
+
+        values = nan_sum(arrays)
+        if (
+            intermediates is not None
+            and model.uuid in self.implementation_model_outputs
+        ):
+            intermediates[self.implementation_model_outputs[model.uuid]] = values
+
+        return values
+
+    def normalized_implementation_model(
+        self,
+        model: ModelInputs,
+        tile: Tile,
+        intermediates: typing.Dict = None,
+    ) -> np.ndarray:
+        """Normalizes the implementation model or reads it from the
+        cache if it has been computed in a previous run.
+
+        :param model: Implementation model.
+        :type model: ModelInputs
+
+        :param tile: Tile to be computed.
+        :type tile: tuple
+
+        :param intermediates: Tiles of the intermediate layers being saved.
+        :type intermediates: dict
+
+        :returns: Normalized implementation model tile.
+        :rtype: np.ndarray
+        """
+        if model.uuid in self.normalized_sources:
+            return self.read(self.normalized_sources[model.uuid], tile)
+
+        return normalize(
+            self.implementation_model(model, tile, intermediates),
+            self.model_stats[model.uuid],
+            self.normalization_index,
+        )
+
+    def weighted_implementation_model(
+        self,
+        model: ModelInputs,
+        values: np.ndarray,
+        tile: Tile,
+        priority_values: typing.Dict[str, np.ndarray] = None,
+    ) -> np.ndarray:
+        """Adds the priority weighting layers of the implementation
+        model multiplied by the group coefficients.
+
+        :param model: Implementation model.
+        :type model: ModelInputs
+
+        :param values: Normalized implementation model tile.
+        :type values: np.ndarray
+
+        :param tile: Tile to be computed.
+        :type tile: tuple
+
+        :param priority_values: Tiles of the priority weighting layers
+        already read indexed by layer path, updated with the layers read
+        so that layers shared by the models are only read once.
+        :type priority_values: dict
+
+        :returns: Weighted implementation model tile.
+        :rtype: np.ndarray
+        """
+        if not self.apply_weighting:
+            return values
+
+        if priority_values is None:
+            priority_values = {}
+        for weight in self.priority_weights.get(str(model.uuid), []):
+            if weight.path not in priority_values:
+                priority_values[weight.path] = self.read(weight.path, tile)
+            values = values + weight.coefficient * priority_values[weight.path]
+
+        return values
+
+    def outputs(self, tile: Tile) -> typing.List[typing.Tuple[str, np.ndarray]]:
+        """Computes the weighted implementation models, the highest
+        position scenario output and the layers being saved.
+
+        :param tile: Tile to be computed.
+        :type tile: tuple
+
+        :returns: Output path and values of each output tile.
+        :rtype: list
+        """
+        weighted_arrays = []
+        normalized_arrays = {}
+        # Priority weighting layers shared by the models are read once
+        priority_values = {}
+        intermediates = {} if self.keep_intermediates else None
+        for model in self.models:
+            if model.uuid in self.weighted_sources:
+                weighted_arrays.append(
+                    self.read(self.weighted_sources[model.uuid], tile)
+                )
+                continue
+
+            values = self.normalized_implementation_model(model, tile, intermediates)
+            if model.uuid in self.normalized_outputs:
+                normalized_arrays[model.uuid] = values
+            weighted_arrays.append(
+                self.weighted_implementation_model(model, values, tile, priority_values)
+            )
+
+        positions = highest_position(weighted_arrays)
+        scenario_values = np.where(
+            positions < 0, np.nan, self.position_values[positions]
+        )
+
+        output_tiles = [
+            (self.model_outputs[model.uuid], values)
+            for model, values in zip(self.models, weighted_arrays)
+        ]
+        output_tiles.append((self.scenario_output, scenario_values))
+        output_tiles.extend(
+            (self.normalized_outputs[model_uuid], values)
+            for model_uuid, values in normalized_arrays.items()
+        )
+        if intermediates:
+            output_tiles.extend(intermediates.items())
+
+        return output_tiles
+
+    def process(self, stage: str, key, tile: Tile):
+        """Computes a stage of the analysis on a tile.
+
+        :param stage: PATHWAY_STATISTICS, MODEL_STATISTICS or OUTPUTS.
+        :type stage: str
+
+        :param key: UUID of the pathway or model whose statistics
+        are computed.
+        :type key: uuid.UUID
+
+        :param tile: Tile to be computed.
+        :type tile: tuple
+
+        :returns: Statistics of the tile or the output tiles.
+        :rtype: BandStatistics, list
+        """
+        if stage == OUTPUTS:
+            return self.outputs(tile)
+
+        stats = BandStatistics()
+        if stage == PATHWAY_STATISTICS:
+            pathway = next(
+                pathway
+                for model in self.models
+                for pathway in model.pathways
+                if pathway.uuid == key
+            )
+            stats.update(self.carbon_weighted_pathway(pathway, tile))
+        elif stage == MODEL_STATISTICS:
+            model = next(model for model in self.models if model.uuid == key)
+            stats.update(self.implementation_model(model, tile))
+        else:
+            raise ValueError(f"Unknown analysis stage {stage}")
+
+        return stats
+
+    def process_measured(
+        self, stage: str, key, tile: Tile
+    ) -> typing.Tuple[typing.Any, int, float]:
+        """Computes a stage of the analysis on a tile and measures the
+        bytes read and the CPU time of the computation.
+
+        :param stage: PATHWAY_STATISTICS, MODEL_STATISTICS or OUTPUTS.
+        :type stage: str
+
+        :param key: UUID of the pathway or model whose statistics
+        are computed.
+        :type key: uuid.UUID
+
+        :param tile: Tile to be computed.
+        :type tile: tuple
+
+        :returns: Result of the stage, the bytes read from the rasters
+        and the CPU time in seconds.
+        :rtype: tuple
+        """
+        bytes_read = getattr(self._local, "bytes_read", 0)
+        cpu_time = time.thread_time()
+        result = self.process(stage, key, tile)
+
+        return (
+            result,
+            getattr(self._local, "bytes_read", 0) - bytes_read,
+            time.thread_time() - cpu_time,
+        )
+
+
+# Tile processor of a worker process
+_worker_processor: typing.Optional[TileProcessor] = None
+
+
+def _initialize_worker(processor: TileProcessor, gdal_cache: int = 0):
+    """Keeps the tile processor sent to the worker process and sets
+    the size of its GDAL block cache.
+    """
+    global _worker_processor
+    _worker_processor = processor
+    if gdal_cache > 0:
+        gdal.SetCacheMax(gdal_cache)
+
+
+def process_tile(stage: str, key, tile: Tile, pathway_stats, model_stats):
+    """Computes a stage of the analysis on a tile in a worker process
+    using the statistics available when the tile was submitted.
+
+    :param stage: PATHWAY_STATISTICS, MODEL_STATISTICS or OUTPUTS.
+    :type stage: str
+
+    :param key: UUID of the pathway or model whose statistics
+    are computed.
+    :type key: uuid.UUID
+
+    :param tile: Tile to be computed.
+    :type tile: tuple
+
+    :param pathway_stats: Statistics of the pathways.
+    :type pathway_stats: dict
+
+    :param model_stats: Statistics of the implementation models.
+    :type model_stats: dict
+
+    :returns: Statistics of the tile or the output tiles, the bytes
+    read and the CPU time of the computation.
+    :rtype: tuple
+    """
+    _worker_processor.pathway_stats = pathway_stats
+    _worker_processor.model_stats = model_stats
+
+    return _worker_processor.process_measured(stage, key, tile)
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Performance manifest of a scenario analysis run.
+
+The manifest is saved in the scenario directory with the timings of
+each stage, pathway and implementation model, the bytes read and
+written, the cache lookups, the peak memory and the settings used so
+that runs can be compared when looking for regressions.
+
+The peak memory of the run is sampled while the run is in progress, the
+peak reported by the operating system covers the whole lifetime of the
+process e.g. the QGIS session.
+"""
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import typing
+
+from osgeo import gdal
+
+from ...utils import log
+
+# Seconds between the samples of the memory used by a run
+RSS_SAMPLE_INTERVAL = 0.1
+
+
+def current_rss() -> typing.Optional[int]:
+    """Returns the resident set size of the process.
+
+    :returns: Memory in bytes or None if it is not available on
+    the platform.
+    :rtype: int
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    if os.name == "nt":
+        counters = _windows_memory_counters()
+        return counters.WorkingSetSize if counters is not None else None
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+
+    return psutil.Process().memory_info().rss
+
+
+def process_peak_rss(children: bool = False) -> typing.Optional[int]:
+    """Returns the peak resident set size since the process started,
+    within QGIS it is the peak of the whole QGIS session.
+
+    :param children: Whether to return the largest peak of the child
+    processes that have exited since the process started, e.g. analysis
+    worker processes of this and previous runs.
+    :type children: bool
+
+    :returns: Peak memory in bytes or None if it is not available
+    on the platform.
+    :rtype: int
+    """
+    try:
+        import resource
+    except ImportError:
+        if children:
+            return None
+        counters = _windows_memory_counters()
+        return counters.PeakWorkingSetSize if counters is not None else None
+
+    usage = resource.getrusage(
+        resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    )
+    # The size is in bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return usage.ru_maxrss
+
+    return usage.ru_maxrss * 1024
+
+
+def _windows_memory_counters():
+    """Returns the memory counters of the current process on Windows.
+
+    :returns: Process memory counters or None if they are not available.
+    :rtype: ctypes.Structure
+    """
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+            process, ctypes.byref(counters), counters.cb
+        ):
+            return None
+
+        return counters
+    except (AttributeError, OSError):
+        return None
+
+
+def environment() -> typing.Dict:
+    """Returns the versions of the software used by the analysis.
+
+    :returns: Python, GDAL and platform details.
+    :rtype: dict
+    """
+    return {
+        "python": platform.python_version(),
+        "gdal": gdal.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+class RunMetrics:
+    """Accumulates the bytes read and the CPU time of the tiles computed
+    for each stage and for each pathway or implementation model, the
+    tiles can be computed in the analysis threads or worker processes.
+    """
+
+    def __init__(self, sample_interval: float = RSS_SAMPLE_INTERVAL):
+        """
+        :param sample_interval: Seconds between the samples of the
+        memory used by the run.
+        :type sample_interval: float
+        """
+        self._lock = threading.Lock()
+        self._totals: typing.Dict[typing.Tuple[str, str], typing.Dict] = {}
+        self._start_time = None
+        self._start_cpu_time = None
+        self._sample_interval = sample_interval
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+        self._peak_rss = None
+
+    def start(self):
+        """Records the start of the run and starts sampling its memory."""
+        self._start_time = time.perf_counter()
+        self._start_cpu_time = time.process_time()
+        self._peak_rss = None
+        self._sample_rss()
+        self._stop_sampling.clear()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Stops sampling the memory of the run."""
+        if self._sampler is None:
+            return
+
+        self._stop_sampling.set()
+        self._sampler.join()
+        self._sampler = None
+        self._sample_rss()
+
+    def _sample(self):
+        """Samples the memory until the run stops."""
+        while not self._stop_sampling.wait(self._sample_interval):
+            if not self._sample_rss():
+                return
+
+    def _sample_rss(self) -> bool:
+        """Updates the peak memory of the run with the current memory.
+
+        :returns: False if the memory is not available else True.
+        :rtype: bool
+        """
+        rss = current_rss()
+        if rss is None:
+            return False
+
+        with self._lock:
+            self._peak_rss = max(self._peak_rss or 0, rss)
+
+        return True
+
+    @property
+    def peak_rss(self) -> typing.Optional[int]:
+        """Returns the largest memory sampled during the run in bytes,
+        worker processes are not included.
+        """
+        with self._lock:
+            return self._peak_rss
+
+    @property
+    def wall_time(self) -> float:
+        """Returns the time elapsed since the start of the run in seconds."""
+        if self._start_time is None:
+            return 0.0
+
+        return time.perf_counter() - self._start_time
+
+    @property
+    def cpu_time(self) -> float:
+        """Returns the CPU time of the analysis process since the start
+        of the run in seconds, worker processes are not included.
+        """
+        if self._start_cpu_time is None:
+            return 0.0
+
+        return time.process_time() - self._start_cpu_time
+
+    def add_tile(self, stage: str, key, bytes_read: int, cpu_time: float):
+        """Adds the metrics of a computed tile.
+
+        :param stage: Stage of the analysis.
+        :type stage: str
+
+        :param key: UUID of the pathway or model, None for the outputs.
+        :type key: uuid.UUID
+
+        :param bytes_read: Bytes read from the input rasters.
+        :type bytes_read: int
+
+        :param cpu_time: CPU time used to compute the tile in seconds.
+        :type cpu_time: float
+        """
+        with self._lock:
+            totals = self._totals.setdefault(
+                (stage, str(key) if key is not None else ""),
+                {"tiles": 0, "bytes_read": 0, "tile_cpu_time": 0.0},
+            )
+            totals["tiles"] += 1
+            totals["bytes_read"] += bytes_read
+            totals["tile_cpu_time"] += cpu_time
+
+    def totals(self, stage: str, key=None) -> typing.Dict:
+        """Returns the metrics of the tiles of a pathway, model or stage.
+
+        :param stage: Stage of the analysis.
+        :type stage: str
+
+        :param key: UUID of the pathway or model, None sums the metrics
+        of all the tiles of the stage.
+        :type key: uuid.UUID
+
+        :returns: Number of tiles, bytes read and the CPU time used to
+        compute the tiles.
+        :rtype: dict
+        """
+        result = {"tiles": 0, "bytes_read": 0, "tile_cpu_time": 0.0}
+        with self._lock:
+            for (total_stage, total_key), totals in self._totals.items():
+                if total_stage != stage or (key is not None and total_key != str(key)):
+                    continue
+                for name, value in totals.items():
+                    result[name] += value
+
+        return result
+
+
+def save_run_manifest(path: str, manifest: typing.Dict):
+    """Saves the run manifest as JSON.
+
+    :param path: Path of the manifest file.
+    :type path: str
+
+    :param manifest: JSON serializable run details.
+    :type manifest: dict
+    """
+    try:
+        with open(f"{path}.part", "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        os.replace(f"{path}.part", path)
+    except (OSError, TypeError, ValueError) as ex:
+        log(f"Unable to save the run manifest to {path}, {ex}", info=False)
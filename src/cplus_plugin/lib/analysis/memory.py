@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Sizing of the analysis tiles and caches from a memory budget.
+
+The memory used by the analysis is dominated by the tiles being
+computed, which grow with the number of implementation models, and by
+the GDAL block cache. The budget is split between the two so that the
+peak memory does not depend on the size of the input rasters.
+"""
+import dataclasses
+import math
+import threading
+import typing
+
+from osgeo import gdal
+
+from ...models.base import ImplementationModel
+
+# Size in bytes of the values of a tile pixel
+PIXEL_VALUE_BYTES = 8
+
+# Smallest tile width and height picked for the memory budget, larger
+# tiles are multiples of it
+MIN_TILE_SIZE = 64
+
+# Fraction of the memory budget used by the GDAL block cache
+GDAL_CACHE_FRACTION = 0.25
+
+# Estimated memory used by a worker process before computing any tile
+WORKER_PROCESS_BYTES = 128 * 1024 * 1024
+
+
+def tile_pixel_bytes(
+    models: typing.List[ImplementationModel],
+    keep_intermediates: bool = False,
+    priority_layers: int = 0,
+) -> int:
+    """Estimates the memory used for each pixel of a tile when computing
+    the outputs, the largest of the analysis stages.
+
+    :param models: Implementation models being analyzed.
+    :type models: list
+
+    :param keep_intermediates: Whether the pathway and model layers
+    are also saved.
+    :type keep_intermediates: bool
+
+    :param priority_layers: Number of distinct priority weighting layers
+    applied to the models, each is kept in memory while computing a tile.
+    :type priority_layers: int
+
+    :returns: Number of bytes per tile pixel.
+    :rtype: int
+    """
+    max_pathways = max([len(model.pathways) for model in models], default=0)
+    # The weighted and normalized models, their stacked copies when
+    # finding the highest position and the arrays of the model being
+    # computed.
+    arrays = 4 * len(models) + 2 * max_pathways + priority_layers + 6
+    if keep_intermediates:
+        arrays += sum(2 * len(model.pathways) + 1 for model in models)
+
+    return arrays * PIXEL_VALUE_BYTES
+
+
+@dataclasses.dataclass
+class MemoryPlan:
+    """Tile size, concurrency and cache sizes fitting a memory budget."""
+
+    tile_size: int
+    # Maximum number of tiles being computed or written at the same time
+    tiles_in_flight: int
+    # GDAL block cache in bytes of the analysis and each worker process
+    gdal_cache: int
+    worker_gdal_cache: int = 0
+    # Number of analysis threads and worker processes fitting the budget,
+    # no worker processes are started if none fit.
+    workers: int = 1
+    worker_processes: int = 0
+    # Whether the budget is too small for a single tile of the minimum size,
+    # one tile at a time is then computed beyond the budget.
+    over_budget: bool = False
+
+
+def memory_plan(
+    budget: int,
+    pixel_bytes: int,
+    workers: int,
+    max_tile_size: int,
+    worker_processes: int = 0,
+) -> MemoryPlan:
+    """Picks the largest tiles that allow all the workers to compute a
+    tile within the memory budget. The number of worker processes and
+    threads is reduced so that their fixed memory and a tile of the
+    smallest size for each of them fit the budget.
+
+    :param budget: Memory budget in bytes.
+    :type budget: int
+
+    :param pixel_bytes: Memory used for each tile pixel.
+    :type pixel_bytes: int
+
+    :param workers: Number of analysis threads.
+    :type workers: int
+
+    :param max_tile_size: Largest tile width and height in pixels.
+    :type max_tile_size: int
+
+    :param worker_processes: Number of worker processes computing the
+    tiles, zero if the tiles are computed in the analysis threads.
+    :type worker_processes: int
+
+    :returns: Memory plan of the analysis.
+    :rtype: MemoryPlan
+    """
+    cache = int(budget * GDAL_CACHE_FRACTION)
+    max_tile_size = max(1, int(max_tile_size))
+    min_tile_size = min(MIN_TILE_SIZE, max_tile_size)
+    pixel_bytes = max(1, pixel_bytes)
+    tile_bytes = min_tile_size * min_tile_size * pixel_bytes
+
+    workers = max(1, workers)
+    if worker_processes:
+        worker_processes = min(
+            worker_processes,
+            max(0, budget - cache) // (WORKER_PROCESS_BYTES + tile_bytes),
+        )
+    if worker_processes:
+        # Each worker process is used by an analysis thread
+        workers = min(workers, worker_processes)
+    else:
+        workers = min(workers, max(1, max(0, budget - cache) // tile_bytes))
+
+    gdal_cache = cache
+    worker_gdal_cache = 0
+    if worker_processes:
+        # Each process has its own block cache
+        gdal_cache = cache // 2
+        worker_gdal_cache = (cache - gdal_cache) // worker_processes
+
+    available = budget - cache - worker_processes * WORKER_PROCESS_BYTES
+    # Worker processes are kept busy with a queued tile each
+    wanted = 2 * worker_processes if worker_processes else workers
+
+    tile_size = int(math.sqrt(max(0, available) / (wanted * pixel_bytes)))
+    tile_size = min(max_tile_size, tile_size)
+    if tile_size > MIN_TILE_SIZE:
+        tile_size -= tile_size % MIN_TILE_SIZE
+    if tile_size >= min_tile_size:
+        return MemoryPlan(
+            tile_size,
+            wanted,
+            gdal_cache,
+            worker_gdal_cache,
+            workers,
+            worker_processes,
+        )
+
+    tiles_in_flight = min(wanted, max(0, available) // tile_bytes)
+
+    return MemoryPlan(
+        min_tile_size,
+        max(1, tiles_in_flight),
+        gdal_cache,
+        worker_gdal_cache,
+        workers,
+        worker_processes,
+        over_budget=tiles_in_flight < 1,
+    )
+
+
+class GdalCacheReservation:
+    """Sets the GDAL block cache to the sum of the sizes reserved by the
+    analyses running in the process and restores the previous size once
+    all of them have completed.
+    """
+
+    _lock = threading.Lock()
+    _users = 0
+    _reserved = 0
+    _previous = None
+
+    def __init__(self, size: int):
+        """
+        :param size: Cache size in bytes reserved by the analysis.
+        :type size: int
+        """
+        self._size = max(0, int(size))
+
+    def __enter__(self):
+        cls = GdalCacheReservation
+        with cls._lock:
+            if cls._users == 0:
+                cls._previous = gdal.GetCacheMax()
+            cls._users += 1
+            cls._reserved += self._size
+            gdal.SetCacheMax(max(cls._reserved, 1))
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        cls = GdalCacheReservation
+        with cls._lock:
+            cls._users -= 1
+            cls._reserved -= self._size
+            if cls._users == 0:
+                gdal.SetCacheMax(cls._previous)
+                cls._previous = None
+            else:
+                gdal.SetCacheMax(max(cls._reserved, 1))
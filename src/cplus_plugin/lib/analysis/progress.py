@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Overall progress of the analysis stages run by concurrent sub-tasks.
+"""
+import threading
+import time
+import typing
+
+from qgis.core import QgsFeedback
+
+# Minimum number of seconds between progress updates of the feedback
+DEFAULT_UPDATE_INTERVAL = 0.1
+
+
+class ProgressAggregator:
+    """Combines the work done in all the stages into a single monotonic
+    percentage and estimates the remaining time. The stages are weighted
+    by their estimated work, e.g. the number of pixels read and written,
+    and the feedback progress is updated at most once per interval.
+    """
+
+    def __init__(
+        self,
+        feedback: QgsFeedback = None,
+        update_interval: float = DEFAULT_UPDATE_INTERVAL,
+    ):
+        """
+        :param feedback: Feedback whose progress is updated.
+        :type feedback: QgsFeedback
+
+        :param update_interval: Minimum number of seconds between
+        updates of the feedback progress.
+        :type update_interval: float
+        """
+        self._feedback = feedback
+        self._update_interval = update_interval
+        self._lock = threading.Lock()
+        self._total_work: typing.Dict[str, float] = {}
+        self._done_work: typing.Dict[str, float] = {}
+        self._start_time = None
+        self._last_update = None
+        self._reported = 0.0
+
+    def add_work(self, stage: str, work: float):
+        """Adds the estimated work of a stage.
+
+        :param stage: Name of the stage.
+        :type stage: str
+
+        :param work: Estimated amount of work.
+        :type work: float
+        """
+        with self._lock:
+            self._total_work[stage] = self._total_work.get(stage, 0.0) + work
+            self._done_work.setdefault(stage, 0.0)
+            if self._start_time is None:
+                self._start_time = time.perf_counter()
+
+    def advance(self, stage: str, work: float):
+        """Records the work done in a stage and updates the feedback
+        progress if the update interval has elapsed.
+
+        :param stage: Name of the stage.
+        :type stage: str
+
+        :param work: Amount of work done.
+        :type work: float
+        """
+        with self._lock:
+            total = self._total_work.get(stage, 0.0)
+            done = self._done_work.get(stage, 0.0)
+            # Work beyond the estimate would break the monotonicity
+            self._done_work[stage] = min(total, done + work)
+
+            now = time.perf_counter()
+            if (
+                self._last_update is not None
+                and now - self._last_update < self._update_interval
+            ):
+                return
+            self._last_update = now
+            self._report(self._progress())
+
+    def finish(self):
+        """Reports the completion of all the stages."""
+        with self._lock:
+            self._done_work = dict(self._total_work)
+            self._report(100.0)
+
+    def _progress(self) -> float:
+        """Returns the percentage of the total work that has been done."""
+        total = sum(self._total_work.values())
+        if total <= 0:
+            return 0.0
+
+        return 100.0 * sum(self._done_work.values()) / total
+
+    def _report(self, progress: float):
+        """Updates the feedback if the progress has increased."""
+        if progress <= self._reported:
+            return
+        self._reported = progress
+        if self._feedback is not None:
+            self._feedback.setProgress(progress)
+
+    @property
+    def progress(self) -> float:
+        """Returns the overall progress.
+
+        :returns: Percentage of the total work that has been done.
+        :rtype: float
+        """
+        with self._lock:
+            return self._progress()
+
+    @property
+    def remaining_time(self) -> typing.Optional[float]:
+        """Estimates the time needed to complete the remaining work
+        from the rate of the work done so far.
+
+        :returns: Remaining time in seconds or None if no work has
+        been done yet.
+        :rtype: float
+        """
+        with self._lock:
+            progress = self._progress()
+            if self._start_time is None or progress <= 0:
+                return None
+            elapsed = time.perf_counter() - self._start_time
+
+        return elapsed * (100.0 - progress) / progress
+
+    def stage_progress(self) -> typing.Dict[str, float]:
+        """Returns the progress of each stage.
+
+        :returns: Percentage of the work done indexed by stage name.
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                stage: 100.0 * self._done_work[stage] / total if total > 0 else 100.0
+                for stage, total in self._total_work.items()
+            }
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Dependency-aware scheduling of analysis sub-tasks.
+"""
+from concurrent import futures
+import dataclasses
+from enum import Enum
+import os
+import threading
+import time
+import traceback
+import typing
+
+from qgis.core import QgsFeedback
+
+from ...utils import log
+
+
+def default_worker_count() -> int:
+    """Returns the number of workers to use when no cap has been set.
+
+    :returns: Number of CPUs available in the system.
+    :rtype: int
+    """
+    return os.cpu_count() or 1
+
+
+class TaskStatus(Enum):
+    """Execution status of a task node."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    # Not run as a dependency failed or the graph was cancelled
+    SKIPPED = "skipped"
+
+
+@dataclasses.dataclass
+class TaskNode:
+    """Unit of work in a task graph."""
+
+    name: str
+    function: typing.Callable[[], bool]
+    dependencies: typing.List[str] = dataclasses.field(default_factory=list)
+    # Stage of the analysis the node belongs to
+    stage: str = ""
+    status: TaskStatus = TaskStatus.PENDING
+    # Performance counter values when the node started and ended
+    start_time: float = None
+    end_time: float = None
+    # CPU time in seconds of the thread that ran the node
+    cpu_time: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        """Returns the time taken to run the node.
+
+        :returns: Duration in seconds, zero if the node has not run.
+        :rtype: float
+        """
+        if self.start_time is None or self.end_time is None:
+            return 0.0
+
+        return self.end_time - self.start_time
+
+
+class TaskGraph:
+    """Runs the nodes in a thread pool as soon as all the nodes they
+    depend on have completed. Nodes return True on success, a node
+    that fails or raises an exception stops the scheduling of the
+    remaining nodes. Each node is run at most once, running the graph
+    again only runs the nodes that are still pending.
+    """
+
+    def __init__(self, max_workers: int = None, feedback: QgsFeedback = None):
+        self._max_workers = max(1, max_workers or default_worker_count())
+        self._feedback = feedback
+        self._nodes: typing.Dict[str, TaskNode] = {}
+        self._status_lock = threading.Lock()
+
+    @property
+    def max_workers(self) -> int:
+        """Returns the maximum number of nodes run concurrently.
+
+        :returns: Maximum number of workers.
+        :rtype: int
+        """
+        return self._max_workers
+
+    @property
+    def nodes(self) -> typing.List[TaskNode]:
+        """Returns the nodes in the graph.
+
+        :returns: Nodes in the order they were added.
+        :rtype: list
+        """
+        return list(self._nodes.values())
+
+    def add_node(
+        self,
+        name: str,
+        function: typing.Callable[[], bool],
+        dependencies: typing.List[str] = None,
+        stage: str = "",
+    ) -> TaskNode:
+        """Adds a node to the graph.
+
+        :param name: Unique name of the node.
+        :type name: str
+
+        :param function: Callable that executes the node's work.
+        :type function: Callable
+
+        :param dependencies: Names of the nodes that need to complete
+        before this node is run. The nodes must have already been added.
+        :type dependencies: list
+
+        :param stage: Stage of the analysis the node belongs to.
+        :type stage: str
+
+        :returns: The node that has been added.
+        :rtype: TaskNode
+        """
+        if name in self._nodes:
+            raise ValueError(f"Duplicate task node {name}.")
+
+        dependencies = list(dependencies or [])
+        for dependency in dependencies:
+            if dependency not in self._nodes:
+                raise ValueError(f"Unknown dependency {dependency} for {name}.")
+
+        node = TaskNode(name, function, dependencies, stage)
+        self._nodes[name] = node
+
+        return node
+
+    def _is_cancelled(self) -> bool:
+        """Checks whether the feedback has been cancelled."""
+        return self._feedback is not None and self._feedback.isCanceled()
+
+    def _set_status(
+        self, node: TaskNode, status: TaskStatus, expected: TaskStatus
+    ) -> bool:
+        """Changes the node status if it is in the expected status.
+
+        :returns: True if the status has been changed else False.
+        :rtype: bool
+        """
+        with self._status_lock:
+            if node.status != expected:
+                return False
+            node.status = status
+
+        return True
+
+    def _run_node(self, node: TaskNode) -> bool:
+        """Runs the node and logs any errors."""
+        if self._is_cancelled():
+            self._set_status(node, TaskStatus.SKIPPED, TaskStatus.PENDING)
+            return False
+
+        if not self._set_status(node, TaskStatus.RUNNING, TaskStatus.PENDING):
+            raise RuntimeError(f"Task node {node.name} has already been run.")
+
+        node.start_time = time.perf_counter()
+        cpu_time = time.thread_time()
+        try:
+            success = bool(node.function())
+        except Exception as ex:
+            log(f"Error running analysis task {node.name}: {ex}", info=False)
+            log(traceback.format_exc(), info=False)
+            success = False
+        node.cpu_time = time.thread_time() - cpu_time
+        node.end_time = time.perf_counter()
+        node.status = TaskStatus.COMPLETED if success else TaskStatus.FAILED
+
+        return success
+
+    def stage_timings(self) -> typing.Dict[str, float]:
+        """Returns the time taken by each stage of the graph, from the
+        start of its first node to the end of its last node.
+
+        :returns: Duration in seconds indexed by stage name.
+        :rtype: dict
+        """
+        spans = {}
+        for node in self._nodes.values():
+            if node.start_time is None or node.end_time is None:
+                continue
+            start, end = spans.get(node.stage, (node.start_time, node.end_time))
+            spans[node.stage] = (
+                min(start, node.start_time),
+                max(end, node.end_time),
+            )
+
+        return {stage: end - start for stage, (start, end) in spans.items()}
+
+    def run(self) -> bool:
+        """Runs the pending nodes in the graph.
+
+        :returns: True if all the nodes completed successfully else False.
+        :rtype: bool
+        """
+        pending = {
+            name: node
+            for name, node in self._nodes.items()
+            if node.status == TaskStatus.PENDING
+        }
+        completed = {
+            name
+            for name, node in self._nodes.items()
+            if node.status == TaskStatus.COMPLETED
+        }
+        running = {}
+        success = not any(
+            node.status == TaskStatus.FAILED for node in self._nodes.values()
+        )
+
+        with futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            while pending or running:
+                if success:
+                    ready = [
+                        node
+                        for node in pending.values()
+                        if all(dep in completed for dep in node.dependencies)
+                    ]
+                    for node in ready:
+                        del pending[node.name]
+                        running[executor.submit(self._run_node, node)] = node
+
+                if not running:
+                    break
+
+                done, _ = futures.wait(
+                    list(running.keys()), return_when=futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    node = running.pop(future)
+                    if future.result():
+                        completed.add(node.name)
+                    else:
+                        success = False
+
+        for node in pending.values():
+            node.status = TaskStatus.SKIPPED
+
+        return success and len(completed) == len(self._nodes)
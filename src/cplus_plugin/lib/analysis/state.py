@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Record of the inputs of the last scenario analysis used to detect
+the inputs that have changed and reuse the results of the stages
+that do not depend on them.
+"""
+import dataclasses
+import json
+import os
+import typing
+
+from ...utils import log
+from .cache import file_identity
+
+
+@dataclasses.dataclass
+class AnalysisState:
+    """Cache keys of the inputs of a scenario analysis and the
+    normalized implementation models it produced.
+    """
+
+    pathway_keys: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+    model_keys: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+    weighted_keys: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+    # File identities of the normalized implementation models
+    normalized_models: typing.Dict[str, typing.List] = dataclasses.field(
+        default_factory=dict
+    )
+
+    def normalized_model_path(self, model_uuid: str, model_key: str) -> str:
+        """Returns the path of the normalized implementation model if
+        it was computed from the same inputs and has not been modified.
+
+        :param model_uuid: UUID of the implementation model.
+        :type model_uuid: str
+
+        :param model_key: Cache key of the normalized model in the
+        current analysis.
+        :type model_key: str
+
+        :returns: Path of the normalized model or an empty string
+        if it cannot be reused.
+        :rtype: str
+        """
+        if self.model_keys.get(model_uuid) != model_key:
+            return ""
+
+        identity = self.normalized_models.get(model_uuid)
+        if not identity or file_identity(identity[0]) != identity:
+            return ""
+
+        return identity[0]
+
+    def changes(self, previous: "AnalysisState") -> typing.Dict[str, typing.List]:
+        """Compares the inputs with those of a previous analysis.
+
+        :param previous: State of the previous analysis.
+        :type previous: AnalysisState
+
+        :returns: UUIDs of the pathways, implementation models and
+        priority weights whose inputs have changed.
+        :rtype: dict
+        """
+
+        def changed(current_keys, previous_keys):
+            return [
+                item_uuid
+                for item_uuid, key in current_keys.items()
+                if previous_keys.get(item_uuid) != key
+            ]
+
+        return {
+            "pathways": changed(self.pathway_keys, previous.pathway_keys),
+            "implementation_models": changed(self.model_keys, previous.model_keys),
+            "weights": changed(self.weighted_keys, previous.weighted_keys),
+        }
+
+
+def load_analysis_state(path: str) -> typing.Optional[AnalysisState]:
+    """Loads the analysis state saved in the given path.
+
+    :param path: Path of the analysis state file.
+    :type path: str
+
+    :returns: Analysis state or None if the file does not exist
+    or is invalid.
+    :rtype: AnalysisState
+    """
+    if not path or not os.path.exists(path):
+        return None
+
+    try:
+        with open(path) as state_file:
+            return AnalysisState(**json.load(state_file))
+    except (OSError, TypeError, ValueError) as ex:
+        log(f"Invalid analysis state file {path}, {ex}", info=False)
+        return None
+
+
+def save_analysis_state(path: str, state: AnalysisState):
+    """Saves the analysis state in the given path.
+
+    :param path: Path of the analysis state file.
+    :type path: str
+
+    :param state: Analysis state to be saved.
+    :type state: AnalysisState
+    """
+    try:
+        with open(f"{path}.part", "w") as state_file:
+            json.dump(dataclasses.asdict(state), state_file, indent=4)
+        os.replace(f"{path}.part", path)
+    except OSError as ex:
+        log(f"Unable to save the analysis state to {path}, {ex}", info=False)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming band statistics of the rasters produced by the analysis.
+
+Statistics are accumulated from the blocks as they are computed so
+that the rasters do not need to be scanned again to get their values
+range, they are saved in the output rasters and in a manifest file.
+"""
+import dataclasses
+import json
+import typing
+
+from osgeo import gdal
+
+from ...utils import log
+from .kernels import BandStatistics
+
+
+def set_band_statistics(band: gdal.Band, stats: BandStatistics):
+    """Saves the statistics in the band so that applications opening
+    the raster do not need to compute them.
+
+    :param band: Raster band the statistics were computed from.
+    :type band: gdal.Band
+
+    :param stats: Band statistics.
+    :type stats: BandStatistics
+    """
+    if stats.count == 0:
+        return
+
+    band.SetStatistics(stats.minimum, stats.maximum, stats.mean, stats.std_dev)
+
+
+def save_statistics_manifest(path: str, statistics: typing.Dict[str, BandStatistics]):
+    """Saves the statistics of the rasters in a manifest file.
+
+    :param path: Path of the manifest file.
+    :type path: str
+
+    :param statistics: Statistics indexed by raster path.
+    :type statistics: dict
+    """
+    manifest = {}
+    for raster_path, stats in statistics.items():
+        manifest[raster_path] = dict(
+            dataclasses.asdict(stats), mean=stats.mean, std_dev=stats.std_dev
+        )
+
+    try:
+        with open(path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+    except OSError as ex:
+        log(f"Unable to save the statistics manifest {path}, {ex}", info=False)
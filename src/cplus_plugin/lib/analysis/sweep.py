@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""
+Batch analysis of a scenario over a grid of parameter values.
+
+Combinations that only differ in the priority group values share the
+normalized implementation models, the first combination of each carbon
+coefficient and suitability index computes them and the weighting and
+highest position stages of the remaining combinations are then run in
+parallel. The analysis cache is shared by all the combinations and only
+evicted once the sweep is done.
+"""
+import csv
+import dataclasses
+from functools import partial
+import itertools
+import os
+import threading
+import time
+import typing
+
+import numpy as np
+from osgeo import gdal
+
+from qgis.core import QgsFeedback
+from qgis.PyQt import QtCore
+
+from ...definitions.constants import ANALYSIS_CACHE_SEGMENT
+from ...definitions.defaults import DEFAULT_ANALYSIS_CACHE_SIZE
+from ...models.analysis import AnalysisContext
+from ...utils import FileUtils, log
+from .cache import AnalysisCache
+from .engine import model_pixel_values, ScenarioAnalysisEngine
+from .scheduler import default_worker_count, TaskGraph
+
+# Name of the table with the results of each combination
+SWEEP_SUMMARY_FILE_NAME = "sweep_summary.csv"
+
+
+def parameter_combinations(
+    grid: typing.Dict[str, typing.Any]
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Expands the parameter grid into all the combinations of values.
+
+    :param grid: Lists of values of the carbon coefficient, suitability
+    index and of each priority group under the 'priority_groups' key.
+    :type grid: dict
+
+    :returns: Parameters of each combination, the priority group values
+    are indexed by group name under the 'priority_groups' key.
+    :rtype: list
+    """
+    group_grid = grid.get("priority_groups", {})
+    group_names = list(group_grid.keys())
+    names = [name for name in grid.keys() if name != "priority_groups"]
+
+    combinations = []
+    for values in itertools.product(
+        *[grid[name] for name in names], *[group_grid[name] for name in group_names]
+    ):
+        parameters = dict(zip(names, values[: len(names)]))
+        parameters["priority_groups"] = dict(zip(group_names, values[len(names) :]))
+        combinations.append(parameters)
+
+    return combinations
+
+
+def scenario_pixel_counts(path: str) -> typing.Dict[int, int]:
+    """Counts the pixels of each value in the scenario output.
+
+    :param path: Path of the scenario output raster.
+    :type path: str
+
+    :returns: Number of pixels indexed by pixel value, no data
+    pixels are not counted.
+    :rtype: dict
+    """
+    ds = gdal.Open(path)
+    band = ds.GetRasterBand(1)
+    nodata = band.GetNoDataValue()
+    counts = np.zeros(0, dtype=np.int64)
+    _, block_rows = band.GetBlockSize()
+    for row_offset in range(0, ds.RasterYSize, block_rows):
+        rows = min(block_rows, ds.RasterYSize - row_offset)
+        values = band.ReadAsArray(0, row_offset, ds.RasterXSize, rows).ravel()
+        if nodata is not None:
+            values = values[values != nodata]
+        block_counts = np.bincount(values.astype(np.int64))
+        if block_counts.size > counts.size:
+            counts = np.pad(counts, (0, block_counts.size - counts.size))
+        counts[: block_counts.size] += block_counts
+
+    return {value: int(count) for value, count in enumerate(counts) if count > 0}
+
+
+@dataclasses.dataclass
+class SweepResult:
+    """Outcome of the analysis of a parameter combination."""
+
+    index: int
+    parameters: typing.Dict[str, typing.Any]
+    scenario_directory: str
+    success: bool = False
+    output: str = ""
+    duration: float = 0.0
+    # Number of pixels indexed by implementation model name
+    pixel_counts: typing.Dict[str, int] = dataclasses.field(default_factory=dict)
+
+
+class ScenarioSweep:
+    """Runs the analysis of each parameter combination in its own
+    scenario directory and saves a summary table of the results.
+    """
+
+    def __init__(
+        self,
+        combinations: typing.List[typing.Dict[str, typing.Any]],
+        create_context: typing.Callable[
+            [typing.Dict[str, typing.Any], str], AnalysisContext
+        ],
+        output_directory: str,
+        max_parallel: int = None,
+        feedback: QgsFeedback = None,
+        cache_size: int = None,
+    ):
+        """
+        :param combinations: Parameters of each combination.
+        :type combinations: list
+
+        :param create_context: Creates the analysis context of a
+        combination from its parameters and scenario directory.
+        :type create_context: Callable
+
+        :param output_directory: Directory of the combinations outputs.
+        :type output_directory: str
+
+        :param max_parallel: Maximum number of combinations analyzed at
+        the same time, defaults to the number of CPUs.
+        :type max_parallel: int
+
+        :param feedback: Feedback for progress and cancelling the sweep.
+        :type feedback: QgsFeedback
+
+        :param cache_size: Maximum size in bytes of the analysis cache
+        shared by the combinations, defaults to the larger of the
+        combination and default cache sizes.
+        :type cache_size: int
+        """
+        self._combinations = combinations
+        self._create_context = create_context
+        self._output_directory = output_directory
+        self._max_parallel = max(1, max_parallel or default_worker_count())
+        self._feedback = feedback or QgsFeedback()
+        self._cache_size = cache_size
+        self._results: typing.List[SweepResult] = []
+        self._completed = 0
+        self._progress_lock = threading.Lock()
+        # Normalized models of the first combination indexed by shared key
+        self._shared_models = {}
+
+    @property
+    def results(self) -> typing.List[SweepResult]:
+        """Returns the results of the combinations analyzed so far.
+
+        :returns: Results in the order of the combinations.
+        :rtype: list
+        """
+        return self._results
+
+    @property
+    def summary_path(self) -> str:
+        """Returns the path of the summary table.
+
+        :returns: Path of the summary CSV file.
+        :rtype: str
+        """
+        return os.path.join(self._output_directory, SWEEP_SUMMARY_FILE_NAME)
+
+    @property
+    def _cache_directory(self) -> str:
+        return os.path.join(self._output_directory, ANALYSIS_CACHE_SEGMENT)
+
+    @staticmethod
+    def _shared_key(parameters: typing.Dict[str, typing.Any]) -> str:
+        """Returns the parameters that determine the normalized
+        implementation models of a combination.
+        """
+        return repr(
+            sorted(
+                (name, value)
+                for name, value in parameters.items()
+                if name != "priority_groups"
+            )
+        )
+
+    def _combination_context(
+        self, result: SweepResult, workers: int
+    ) -> AnalysisContext:
+        """Creates the analysis context of a combination.
+
+        The contexts are created in the thread running the sweep before
+        the combinations are analyzed, creating them may read the plugin
+        settings which cannot be shared by the analysis threads.
+
+        :param result: Result of the combination.
+        :type result: SweepResult
+
+        :param workers: Number of threads of the analysis.
+        :type workers: int
+
+        :returns: Analysis context of the combination.
+        :rtype: AnalysisContext
+        """
+        FileUtils.create_new_dir(result.scenario_directory)
+        context = self._create_context(result.parameters, result.scenario_directory)
+        cache_size = self._cache_size
+        if cache_size is None:
+            cache_size = max(
+                context.cache_size, DEFAULT_ANALYSIS_CACHE_SIZE * 1024 * 1024
+            )
+
+        return dataclasses.replace(
+            context,
+            max_workers=workers,
+            cache_directory=self._cache_directory,
+            cache_size=cache_size,
+            shared_cache=True,
+            # Parallel runs share the memory budget
+            memory_budget=context.memory_budget // self._max_parallel,
+            # The last analysis state is not shared by parallel runs
+            state_path=None,
+        )
+
+    def _analyze(
+        self, result: SweepResult, context: AnalysisContext, shared_key: str
+    ) -> bool:
+        """Runs the analysis of a combination.
+
+        :param result: Result of the combination to be updated.
+        :type result: SweepResult
+
+        :param context: Analysis context of the combination.
+        :type context: AnalysisContext
+
+        :param shared_key: Parameters that determine the normalized
+        implementation models of the combination.
+        :type shared_key: str
+
+        :returns: False if the sweep has been cancelled else True, failed
+        combinations do not stop the remaining ones.
+        :rtype: bool
+        """
+        if self._feedback.isCanceled():
+            return False
+
+        shared_models = self._shared_models.get(shared_key)
+        if shared_models:
+            context = dataclasses.replace(
+                context, shared_normalized_models=shared_models
+            )
+
+        self._feedback.canceled.connect(
+            context.feedback.cancel, type=QtCore.Qt.DirectConnection
+        )
+        start = time.perf_counter()
+        try:
+            engine = ScenarioAnalysisEngine(context)
+            result.success = engine.run()
+        finally:
+            self._feedback.canceled.disconnect(context.feedback.cancel)
+        result.duration = time.perf_counter() - start
+
+        if result.success:
+            if shared_models is None:
+                self._shared_models[shared_key] = engine.normalized_models
+            result.output = engine.output["OUTPUT"]
+            pixel_values = model_pixel_values(
+                context.scenario.models, context.ordered_model_ids
+            )
+            model_names = {
+                pixel_values[str(model.uuid)]: model.name
+                for model in context.scenario.models
+            }
+            result.pixel_counts = {
+                model_names.get(value, str(value)): count
+                for value, count in scenario_pixel_counts(result.output).items()
+            }
+        else:
+            log(
+                f"Analysis of the sweep combination {result.index} "
+                f"{result.parameters} failed",
+                info=False,
+            )
+
+        with self._progress_lock:
+            self._completed += 1
+            self._feedback.setProgress(100 * self._completed / len(self._results))
+
+        return not self._feedback.isCanceled()
+
+    def run(self) -> bool:
+        """Runs the analysis of all the combinations and saves the
+        summary table.
+
+        :returns: True if all the combinations were analyzed
+        successfully else False.
+        :rtype: bool
+        """
+        FileUtils.create_new_dir(self._output_directory)
+        self._results = [
+            SweepResult(
+                index,
+                parameters,
+                os.path.join(self._output_directory, f"scenario_{index:03d}"),
+            )
+            for index, parameters in enumerate(self._combinations)
+        ]
+        self._completed = 0
+        self._shared_models = {}
+
+        # Analysis threads are divided among the parallel combinations
+        workers = max(1, default_worker_count() // self._max_parallel)
+        contexts = {
+            result.index: self._combination_context(result, workers)
+            for result in self._results
+        }
+        graph = TaskGraph(self._max_parallel, self._feedback)
+        first_nodes = {}
+        for result in self._results:
+            name = f"combination_{result.index}"
+            shared_key = self._shared_key(result.parameters)
+            dependencies = []
+            if shared_key in first_nodes:
+                # Reuses the normalized models of the first combination
+                dependencies.append(first_nodes[shared_key])
+            else:
+                first_nodes[shared_key] = name
+            graph.add_node(
+                name,
+                partial(self._analyze, result, contexts[result.index], shared_key),
+                dependencies,
+            )
+
+        completed = graph.run()
+        self._evict_cache(contexts)
+        self.save_summary()
+
+        return completed and all(result.success for result in self._results)
+
+    def _evict_cache(self, contexts: typing.Dict[int, AnalysisContext]):
+        """Evicts the least recently used entries of the shared analysis
+        cache once all the combinations are done.
+
+        :param contexts: Analysis contexts indexed by combination index.
+        :type contexts: dict
+        """
+        cache_size = max(
+            (context.cache_size for context in contexts.values()), default=0
+        )
+        if cache_size <= 0:
+            return
+
+        try:
+            AnalysisCache(self._cache_directory, cache_size).evict()
+        except OSError as ex:
+            log(f"Unable to update the analysis cache, {ex}", info=False)
+
+    def save_summary(self):
+        """Saves the parameters and results of each combination in
+        the summary table.
+        """
+        names = []
+        group_names = []
+        model_names = []
+        for result in self._results:
+            for name in result.parameters:
+                if name != "priority_groups" and name not in names:
+                    names.append(name)
+            for name in result.parameters.get("priority_groups", {}):
+                if name not in group_names:
+                    group_names.append(name)
+            for name in result.pixel_counts:
+                if name not in model_names:
+                    model_names.append(name)
+
+        try:
+            with open(self.summary_path, "w", newline="") as summary_file:
+                writer = csv.writer(summary_file)
+                writer.writerow(
+                    ["index", "scenario_directory"]
+                    + names
+                    + group_names
+                    + ["success", "duration", "output"]
+                    + [f"{name} pixels" for name in model_names]
+                )
+                for result in self._results:
+                    groups = result.parameters.get("priority_groups", {})
+                    writer.writerow(
+                        [result.index, result.scenario_directory]
+                        + [result.parameters.get(name, "") for name in names]
+                        + [groups.get(name, "") for name in group_names]
+                        + [result.success, round(result.duration, 3), result.output]
+                        + [result.pixel_counts.get(name, 0) for name in model_names]
+                    )
+        except OSError as ex:
+            log(f"Unable to save the sweep summary {self.summary_path}, {ex}")
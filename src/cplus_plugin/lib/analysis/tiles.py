@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Tiles of the analysis grid and the pool of worker processes.
+
+The tile processor of the kernels module only holds plain data so that
+it can be sent to worker processes, the tiles are then computed either
+in the analysis threads or in a pool of processes that each open their
+own datasets.
+"""
+from concurrent import futures
+import multiprocessing
+from multiprocessing import spawn
+import os
+from pathlib import Path
+import shutil
+import sys
+import threading
+import typing
+
+from .kernels import _initialize_worker, RasterGrid, Tile, TileProcessor
+
+
+def grid_tiles(grid: RasterGrid, tile_size: int) -> typing.List[Tile]:
+    """Splits the grid into square tiles, the tiles on the right and
+    bottom edges are clipped to the grid.
+
+    :param grid: Analysis grid.
+    :type grid: RasterGrid
+
+    :param tile_size: Width and height of the tiles in pixels.
+    :type tile_size: int
+
+    :returns: Tiles in row-major order.
+    :rtype: list
+    """
+    tile_size = max(1, int(tile_size))
+    return [
+        (
+            x_offset,
+            y_offset,
+            min(tile_size, grid.width - x_offset),
+            min(tile_size, grid.height - y_offset),
+        )
+        for y_offset in range(0, grid.height, tile_size)
+        for x_offset in range(0, grid.width, tile_size)
+    ]
+
+
+def python_executable() -> str:
+    """Returns the Python interpreter used to start worker processes.
+    Within QGIS sys.executable is the QGIS application so the
+    interpreter is looked up in the Python installation.
+
+    :returns: Path of the Python interpreter.
+    :rtype: str
+    """
+    executable = sys.executable or ""
+    if Path(executable).name.lower().startswith("python"):
+        return executable
+
+    names = ["python.exe", "pythonw.exe"] if os.name == "nt" else ["python3"]
+    for directory in (sys.exec_prefix, os.path.join(sys.exec_prefix, "bin")):
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                return path
+
+    return shutil.which("python3") or shutil.which("python") or executable
+
+
+class SpawnProcessPool(futures.ProcessPoolExecutor):
+    """Process pool that starts its workers with the given Python
+    interpreter.
+
+    The interpreter of spawned processes is a module-global setting of
+    multiprocessing shared by the pools running at the same time, it is
+    set by the first pool and restored once all of them have been shut
+    down.
+
+    :param executable: Python interpreter of the worker processes.
+    :type executable: str
+    """
+
+    _lock = threading.Lock()
+    _users = 0
+    _previous_executable = None
+
+    def __init__(self, executable: str, **kwargs):
+        cls = SpawnProcessPool
+        with cls._lock:
+            if cls._users == 0:
+                cls._previous_executable = spawn.get_executable()
+                spawn.set_executable(executable)
+            cls._users += 1
+        self._uses_executable = True
+
+        try:
+            super().__init__(mp_context=multiprocessing.get_context("spawn"), **kwargs)
+        except Exception:
+            self._release_executable()
+            raise
+
+    def _release_executable(self):
+        """Restores the previous interpreter once no other pool is
+        running.
+        """
+        cls = SpawnProcessPool
+        with cls._lock:
+            if not self._uses_executable:
+                return
+            self._uses_executable = False
+            cls._users -= 1
+            if cls._users == 0:
+                spawn.set_executable(cls._previous_executable)
+                cls._previous_executable = None
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        try:
+            super().shutdown(wait=wait, cancel_futures=cancel_futures)
+        finally:
+            self._release_executable()
+
+
+def create_process_pool(
+    processor: TileProcessor, max_workers: int, gdal_cache: int = 0
+) -> SpawnProcessPool:
+    """Creates a pool of worker processes that compute the tiles with
+    a copy of the tile processor.
+
+    :param processor: Tile processor sent to each worker.
+    :type processor: TileProcessor
+
+    :param max_workers: Number of worker processes.
+    :type max_workers: int
+
+    :param gdal_cache: GDAL block cache size in bytes of each worker,
+    zero keeps the GDAL default.
+    :type gdal_cache: int
+
+    :returns: Process pool executor.
+    :rtype: SpawnProcessPool
+    """
+    # Forking a process with running Qt and GDAL threads is not safe and
+    # spawned workers cannot use sys.executable, within QGIS on Windows it
+    # is the QGIS application and not a Python interpreter.
+    return SpawnProcessPool(
+        python_executable(),
+        max_workers=max_workers,
+        initializer=_initialize_worker,
+        initargs=(processor, gdal_cache),
+    )
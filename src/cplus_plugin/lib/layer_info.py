@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide cache of the validity and metadata of layer files.
+
+Checking whether a layer is valid requires opening its data source,
+which is repeated by the user interface and when preparing each
+analysis. The results are cached by the path, modification time and
+size of the file so that a check costs a lookup until the file changes.
+Data sources that are not local files, e.g. GDAL virtual file systems
+or URIs with layer options, are opened on every check.
+"""
+import collections
+import dataclasses
+import os
+import threading
+import typing
+
+from qgis.core import QgsMapLayer, QgsRasterLayer, QgsVectorLayer
+
+from .analysis.cache import file_identity
+
+# Maximum number of layers whose details are kept
+DEFAULT_MAX_ENTRIES = 1024
+
+
+@dataclasses.dataclass(frozen=True)
+class LayerInfo:
+    """Validity and metadata of a layer file."""
+
+    path: str
+    valid: bool
+    crs_wkt: str = ""
+    # xmin, ymin, xmax and ymax in the layer CRS
+    extent: typing.Tuple[float, float, float, float] = None
+    # Pixel width and height of raster layers
+    resolution: typing.Tuple[float, float] = None
+    # Qgis.DataType value of the first band of raster layers
+    data_type: int = None
+    band_count: int = 0
+
+
+def read_layer_info(path: str, vector: bool = False) -> LayerInfo:
+    """Opens a layer and reads its validity and metadata.
+
+    :param path: Path of the layer file.
+    :type path: str
+
+    :param vector: Whether the file is a vector layer, else a raster.
+    :type vector: bool
+
+    :returns: Details of the layer.
+    :rtype: LayerInfo
+    """
+    if vector:
+        layer = QgsVectorLayer(path, "", "ogr")
+    else:
+        layer = QgsRasterLayer(
+            path, "", "gdal", QgsRasterLayer.LayerOptions(loadDefaultStyle=False)
+        )
+    if not layer.isValid():
+        return LayerInfo(path, False)
+
+    extent = layer.extent()
+    info = {
+        "crs_wkt": layer.crs().toWkt(),
+        "extent": (
+            extent.xMinimum(),
+            extent.yMinimum(),
+            extent.xMaximum(),
+            extent.yMaximum(),
+        ),
+    }
+    if layer.type() == QgsMapLayer.RasterLayer:
+        info.update(
+            resolution=(layer.rasterUnitsPerPixelX(), layer.rasterUnitsPerPixelY()),
+            data_type=int(layer.dataProvider().dataType(1)),
+            band_count=layer.bandCount(),
+        )
+
+    return LayerInfo(path, True, **info)
+
+
+class LayerInfoCache:
+    """Least recently used cache of the details of layer files indexed by
+    their path and invalidated when their modification time or size change.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        :param max_entries: Maximum number of layers whose details are kept.
+        :type max_entries: int
+        """
+        self._max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, vector: bool = False) -> LayerInfo:
+        """Returns the details of a layer, the layer is only opened if
+        it has not been read before or the file has changed.
+
+        :param path: Path of the layer file.
+        :type path: str
+
+        :param vector: Whether the file is a vector layer, else a raster.
+        :type vector: bool
+
+        :returns: Details of the layer.
+        :rtype: LayerInfo
+        """
+        if not path:
+            return LayerInfo(path, False)
+
+        identity = file_identity(path)
+        if identity[1] is None:
+            # Not a local file, changes to the source cannot be detected
+            return read_layer_info(path, vector)
+
+        key = (identity[0], vector)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == identity:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        info = read_layer_info(path, vector)
+        with self._lock:
+            self._entries[key] = (identity, info)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+        return info
+
+    def invalidate(self, path: str = None):
+        """Removes the details of a layer or of all the layers.
+
+        :param path: Path of the layer file, all the layers are
+        removed if not specified.
+        :type path: str
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            abs_path = os.path.abspath(path)
+            for key in [key for key in self._entries if key[0] == abs_path]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+layer_info_cache = LayerInfoCache()
+
+
+def layer_info(path: str, vector: bool = False) -> LayerInfo:
+    """Returns the details of a layer from the process-wide cache.
+
+    :param path: Path of the layer file.
+    :type path: str
+
+    :param vector: Whether the file is a vector layer, else a raster.
+    :type vector: bool
+
+    :returns: Details of the layer.
+    :rtype: LayerInfo
+    """
+    return layer_info_cache.get(path, vector)
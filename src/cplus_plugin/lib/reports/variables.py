@@ -210,7 +210,7 @@ class LayoutVariableRegister:
 
     def _create_implementation_models_var_infos(self):
         """Add variable info objects for implementation models."""
-        imp_models = settings_manager.get_all_implementation_models()
+        imp_models = settings_manager.get_implementation_models_snapshot().items
         for im_model in imp_models:
             normalized_name = im_model.name.replace(" ", "_").lower()
             im_model_name = f"model_{normalized_name}"
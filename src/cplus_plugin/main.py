@@ -12,7 +12,12 @@
  ***************************************************************************/
 """
 
+import contextlib
+import copy
+import hashlib
+import json
 import os.path
+import time
 
 from qgis.core import QgsApplication, QgsMasterLayoutInterface, QgsSettings
 from qgis.gui import QgsGui, QgsLayoutDesignerInterface
@@ -73,7 +78,21 @@ from .utils import (
 class QgisCplus:
     """QGIS CPLUS Plugin Implementation."""
 
-    def __init__(self, iface):
+    def __init__(self, iface, load_start: float = None):
+        """
+        :param iface: QGIS interface instance.
+        :type iface: QgsInterface
+
+        :param load_start: Performance counter value when QGIS started
+        loading the plugin, defaults to the creation of the plugin.
+        :type load_start: float
+        """
+        init_start = time.perf_counter()
+        self._load_start = init_start if load_start is None else load_start
+        # Duration of the startup steps in seconds
+        self.startup_timings = {"import": init_start - self._load_start}
+        self.time_to_ready = None
+
         self.iface = iface
         self.plugin_dir = os.path.dirname(__file__)
         locale = QgsSettings().value("locale/userLocale")[0:2]
@@ -112,6 +131,7 @@ class QgisCplus:
         )
 
         self.options_factory = None
+        self.startup_timings["init"] = time.perf_counter() - init_start
 
     # noinspection PyMethodMayBeStatic
     def tr(self, message) -> str:
@@ -211,8 +231,22 @@ class QgisCplus:
 
         return action
 
+    @contextlib.contextmanager
+    def _startup_step(self, name: str):
+        """Context manager that records the duration of a startup step.
+
+        :param name: Name of the step.
+        :type name: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[name] = time.perf_counter() - start
+
     def initGui(self):
         """Create the menu entries and toolbar icons inside the QGIS GUI."""
+        gui_start = time.perf_counter()
         self.add_action(
             ICON_PATH,
             text=self.tr("CPLUS"),
@@ -247,22 +281,37 @@ class QgisCplus:
             status_tip=self.tr("CPLUS About"),
         )
 
+        self.startup_timings["actions"] = time.perf_counter() - gui_start
+
         # Initialize default report settings
-        initialize_report_settings()
+        with self._startup_step("report_settings"):
+            initialize_report_settings()
 
         # Adds the settings to the QGIS options panel
-        self.options_factory = CplusOptionsFactory()
-        self.iface.registerOptionsWidgetFactory(self.options_factory)
+        with self._startup_step("options"):
+            self.options_factory = CplusOptionsFactory()
+            self.iface.registerOptionsWidgetFactory(self.options_factory)
 
         # Initialize default model components
-        initialize_model_settings()
+        with self._startup_step("model_settings"):
+            models_initialized = initialize_model_settings()
 
         # Register custom layout items
-        self.register_layout_items()
+        with self._startup_step("layout_items"):
+            self.register_layout_items()
 
         # Register custom report variables when a layout is opened
         self.iface.layoutDesignerOpened.connect(self.on_layout_designer_opened)
 
+        self.time_to_ready = time.perf_counter() - self._load_start
+        steps = ", ".join(
+            f"{name} {duration:.3f}s" for name, duration in self.startup_timings.items()
+        )
+        log(
+            f"Plugin ready in {self.time_to_ready:.3f}s ({steps}), default "
+            f"model settings {'initialized' if models_initialized else 'unchanged'}"
+        )
+
     def onClosePlugin(self):
         """Cleanup necessary items here when plugin widget is closed."""
         self.pluginIsActive = False
@@ -332,25 +381,100 @@ def create_priority_layers():
         log(f"Initializing priority layers and groups")
 
         groups = []
-        for group in PRIORITY_GROUPS:
-            group["value"] = 0
-            settings_manager.save_priority_group(group)
+        with settings_manager.transaction():
+            for group in PRIORITY_GROUPS:
+                group["value"] = 0
+                settings_manager.save_priority_group(group)
+
+            for layer in PRIORITY_LAYERS:
+                layer["groups"] = groups
+                settings_manager.save_priority_layer(layer)
+
+            settings_manager.set_value("default_priority_layers_set", True)
+
+
+def model_settings_hash(base_dir: str) -> str:
+    """Returns a hash of the default NCS pathways and implementation
+    models and of the base directory they are initialized with.
 
-        for layer in PRIORITY_LAYERS:
-            layer["groups"] = groups
-            settings_manager.save_priority_layer(layer)
+    :param base_dir: Plugin base data directory.
+    :type base_dir: str
 
-        settings_manager.set_value("default_priority_layers_set", True)
+    :returns: SHA-256 hex digest.
+    :rtype: str
+    """
+    content = json.dumps(
+        {
+            "ncs_pathways": DEFAULT_NCS_PATHWAYS,
+            "implementation_models": DEFAULT_IMPLEMENTATION_MODELS,
+            "base_dir": base_dir or "",
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def model_settings_initialized(settings_hash: str) -> bool:
+    """Checks whether the default model components have been initialized
+    with the same defaults and base directory and are still in the settings.
+
+    :param settings_hash: Hash of the current defaults and base directory.
+    :type settings_hash: str
+
+    :returns: True if the initialization can be skipped.
+    :rtype: bool
+    """
+    if settings_manager.get_value(Settings.MODEL_SETTINGS_HASH, "") != settings_hash:
+        return False
+
+    # Default components removed from the settings are added again
+    ncs_uuids = {
+        str(ncs.uuid) for ncs in settings_manager.get_ncs_pathways_snapshot().items
+    }
+    model_uuids = {
+        str(model.uuid)
+        for model in settings_manager.get_implementation_models_snapshot().items
+    }
+    return all(
+        ncs_dict.get(UUID_ATTRIBUTE) in ncs_uuids for ncs_dict in DEFAULT_NCS_PATHWAYS
+    ) and all(
+        model_dict.get(UUID_ATTRIBUTE) in model_uuids
+        for model_dict in DEFAULT_IMPLEMENTATION_MODELS
+    )
 
 
-def initialize_model_settings():
+def initialize_model_settings() -> bool:
     """Initialize default model components such as NCS pathways
     and implementation models.
 
     It will check if there are existing components using the UUID
-    and only add the ones that do not exist in the settings.
+    and only add the ones that do not exist in the settings. The
+    initialization is skipped if it has already been done with the
+    same defaults and base directory.
 
     This is normally called during plugin startup.
+
+    :returns: True if the model settings were initialized, False if
+    they were unchanged.
+    :rtype: bool
+    """
+    base_dir = settings_manager.get_value(Settings.BASE_DIR)
+    settings_hash = model_settings_hash(base_dir)
+    if model_settings_initialized(settings_hash):
+        return False
+
+    with settings_manager.transaction():
+        _initialize_model_settings()
+        settings_manager.set_value(Settings.MODEL_SETTINGS_HASH, settings_hash)
+
+    return True
+
+
+def _initialize_model_settings():
+    """Adds the default NCS pathways and implementation models to the
+    settings and creates the base directory subdirectories.
     """
     # Create NCS subdirectories if BASE_DIR has been defined
     base_dir = settings_manager.get_value(Settings.BASE_DIR)
@@ -369,8 +493,8 @@ def initialize_model_settings():
         Settings.CARBON_COEFFICIENT, 0, float
     )
 
-    # Add default pathways
-    for ncs_dict in DEFAULT_NCS_PATHWAYS:
+    # Add default pathways, the defaults are copied to keep their hash
+    for ncs_dict in copy.deepcopy(DEFAULT_NCS_PATHWAYS):
         try:
             ncs_uuid = ncs_dict[UUID_ATTRIBUTE]
             ncs = settings_manager.get_ncs_pathway(ncs_uuid)
@@ -416,7 +540,7 @@ def initialize_model_settings():
             continue
 
     # Add default implementation models
-    for imp_model_dict in DEFAULT_IMPLEMENTATION_MODELS:
+    for imp_model_dict in copy.deepcopy(DEFAULT_IMPLEMENTATION_MODELS):
         try:
             imp_model_uuid = imp_model_dict[UUID_ATTRIBUTE]
             imp_model = settings_manager.get_implementation_model(imp_model_uuid)
@@ -431,7 +555,7 @@ def initialize_model_settings():
                     continue
                 imp_model = copy_layer_component_attributes(imp_model, source_im)
                 imp_model.pathways = pathways
-                settings_manager.remove_implementation_model(str(imp_model.uuid))
+                # Replaces the saved model if it has changed
                 settings_manager.save_implementation_model(imp_model)
         except KeyError as ke:
             log(f"Default implementation model configuration load error - {str(ke)}")
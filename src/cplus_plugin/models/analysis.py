@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+""" Data models for scenario analysis."""
+
+import dataclasses
+from enum import IntEnum
+import typing
+
+from qgis.core import QgsFeedback
+
+from .base import Scenario
+from ..conf import settings_manager, Settings
+from ..definitions.defaults import DEFAULT_ANALYSIS_TILE_SIZE, DEFAULT_MEMORY_BUDGET
+
+# Sent to the analysis worker processes which do not import QGIS
+from ..lib.analysis.kernels import PriorityWeight
+
+
+class IntermediateOutputs(IntEnum):
+    """Handling of the intermediate layers computed by the analysis."""
+
+    # Only kept in memory while computing the outputs
+    MEMORY = 0
+    # Saved in the scenario directory for auditing
+    KEEP_ALL = 1
+
+
+@dataclasses.dataclass
+class OutputProfile:
+    """Layout and compression of the rasters written by the analysis."""
+
+    tiled: bool = True
+    block_size: int = 256
+    # NONE, DEFLATE, LZW or ZSTD
+    compression: str = "DEFLATE"
+    # IF_SAFER, IF_NEEDED, YES or NO
+    bigtiff: str = "IF_SAFER"
+    # Cloud optimized GeoTIFF with internal overviews
+    cog: bool = False
+
+    def creation_options(self, floating_point: bool = True) -> typing.List[str]:
+        """Returns the GDAL creation options of the profile.
+
+        :param floating_point: Whether the options are for floating
+        point or integer rasters.
+        :type floating_point: bool
+
+        :returns: GTiff or COG driver creation options.
+        :rtype: list
+        """
+        options = [f"BIGTIFF={self.bigtiff}"]
+        if self.cog:
+            options.extend([f"BLOCKSIZE={self.block_size}", "OVERVIEWS=AUTO"])
+        elif self.tiled:
+            options.extend(
+                [
+                    "TILED=YES",
+                    f"BLOCKXSIZE={self.block_size}",
+                    f"BLOCKYSIZE={self.block_size}",
+                ]
+            )
+
+        if self.cog and not floating_point:
+            # Overviews of categorical rasters must not mix classes
+            options.append("RESAMPLING=NEAREST")
+
+        if self.compression and self.compression != "NONE":
+            options.append(f"COMPRESS={self.compression}")
+            # Floating point or horizontal differencing predictor
+            options.append("PREDICTOR=3" if floating_point else "PREDICTOR=2")
+
+        return options
+
+
+def output_profile() -> OutputProfile:
+    """Returns the output rasters profile defined in the plugin settings.
+
+    :returns: Output profile.
+    :rtype: OutputProfile
+    """
+    default = OutputProfile()
+
+    return OutputProfile(
+        tiled=settings_manager.get_value(
+            Settings.OUTPUT_TILED, default=default.tiled, setting_type=bool
+        ),
+        block_size=int(
+            settings_manager.get_value(
+                Settings.OUTPUT_BLOCK_SIZE, default=default.block_size
+            )
+        ),
+        compression=settings_manager.get_value(
+            Settings.OUTPUT_COMPRESSION, default=default.compression
+        ),
+        bigtiff=settings_manager.get_value(
+            Settings.OUTPUT_BIGTIFF, default=default.bigtiff
+        ),
+        cog=settings_manager.get_value(
+            Settings.OUTPUT_COG, default=default.cog, setting_type=bool
+        ),
+    )
+
+
+@dataclasses.dataclass
+class AnalysisContext:
+    """Context information for running a scenario analysis."""
+
+    scenario: Scenario
+    scenario_directory: str
+    base_dir: str
+    carbon_coefficient: float
+    suitability_index: float
+    # UUIDs of all the implementation models, the position of each
+    # UUID determines the value in the highest position output.
+    ordered_model_ids: typing.List[str]
+    # Priority weighting layers indexed by implementation model UUID
+    priority_weights: typing.Dict[str, typing.List[PriorityWeight]]
+    apply_weighting: bool
+    feedback: QgsFeedback
+    # Maximum number of concurrent analysis tasks, None uses all the CPUs
+    max_workers: int = None
+    # Largest width and height in pixels of the tiles computed by the
+    # analysis, smaller tiles are used to fit the memory budget.
+    tile_size: int = DEFAULT_ANALYSIS_TILE_SIZE
+    # Computes the tiles in worker processes instead of threads
+    use_processes: bool = False
+    # Memory in bytes used by the analysis tiles and the GDAL cache
+    memory_budget: int = DEFAULT_MEMORY_BUDGET * 1024 * 1024
+    # Directory and maximum size in bytes of the analysis cache
+    cache_directory: str = None
+    cache_size: int = 0
+    # Cache shared by concurrent runs e.g. of a scenario sweep, the
+    # weighted models are not cached and the least recently used
+    # entries are only evicted once all the runs are done.
+    shared_cache: bool = False
+    # Cache key and path of the normalized implementation models of
+    # another run with the same inputs, indexed by model UUID.
+    shared_normalized_models: typing.Dict[
+        str, typing.Tuple[str, str]
+    ] = dataclasses.field(default_factory=dict)
+    # File recording the inputs of the last analysis
+    state_path: str = None
+    intermediate_outputs: IntermediateOutputs = IntermediateOutputs.MEMORY
+    output_profile: OutputProfile = dataclasses.field(default_factory=OutputProfile)
+
+    @property
+    def normalization_index(self) -> float:
+        """Returns the factor applied when normalizing the pathways
+        and implementation models.
+
+        :returns: Sum of the carbon coefficient and suitability index
+        if greater than zero else one.
+        :rtype: float
+        """
+        index = self.carbon_coefficient + self.suitability_index
+
+        return index if index > 0 else 1.0
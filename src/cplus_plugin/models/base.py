@@ -12,6 +12,8 @@ from uuid import UUID
 
 from qgis.core import QgsMapLayer, QgsRasterLayer, QgsVectorLayer
 
+from ..lib.layer_info import layer_info
+
 
 @dataclasses.dataclass
 class SpatialExtent:
@@ -163,17 +165,17 @@ class LayerModelComponent(BaseModelComponent):
         return layer
 
     def is_valid(self) -> bool:
-        """Checks if the corresponding map layer is valid.
+        """Checks if the corresponding map layer is valid, the result
+        is cached until the layer file changes.
 
         :returns: True if the map layer is valid, else False if map layer is
         invalid or of None type.
         :rtype: bool
         """
-        layer = self.to_map_layer()
-        if layer is None:
+        if self.layer_type not in (LayerType.RASTER, LayerType.VECTOR):
             return False
 
-        return layer.isValid()
+        return layer_info(self.path, vector=self.layer_type == LayerType.VECTOR).valid
 
     def __eq__(self, other) -> bool:
         """Uses BaseModelComponent equality test rather than
@@ -272,13 +274,7 @@ class NcsPathway(LayerModelComponent):
         always return True.
         :rtype: bool
         """
-        is_valid = True
-        for cl in self.carbon_layers():
-            if not cl.isValid():
-                is_valid = False
-                break
-
-        return is_valid
+        return all(layer_info(carbon_path).valid for carbon_path in self.carbon_paths)
 
     def is_valid(self) -> bool:
         """Additional check to include validity of carbon layers."""
@@ -415,13 +411,9 @@ class ImplementationModel(LayerModelComponent):
         always return True.
         :rtype: bool
         """
-        is_valid = True
-        for cl in self.pw_layers():
-            if not cl.isValid():
-                is_valid = False
-                break
-
-        return is_valid
+        return all(
+            layer_info(layer.get("path")).valid for layer in self.priority_layers
+        )
 
     def is_valid(self) -> bool:
         """Includes an additional check to assert if NCS pathways have
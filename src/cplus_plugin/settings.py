@@ -32,8 +32,12 @@ from .definitions.defaults import (
     OPTIONS_TITLE,
     ICON_PATH,
     DEFAULT_LOGO_PATH,
+    DEFAULT_ANALYSIS_CACHE_SIZE,
+    DEFAULT_ANALYSIS_TILE_SIZE,
+    DEFAULT_MEMORY_BUDGET,
 )
-from .utils import FileUtils
+from .models.analysis import IntermediateOutputs, output_profile
+from .utils import FileUtils, tr
 
 Ui_DlgSettings, _ = uic.loadUiType(str(Path(__file__).parent / "ui/qgis_settings.ui"))
 
@@ -56,35 +60,53 @@ class CplusSettings(Ui_DlgSettings, QgsOptionsPageWidget):
         self.layout().insertWidget(0, self.message_bar)
 
         self.settings = qgis.core.QgsSettings()
-        settings_manager.settings_updated[str, object].connect(self.on_settings_changed)
+        settings_manager.settings_changed.connect(self.on_settings_changed)
 
         # Connections
         self.cb_custom_logo.stateChanged.connect(self.logo_state_changed)
         self.logo_file.fileChanged.connect(self.logo_file_changed)
         self.folder_data.fileChanged.connect(self.base_dir_exists)
 
+        self.intermediate_outputs_cbo.addItem(
+            tr("Keep in memory"), int(IntermediateOutputs.MEMORY)
+        )
+        self.intermediate_outputs_cbo.addItem(
+            tr("Save all intermediate layers"), int(IntermediateOutputs.KEEP_ALL)
+        )
+
+        self.compression_cbo.addItem(tr("None"), "NONE")
+        self.compression_cbo.addItem(tr("Deflate"), "DEFLATE")
+        self.compression_cbo.addItem(tr("LZW"), "LZW")
+        self.compression_cbo.addItem(tr("Zstandard"), "ZSTD")
+
+        self.bigtiff_cbo.addItem(tr("If safer"), "IF_SAFER")
+        self.bigtiff_cbo.addItem(tr("If needed"), "IF_NEEDED")
+        self.bigtiff_cbo.addItem(tr("Yes"), "YES")
+        self.bigtiff_cbo.addItem(tr("No"), "NO")
+
+        self.cb_output_tiled.toggled.connect(self.block_size_box.setEnabled)
+
     def apply(self) -> None:
         """This is called on OK click in the QGIS options panel."""
 
-        self.save_settings()
+        with settings_manager.transaction():
+            self.save_settings()
 
-    def on_settings_changed(self, name: str, value: typing.Any):
-        """Slot raised when settings has been changed.
+    def on_settings_changed(self, changes: typing.Dict[str, typing.Any]):
+        """Slot raised when settings have been changed.
 
-        :param name: Name of the setting that has changed.
-        :type name: str
-
-        :param value: New value for the given settings name.
-        :type value: Any
+        :param changes: New values of the changed settings indexed
+        by name.
+        :type changes: dict
         """
         # Create NCS pathway subdirectory if base directory has changed.
-        if name == Settings.BASE_DIR.value:
-            if not value:
-                return
+        value = changes.get(Settings.BASE_DIR.value)
+        if not value:
+            return
 
-            FileUtils.create_ncs_pathways_dir(value)
-            FileUtils.create_ncs_carbon_dir(value)
-            FileUtils.create_pwls_dir(value)
+        FileUtils.create_ncs_pathways_dir(value)
+        FileUtils.create_ncs_carbon_dir(value)
+        FileUtils.create_pwls_dir(value)
 
     def update_logo(self, custom_logo, logo_dir=DEFAULT_LOGO_PATH):
         """Updates the logo preview.
@@ -237,6 +259,46 @@ class CplusSettings(Ui_DlgSettings, QgsOptionsPageWidget):
             Settings.PATHWAY_SUITABILITY_INDEX, pathway_suitability_index
         )
 
+        # Maximum number of concurrent analysis tasks
+        max_workers = self.max_workers_box.value()
+        settings_manager.set_value(Settings.ANALYSIS_MAX_WORKERS, max_workers)
+
+        # Analysis tiles
+        settings_manager.set_value(
+            Settings.ANALYSIS_TILE_SIZE, self.tile_size_box.value()
+        )
+        settings_manager.set_value(
+            Settings.ANALYSIS_USE_PROCESSES, self.cb_use_processes.isChecked()
+        )
+
+        # Analysis memory budget
+        settings_manager.set_value(
+            Settings.MEMORY_BUDGET_MB, self.memory_budget_box.value()
+        )
+
+        # Analysis cache size
+        cache_size = self.cache_size_box.value()
+        settings_manager.set_value(Settings.ANALYSIS_CACHE_SIZE, cache_size)
+
+        # Intermediate analysis layers
+        intermediate_outputs = int(self.intermediate_outputs_cbo.currentData())
+        settings_manager.set_value(Settings.INTERMEDIATE_OUTPUTS, intermediate_outputs)
+
+        # Output rasters profile
+        settings_manager.set_value(
+            Settings.OUTPUT_TILED, self.cb_output_tiled.isChecked()
+        )
+        settings_manager.set_value(
+            Settings.OUTPUT_BLOCK_SIZE, self.block_size_box.value()
+        )
+        settings_manager.set_value(
+            Settings.OUTPUT_COMPRESSION, self.compression_cbo.currentData()
+        )
+        settings_manager.set_value(
+            Settings.OUTPUT_BIGTIFF, self.bigtiff_cbo.currentData()
+        )
+        settings_manager.set_value(Settings.OUTPUT_COG, self.cb_output_cog.isChecked())
+
         # Checks if the provided base directory exists
         if not os.path.exists(base_dir_path):
             iface.messageBar().pushCritical(
@@ -301,6 +363,54 @@ class CplusSettings(Ui_DlgSettings, QgsOptionsPageWidget):
         )
         self.suitability_index_box.setValue(float(pathway_suitability_index))
 
+        # Maximum number of concurrent analysis tasks
+        max_workers = settings_manager.get_value(
+            Settings.ANALYSIS_MAX_WORKERS, default=0
+        )
+        self.max_workers_box.setValue(int(max_workers))
+
+        # Analysis tiles
+        tile_size = settings_manager.get_value(
+            Settings.ANALYSIS_TILE_SIZE, default=DEFAULT_ANALYSIS_TILE_SIZE
+        )
+        self.tile_size_box.setValue(int(tile_size))
+        self.cb_use_processes.setChecked(
+            settings_manager.get_value(
+                Settings.ANALYSIS_USE_PROCESSES, default=False, setting_type=bool
+            )
+        )
+
+        # Analysis memory budget
+        memory_budget = settings_manager.get_value(
+            Settings.MEMORY_BUDGET_MB, default=DEFAULT_MEMORY_BUDGET
+        )
+        self.memory_budget_box.setValue(int(memory_budget))
+
+        # Analysis cache size
+        cache_size = settings_manager.get_value(
+            Settings.ANALYSIS_CACHE_SIZE, default=DEFAULT_ANALYSIS_CACHE_SIZE
+        )
+        self.cache_size_box.setValue(int(cache_size))
+
+        # Intermediate analysis layers
+        intermediate_outputs = settings_manager.get_value(
+            Settings.INTERMEDIATE_OUTPUTS, default=IntermediateOutputs.MEMORY
+        )
+        self.intermediate_outputs_cbo.setCurrentIndex(
+            self.intermediate_outputs_cbo.findData(int(intermediate_outputs))
+        )
+
+        # Output rasters profile
+        profile = output_profile()
+        self.cb_output_tiled.setChecked(profile.tiled)
+        self.block_size_box.setValue(profile.block_size)
+        self.block_size_box.setEnabled(profile.tiled)
+        self.compression_cbo.setCurrentIndex(
+            self.compression_cbo.findData(profile.compression)
+        )
+        self.bigtiff_cbo.setCurrentIndex(self.bigtiff_cbo.findData(profile.bigtiff))
+        self.cb_output_cog.setChecked(profile.cog)
+
     def showEvent(self, event: QShowEvent) -> None:
         """Show event being called. This will display the plugin settings.
         The stored/saved settings will be loaded.
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks the scenario analysis pipeline on synthetic layers.
+
+Run from the test directory with the plugin sources in the python path:
+
+    python -m benchmarks.harness small medium
+
+    python -m benchmarks.harness --size 2000 --pathways 10 --models 9
+
+Each benchmark runs the full scenario analysis without the plugin user
+interface and reports the pixels processed per second and the peak
+memory of each stage as JSON lines. Results are compared with the
+baselines of the profiles, slower stages or higher memory beyond the
+tolerance are reported as regressions. Baselines depend on the machine
+and are recorded with --update-baselines.
+"""
+import argparse
+import dataclasses
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+import typing
+
+from qgis.core import QgsFeedback
+
+from cplus_plugin.cli import (
+    create_config_context,
+    create_config_scenario,
+    JsonLinesReporter,
+    start_application,
+)
+from cplus_plugin.lib.analysis.engine import ScenarioAnalysisEngine
+from cplus_plugin.lib.analysis.kernels import (
+    MODEL_STATISTICS,
+    OUTPUTS,
+    PATHWAY_STATISTICS,
+)
+from cplus_plugin.lib.analysis.manifest import current_rss
+from cplus_plugin.lib.analysis.scheduler import TaskStatus
+
+from .synthetic import create_synthetic_scenario, PROFILES, SyntheticProfile
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# Fraction by which a stage can be slower or use more memory than
+# its baseline before being reported as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# Seconds between the memory samples
+SAMPLE_INTERVAL = 0.05
+
+
+class StageMemorySampler:
+    """Samples the memory of the process while the analysis is running
+    and records the peak of each stage from the sub-tasks that are
+    running at the time of the sample.
+    """
+
+    def __init__(
+        self, engine: ScenarioAnalysisEngine, interval: float = SAMPLE_INTERVAL
+    ):
+        self._engine = engine
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self.stage_peaks: typing.Dict[str, int] = {}
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stop.wait(self._interval):
+            rss = current_rss()
+            if rss is None:
+                return
+            stages = {
+                task.stage
+                for task in self._engine.tasks
+                if task.status == TaskStatus.RUNNING
+            }
+            for stage in stages:
+                self.stage_peaks[stage] = max(self.stage_peaks.get(stage, 0), rss)
+
+
+def load_run_manifest(path: str) -> typing.Dict:
+    """Loads the run manifest saved by the analysis.
+
+    :param path: Path of the manifest file.
+    :type path: str
+
+    :returns: Run details, empty if the manifest does not exist.
+    :rtype: dict
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def stage_pixels(manifest: typing.Dict) -> typing.Dict[str, int]:
+    """Returns the number of pixels processed by each stage of a run.
+
+    :param manifest: Run manifest of the analysis.
+    :type manifest: dict
+
+    :returns: Grid pixels times the number of pathways or models whose
+    statistics were computed, the outputs stage processes the grid once.
+    :rtype: dict
+    """
+    pixels = manifest["grid"]["pixels"]
+    counts = {
+        PATHWAY_STATISTICS: sum(
+            pathway["computed"] for pathway in manifest["pathways"].values()
+        ),
+        MODEL_STATISTICS: sum(
+            model["computed"] for model in manifest["implementation_models"].values()
+        ),
+        OUTPUTS: 1,
+    }
+
+    return {
+        stage: pixels * counts[stage] for stage in manifest["stages"] if stage in counts
+    }
+
+
+def run_benchmark(
+    profile: SyntheticProfile,
+    data_directory: str,
+    output_directory: str,
+    max_workers: int = None,
+    use_processes: bool = False,
+    memory_budget_mb: int = None,
+) -> typing.Dict:
+    """Runs the scenario analysis of a synthetic profile, the analysis
+    cache is disabled so that all the stages are computed.
+
+    :param profile: Size and number of the synthetic layers.
+    :type profile: SyntheticProfile
+
+    :param data_directory: Directory of the synthetic layers, layers
+    created by previous benchmarks are reused.
+    :type data_directory: str
+
+    :param output_directory: Directory where the outputs are saved.
+    :type output_directory: str
+
+    :param max_workers: Maximum number of concurrent analysis tasks.
+    :type max_workers: int
+
+    :param use_processes: Whether the tiles are computed in worker
+    processes.
+    :type use_processes: bool
+
+    :param memory_budget_mb: Memory budget of the analysis in megabytes,
+    the plugin setting is used if not specified.
+    :type memory_budget_mb: int
+
+    :returns: Throughput and peak memory of each stage.
+    :rtype: dict
+    """
+    config = create_synthetic_scenario(
+        os.path.join(data_directory, f"{profile.size}px_seed{profile.seed}"), profile
+    )
+    if memory_budget_mb:
+        config["memory_budget_mb"] = memory_budget_mb
+    scenario = create_config_scenario(config)
+    os.makedirs(output_directory, exist_ok=True)
+    context = create_config_context(config, scenario, output_directory, QgsFeedback())
+    context = dataclasses.replace(
+        context,
+        max_workers=max_workers,
+        use_processes=use_processes,
+        cache_directory=None,
+        cache_size=0,
+        state_path=None,
+    )
+
+    engine = ScenarioAnalysisEngine(context)
+    with StageMemorySampler(engine) as sampler:
+        success = engine.run()
+
+    manifest = load_run_manifest(engine.manifest_path)
+    stages = {}
+    if success:
+        for stage, pixels in stage_pixels(manifest).items():
+            wall_time = manifest["stages"][stage]["wall_time"]
+            stages[stage] = {
+                "pixels": pixels,
+                "wall_time": round(wall_time, 3),
+                "pixels_per_second": round(pixels / wall_time) if wall_time else None,
+                "peak_rss": sampler.stage_peaks.get(stage),
+            }
+
+    return {
+        "profile": dataclasses.asdict(profile),
+        "success": success,
+        "wall_time": manifest.get("wall_time"),
+        "peak_rss": manifest.get("peak_rss"),
+        "process_peak_rss_workers": manifest.get("process_peak_rss_workers"),
+        "stages": stages,
+        "manifest": engine.manifest_path,
+        "environment": manifest.get("environment"),
+    }
+
+
+def compare_to_baseline(
+    result: typing.Dict,
+    baseline: typing.Dict,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> typing.List[str]:
+    """Compares the stages of a benchmark with its baseline.
+
+    :param result: Benchmark result.
+    :type result: dict
+
+    :param baseline: Benchmark result recorded as the baseline.
+    :type baseline: dict
+
+    :param tolerance: Fraction by which a stage can be slower or use
+    more memory than its baseline.
+    :type tolerance: float
+
+    :returns: Descriptions of the regressions, empty if there are none.
+    :rtype: list
+    """
+    if not result.get("success"):
+        return ["The analysis did not complete"]
+
+    regressions = []
+    for stage, expected in baseline.get("stages", {}).items():
+        actual = result["stages"].get(stage)
+        if actual is None:
+            regressions.append(f"Stage {stage} was not run")
+            continue
+
+        expected_rate = expected.get("pixels_per_second")
+        actual_rate = actual.get("pixels_per_second")
+        if expected_rate and actual_rate is not None:
+            if actual_rate < expected_rate * (1 - tolerance):
+                regressions.append(
+                    f"Stage {stage} processed {actual_rate} pixels per second, "
+                    f"the baseline is {expected_rate}"
+                )
+
+        expected_rss = expected.get("peak_rss")
+        actual_rss = actual.get("peak_rss")
+        if expected_rss and actual_rss is not None:
+            if actual_rss > expected_rss * (1 + tolerance):
+                regressions.append(
+                    f"Stage {stage} peak memory is {actual_rss} bytes, "
+                    f"the baseline is {expected_rss}"
+                )
+
+    return regressions
+
+
+def load_baselines(path: str = BASELINES_PATH) -> typing.Dict:
+    """Loads the benchmark baselines.
+
+    :param path: Path of the baselines file.
+    :type path: str
+
+    :returns: Baseline results indexed by profile name, empty if the
+    file does not exist.
+    :rtype: dict
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as baselines_file:
+        return json.load(baselines_file)
+
+
+def save_baselines(baselines: typing.Dict, path: str = BASELINES_PATH):
+    """Saves the benchmark baselines.
+
+    :param baselines: Baseline results indexed by profile name.
+    :type baselines: dict
+
+    :param path: Path of the baselines file.
+    :type path: str
+    """
+    with open(path, "w") as baselines_file:
+        json.dump(baselines, baselines_file, indent=4, sort_keys=True)
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Creates the command line arguments parser.
+
+    :returns: Arguments parser.
+    :rtype: argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.harness",
+        description="Benchmarks the scenario analysis on synthetic layers.",
+    )
+    parser.add_argument(
+        "profiles",
+        nargs="*",
+        help=f"Profiles to be benchmarked: {', '.join(PROFILES)}, "
+        f"defaults to small.",
+    )
+    parser.add_argument("--size", type=int, help="Width and height of the layers.")
+    parser.add_argument("--pathways", type=int, default=5)
+    parser.add_argument("--models", type=int, default=9)
+    parser.add_argument("--carbon-layers", type=int, default=1)
+    parser.add_argument("--priority-layers", type=int, default=5)
+    parser.add_argument("--pathways-per-model", type=int, default=3)
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--processes", action="store_true")
+    parser.add_argument("--memory-budget-mb", type=int, default=None)
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(tempfile.gettempdir(), "cplus_benchmarks"),
+        help="Directory of the synthetic layers, reused between runs.",
+    )
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help="Saves the results as the baselines of the profiles.",
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--profile-dir", default=None)
+
+    return parser
+
+
+def main(argv: typing.List[str] = None) -> int:
+    """Runs the benchmarks.
+
+    :param argv: Command line arguments, defaults to sys.argv.
+    :type argv: list
+
+    :returns: Exit code, 0 if all the benchmarks completed without
+    regressions.
+    :rtype: int
+    """
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    unknown = set(args.profiles) - set(PROFILES)
+    if unknown:
+        parser.error(f"Unknown profiles {sorted(unknown)}")
+    if args.size:
+        profiles = {
+            f"custom_{args.size}": SyntheticProfile(
+                size=args.size,
+                pathways=args.pathways,
+                models=args.models,
+                carbon_layers=args.carbon_layers,
+                priority_layers=args.priority_layers,
+                pathways_per_model=args.pathways_per_model,
+            )
+        }
+    else:
+        profiles = {name: PROFILES[name] for name in args.profiles or ["small"]}
+
+    reporter = JsonLinesReporter()
+    baselines = load_baselines(args.baselines)
+    app = start_application(args.profile_dir)
+    success = True
+    try:
+        for name, profile in profiles.items():
+            reporter.emit("started", profile=name, **dataclasses.asdict(profile))
+            output_directory = os.path.join(
+                args.data_dir,
+                "outputs",
+                f'{name}_{datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")}',
+            )
+            result = run_benchmark(
+                profile,
+                args.data_dir,
+                output_directory,
+                args.max_workers,
+                args.processes,
+                args.memory_budget_mb,
+            )
+            regressions = []
+            if args.update_baselines and result["success"]:
+                baselines[name] = result
+            elif name in baselines:
+                regressions = compare_to_baseline(
+                    result, baselines[name], args.tolerance
+                )
+            success = success and result["success"] and not regressions
+            reporter.emit("finished", profile=name, regressions=regressions, **result)
+    finally:
+        app.exitQgis()
+
+    if args.update_baselines:
+        save_baselines(baselines, args.baselines)
+
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
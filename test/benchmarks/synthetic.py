@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic NCS pathway, carbon and priority weighting layers for
+benchmarking the scenario analysis at realistic sizes.
+
+The layers cover one degree in EPSG:4326 so that the scenario extent
+is the same for all the sizes, only the pixel size changes. Values are
+a coarse random field with noise and areas of nodata which are written
+in strips so that the largest layers are not held in memory.
+"""
+import dataclasses
+import os
+import typing
+import uuid
+import zlib
+
+import numpy as np
+from osgeo import gdal, osr
+
+# Top-left corner of the synthetic layers
+ORIGIN_X = 30.0
+ORIGIN_Y = -24.0
+
+# Scenario extent as xmin, xmax, ymin and ymax
+SYNTHETIC_EXTENT = [ORIGIN_X, ORIGIN_X + 1.0, ORIGIN_Y - 1.0, ORIGIN_Y]
+
+NODATA_VALUE = -9999.0
+
+# Rows written at a time and size in pixels of the cells of the random field
+STRIP_ROWS = 512
+FIELD_CELL_SIZE = 256
+
+
+@dataclasses.dataclass
+class SyntheticProfile:
+    """Size and number of the synthetic layers of a benchmark."""
+
+    # Width and height of the layers in pixels
+    size: int
+    pathways: int
+    models: int
+    # Carbon layers of each pathway
+    carbon_layers: int = 1
+    # Priority weighting layers shared by the models
+    priority_layers: int = 5
+    # Pathways of each model, picked in turn from all the pathways
+    pathways_per_model: int = 3
+    seed: int = 0
+
+
+# Profiles from a quick check to the largest scenarios analyzed
+PROFILES = {
+    "small": SyntheticProfile(size=1000, pathways=5, models=9),
+    "medium": SyntheticProfile(size=10000, pathways=20, models=9),
+    "large": SyntheticProfile(
+        size=40000, pathways=50, models=12, carbon_layers=2, pathways_per_model=5
+    ),
+}
+
+
+def create_synthetic_raster(
+    path: str, size: int, seed: int, nodata_fraction: float = 0.1
+):
+    """Writes a synthetic single band Float32 GeoTIFF.
+
+    :param path: Path of the raster.
+    :type path: str
+
+    :param size: Width and height in pixels.
+    :type size: int
+
+    :param seed: Seed of the random values.
+    :type seed: int
+
+    :param nodata_fraction: Approximate fraction of the cells of the
+    random field that are nodata.
+    :type nodata_fraction: float
+    """
+    rng = np.random.default_rng(seed)
+    cells = size // FIELD_CELL_SIZE + 1
+    field = rng.random((cells, cells), dtype=np.float32)
+    nodata = rng.random((cells, cells)) < nodata_fraction
+
+    ds = gdal.GetDriverByName("GTiff").Create(
+        path,
+        size,
+        size,
+        1,
+        gdal.GDT_Float32,
+        options=["TILED=YES", "COMPRESS=DEFLATE", "PREDICTOR=3", "BIGTIFF=IF_SAFER"],
+    )
+    pixel_size = 1.0 / size
+    ds.SetGeoTransform((ORIGIN_X, pixel_size, 0.0, ORIGIN_Y, 0.0, -pixel_size))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    ds.SetProjection(srs.ExportToWkt())
+    band = ds.GetRasterBand(1)
+    band.SetNoDataValue(NODATA_VALUE)
+
+    columns = np.arange(size) // FIELD_CELL_SIZE
+    for row in range(0, size, STRIP_ROWS):
+        rows = min(STRIP_ROWS, size - row)
+        cell_rows = np.arange(row, row + rows) // FIELD_CELL_SIZE
+        values = field[np.ix_(cell_rows, columns)]
+        values = values + rng.normal(0.0, 0.05, values.shape).astype(np.float32)
+        values[nodata[np.ix_(cell_rows, columns)]] = NODATA_VALUE
+        band.WriteArray(values, 0, row)
+
+    band.FlushCache()
+    ds = None
+
+
+def create_synthetic_scenario(directory: str, profile: SyntheticProfile) -> typing.Dict:
+    """Creates the synthetic layers of a profile and the scenario
+    configuration analyzing them, see the command line interface for
+    the configuration format. Existing layers are reused.
+
+    :param directory: Directory where the layers are saved.
+    :type directory: str
+
+    :param profile: Size and number of the layers.
+    :type profile: SyntheticProfile
+
+    :returns: Scenario configuration.
+    :rtype: dict
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    # Identical layers and UUIDs for the same profile so that runs
+    # are comparable.
+    def layer(name: str) -> str:
+        path = os.path.join(directory, f"{name}.tif")
+        if not os.path.exists(path):
+            seed = zlib.crc32(f"{profile.seed}/{name}".encode())
+            create_synthetic_raster(path, profile.size, seed)
+        return path
+
+    def layer_uuid(name: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"cplus/{profile.seed}/{name}"))
+
+    pathways = []
+    for index in range(profile.pathways):
+        pathways.append(
+            {
+                "uuid": layer_uuid(f"pathway_{index + 1}"),
+                "name": f"Pathway {index + 1}",
+                "path": layer(f"pathway_{index + 1}"),
+                "layer_type": 0,
+                "carbon_paths": [
+                    layer(f"carbon_{index + 1}_{carbon + 1}")
+                    for carbon in range(profile.carbon_layers)
+                ],
+            }
+        )
+
+    priority_layers = [
+        {
+            "path": layer(f"priority_{index + 1}"),
+            "groups": [{"name": f"Group {index % 3 + 1}", "value": 5}],
+        }
+        for index in range(profile.priority_layers)
+    ]
+
+    models = []
+    for index in range(profile.models):
+        models.append(
+            {
+                "uuid": layer_uuid(f"model_{index + 1}"),
+                "name": f"Implementation model {index + 1}",
+                "pathways": [
+                    pathways[(index + offset) % len(pathways)]
+                    for offset in range(min(profile.pathways_per_model, len(pathways)))
+                ],
+                "priority_layers": priority_layers,
+            }
+        )
+
+    return {
+        "name": f"Benchmark {profile.size} px",
+        "extent": list(SYNTHETIC_EXTENT),
+        "implementation_models": models,
+        "priority_groups": {f"Group {index + 1}": 5 for index in range(3)},
+    }
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the analysis cache.
+"""
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from cplus_plugin.lib.analysis.cache import AnalysisCache, cache_key, file_identity
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestAnalysisCache(TestCase):
+    """Tests for the content-addressed analysis cache."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def _create_file(self, name: str, size: int) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as output:
+            output.write(b"0" * size)
+
+        return path
+
+    def test_file_identity(self):
+        """Assert the identity changes when the file changes."""
+        path = self._create_file("layer.tif", 10)
+        identity = file_identity(path)
+        self._create_file("layer.tif", 20)
+        self.assertNotEqual(identity, file_identity(path))
+        self.assertEqual(file_identity(f"{path}.missing")[1:], [None, None])
+
+    def test_cache_key(self):
+        """Assert keys depend on all the parts."""
+        self.assertEqual(cache_key("a", 1.0, [1, 2]), cache_key("a", 1.0, [1, 2]))
+        self.assertNotEqual(cache_key("a", 1.0), cache_key("a", 2.0))
+
+    def test_statistics(self):
+        """Assert statistics are saved and loaded."""
+        cache = AnalysisCache(os.path.join(self.directory, "cache"), 1024)
+        self.assertIsNone(cache.get_statistics("key"))
+        cache.put_statistics("key", {"minimum": 1.0, "maximum": 2.0})
+        self.assertEqual(cache.get_statistics("key"), {"minimum": 1.0, "maximum": 2.0})
+
+    def test_failed_write(self):
+        """Assert no partial entry is left when adding an entry fails."""
+        cache = AnalysisCache(os.path.join(self.directory, "cache"), 1024)
+        with self.assertRaises(TypeError):
+            cache.put_statistics("key", {"minimum": object()})
+        self.assertEqual(
+            os.listdir(os.path.join(self.directory, "cache", cache.STATISTICS_SEGMENT)),
+            [],
+        )
+        self.assertIsNone(cache.get_statistics("key"))
+
+    def test_lru_eviction(self):
+        """Assert the least recently used rasters are evicted."""
+        cache = AnalysisCache(os.path.join(self.directory, "cache"), 250)
+        cache.put_raster("first", self._create_file("first.tif", 100))
+        time.sleep(0.01)
+        cache.put_raster("second", self._create_file("second.tif", 100))
+        time.sleep(0.01)
+        # Accessing the first raster makes the second one the oldest entry
+        self.assertIsNotNone(cache.get_raster("first"))
+        cache.put_raster("third", self._create_file("third.tif", 100))
+        cache.evict()
+
+        self.assertIsNotNone(cache.get_raster("first"))
+        self.assertIsNone(cache.get_raster("second"))
+        self.assertIsNotNone(cache.get_raster("third"))
+
+    def test_raster_copied(self):
+        """Assert cached rasters do not share the file of the raster."""
+        cache = AnalysisCache(os.path.join(self.directory, "cache"), 1024)
+        path = self._create_file("output.tif", 100)
+        identity = file_identity(path)
+        cache.put_raster("output", path)
+        time.sleep(0.01)
+        cache_path = cache.get_raster("output")
+
+        self.assertFalse(os.path.samefile(path, cache_path))
+        self.assertEqual(file_identity(path), identity)
+
+        self._create_file("output.tif", 50)
+        self.assertEqual(os.path.getsize(cache_path), 100)
+
+    def test_lookup_counts(self):
+        """Assert cache hits and misses are counted."""
+        cache = AnalysisCache(os.path.join(self.directory, "cache"), 1024)
+        cache.get_statistics("key")
+        cache.put_statistics("key", {"minimum": 1.0, "maximum": 2.0})
+        cache.get_statistics("key")
+        cache.get_raster("raster")
+        counts = cache.lookup_counts()
+        self.assertEqual(counts["statistics_hits"], 1)
+        self.assertEqual(counts["statistics_misses"], 1)
+        self.assertEqual(counts["raster_hits"], 0)
+        self.assertEqual(counts["raster_misses"], 1)
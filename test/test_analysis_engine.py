@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the scenario analysis engine.
+"""
+import json
+import os
+import tempfile
+from unittest import TestCase
+from uuid import UUID
+
+import numpy as np
+from osgeo import gdal, osr
+
+from qgis.core import QgsFeedback
+from qgis.PyQt import QtCore
+
+from cplus_plugin.lib.analysis.engine import (
+    model_pixel_values,
+    SCENARIO_NODATA_VALUE,
+    ScenarioAnalysisEngine,
+)
+from cplus_plugin.definitions.constants import (
+    ANALYSIS_GRID_FILE_NAME,
+    INPUT_WINDOWS_SEGMENT,
+    RASTER_STATISTICS_FILE_NAME,
+)
+from cplus_plugin.lib.analysis.grid import is_aligned
+from cplus_plugin.lib.analysis.scheduler import TaskStatus
+from cplus_plugin.lib.analysis.state import load_analysis_state
+from cplus_plugin.lib.analysis.kernels import (
+    GRID_ALIGNMENT,
+    MODEL_STATISTICS,
+    OUTPUTS,
+    PATHWAY_STATISTICS,
+)
+from cplus_plugin.models.analysis import (
+    AnalysisContext,
+    IntermediateOutputs,
+    OutputProfile,
+    PriorityWeight,
+)
+from cplus_plugin.models.base import (
+    ImplementationModel,
+    LayerType,
+    NcsPathway,
+    Scenario,
+    SpatialExtent,
+)
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+MODEL_A_UUID_STR = "a0b8fd2d-1259-4141-9ad6-d4369cf0dfd4"
+MODEL_B_UUID_STR = "1c8db48b-717b-451b-a644-3af1bee984ea"
+PATHWAY_A_UUID_STR = "b187f92f-b85b-45c4-9179-447f8ea9668b"
+PATHWAY_B_UUID_STR = "5fe775ba-0e80-4b70-a53a-1ed874b72da3"
+
+
+def create_test_raster(path: str, values: np.ndarray):
+    """Writes the values to a GeoTIFF in EPSG:4326 with 0.1 degree pixels
+    whose top-left corner is at (30, -24).
+    """
+    rows, cols = values.shape
+    ds = gdal.GetDriverByName("GTiff").Create(path, cols, rows, 1, gdal.GDT_Float32)
+    ds.SetGeoTransform((30.0, 0.1, 0.0, -24.0, 0.0, -0.1))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    ds.SetProjection(srs.ExportToWkt())
+    ds.GetRasterBand(1).WriteArray(values)
+    ds = None
+
+
+class TestAnalysisEngine(TestCase):
+    """Tests for the tiled scenario analysis engine."""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        columns = np.tile(np.arange(10, dtype=np.float32), (10, 1))
+
+        self.pathway_a_path = os.path.join(self.output_dir, "pathway_a.tif")
+        create_test_raster(self.pathway_a_path, columns)
+
+        self.pathway_b_path = os.path.join(self.output_dir, "pathway_b.tif")
+        create_test_raster(self.pathway_b_path, 9 - columns)
+
+    def _create_context(
+        self, models, cache_directory=None, state_path=None
+    ) -> AnalysisContext:
+        scenario = Scenario(
+            UUID("6cf5b355-f605-4de5-98b1-64936d473f82"),
+            "Test Scenario",
+            "Test scenario description",
+            SpatialExtent(bbox=[30.0, 31.0, -25.0, -24.0]),
+            models,
+            [],
+        )
+
+        return AnalysisContext(
+            scenario=scenario,
+            scenario_directory=self.output_dir,
+            base_dir=self.output_dir,
+            carbon_coefficient=0.0,
+            suitability_index=0.0,
+            ordered_model_ids=[MODEL_A_UUID_STR, MODEL_B_UUID_STR],
+            priority_weights={},
+            apply_weighting=False,
+            feedback=QgsFeedback(),
+            cache_directory=cache_directory,
+            cache_size=100 * 1024 * 1024 if cache_directory else 0,
+            state_path=state_path,
+        )
+
+    def _create_model(self, model_uuid, pathway_uuid, path) -> ImplementationModel:
+        pathway = NcsPathway(
+            UUID(pathway_uuid),
+            "Pathway",
+            "Test pathway",
+            path,
+            LayerType.RASTER,
+            True,
+        )
+        return ImplementationModel(
+            UUID(model_uuid), "Model", "Test model", pathways=[pathway]
+        )
+
+    def _create_fine_raster(self) -> str:
+        """Writes pathway B values with twice the resolution of the
+        other test rasters.
+        """
+        fine_path = os.path.join(self.output_dir, "pathway_b_fine.tif")
+        columns = np.tile(np.repeat(np.arange(10, dtype=np.float32), 2), (20, 1))
+        ds = gdal.GetDriverByName("GTiff").Create(
+            fine_path, 20, 20, 1, gdal.GDT_Float32
+        )
+        ds.SetGeoTransform((30.0, 0.05, 0.0, -24.0, 0.0, -0.05))
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+        ds.SetProjection(srs.ExportToWkt())
+        ds.GetRasterBand(1).WriteArray(9 - columns)
+        ds = None
+
+        return fine_path
+
+    def test_model_pixel_values(self):
+        """Assert default models keep their pixel values and other
+        models are numbered after the default values.
+        """
+        custom_uuid_str = "8f3a9e0c-4c2b-4a55-9c58-0d7d4b7b8a11"
+        models = [
+            self._create_model(custom_uuid_str, PATHWAY_A_UUID_STR, ""),
+            self._create_model(MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, ""),
+        ]
+        pixel_values = model_pixel_values(
+            models, [MODEL_A_UUID_STR, custom_uuid_str, MODEL_B_UUID_STR]
+        )
+        self.assertEqual(pixel_values, {MODEL_B_UUID_STR: 2, custom_uuid_str: 14})
+
+    def test_scenario_outputs(self):
+        """Assert the highest position output of two models."""
+        models = [
+            self._create_model(
+                MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+            ),
+            self._create_model(
+                MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, self.pathway_b_path
+            ),
+        ]
+        context = self._create_context(models)
+        progress = []
+        context.feedback.progressChanged.connect(
+            progress.append, type=QtCore.Qt.DirectConnection
+        )
+        engine = ScenarioAnalysisEngine(context)
+        self.assertTrue(engine.run())
+
+        # Progress of all the stages is combined
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(progress[-1], 100.0)
+
+        output_path = engine.output["OUTPUT"]
+        self.assertTrue(os.path.exists(output_path))
+
+        band = gdal.Open(output_path).GetRasterBand(1)
+        self.assertEqual(band.DataType, gdal.GDT_Byte)
+        self.assertEqual(band.GetNoDataValue(), SCENARIO_NODATA_VALUE)
+        values = band.ReadAsArray()
+        self.assertFalse(np.any(values == SCENARIO_NODATA_VALUE))
+        # Model A has the highest values in the right half of the grid
+        np.testing.assert_array_equal(values[:, 5:], 1)
+        np.testing.assert_array_equal(values[:, :5], 2)
+
+        for model in models:
+            self.assertTrue(os.path.exists(model.path))
+
+        # Statistics are computed while writing the outputs
+        band = gdal.Open(output_path).GetRasterBand(1)
+        self.assertEqual(band.GetStatistics(False, False), [1.0, 2.0, 1.5, 0.5])
+        with open(
+            os.path.join(self.output_dir, RASTER_STATISTICS_FILE_NAME)
+        ) as manifest_file:
+            manifest = json.load(manifest_file)
+        self.assertEqual(manifest[output_path]["count"], 100)
+
+        # Pixel values are mapped to the models in the attribute table
+        rat = band.GetDefaultRAT()
+        self.assertEqual(rat.GetRowCount(), 2)
+        self.assertEqual(rat.GetValueAsInt(0, 0), 1)
+        self.assertEqual(rat.GetValueAsInt(1, 0), 2)
+
+        # Each sub-task has run once
+        for task in engine.tasks:
+            self.assertEqual(task.status, TaskStatus.COMPLETED)
+        self.assertEqual(
+            set(engine.stage_timings().keys()),
+            {PATHWAY_STATISTICS, MODEL_STATISTICS, OUTPUTS},
+        )
+
+        # Run details are saved for comparing runs
+        with open(engine.manifest_path) as manifest_file:
+            run_manifest = json.load(manifest_file)
+        self.assertTrue(run_manifest["success"])
+        self.assertEqual(run_manifest["grid"]["width"], 10)
+        self.assertEqual(
+            set(run_manifest["stages"].keys()),
+            {PATHWAY_STATISTICS, MODEL_STATISTICS, OUTPUTS},
+        )
+        self.assertGreater(run_manifest["stages"][PATHWAY_STATISTICS]["bytes_read"], 0)
+        self.assertGreater(run_manifest["outputs"]["bytes_written"], 0)
+        self.assertEqual(len(run_manifest["implementation_models"]), 2)
+
+    def test_tiled_scenario_outputs(self):
+        """Assert small tiles computed in threads and in worker
+        processes give the same outputs.
+        """
+        models = [
+            self._create_model(
+                MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+            ),
+            self._create_model(
+                MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, self.pathway_b_path
+            ),
+        ]
+        for use_processes in (False, True):
+            context = self._create_context(models)
+            context.tile_size = 4
+            context.max_workers = 2
+            context.use_processes = use_processes
+            engine = ScenarioAnalysisEngine(context)
+            self.assertTrue(engine.run())
+
+            values = gdal.Open(engine.output["OUTPUT"]).ReadAsArray()
+            np.testing.assert_array_equal(values[:, 5:], 1)
+            np.testing.assert_array_equal(values[:, :5], 2)
+
+    def test_small_memory_budget(self):
+        """Assert the analysis completes one tile at a time when the
+        memory budget is too small.
+        """
+        models = [
+            self._create_model(
+                MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+            ),
+            self._create_model(
+                MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, self.pathway_b_path
+            ),
+        ]
+        context = self._create_context(models)
+        context.memory_budget = 1024
+        engine = ScenarioAnalysisEngine(context)
+        self.assertTrue(engine.run())
+
+        values = gdal.Open(engine.output["OUTPUT"]).ReadAsArray()
+        np.testing.assert_array_equal(values[:, 5:], 1)
+        np.testing.assert_array_equal(values[:, :5], 2)
+
+    def test_mixed_resolution_inputs(self):
+        """Assert layers with a different resolution are warped once to
+        the grid of the first pathway.
+        """
+        fine_path = self._create_fine_raster()
+        models = [
+            self._create_model(
+                MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+            ),
+            self._create_model(MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, fine_path),
+        ]
+        engine = ScenarioAnalysisEngine(self._create_context(models))
+        self.assertTrue(engine.run())
+
+        alignment_tasks = [
+            task for task in engine.tasks if task.stage == GRID_ALIGNMENT
+        ]
+        self.assertEqual(len(alignment_tasks), 1)
+        self.assertEqual(alignment_tasks[0].status, TaskStatus.COMPLETED)
+
+        with open(os.path.join(self.output_dir, ANALYSIS_GRID_FILE_NAME)) as grid_file:
+            grid_dict = json.load(grid_file)
+        self.assertEqual((grid_dict["width"], grid_dict["height"]), (10, 10))
+        self.assertFalse(is_aligned(fine_path, engine._grid))
+
+        values = gdal.Open(engine.output["OUTPUT"]).ReadAsArray()
+        np.testing.assert_array_equal(values[:, 5:], 1)
+        np.testing.assert_array_equal(values[:, :5], 2)
+
+        # Windows and warped layers are not kept
+        self.assertFalse(
+            os.path.exists(os.path.join(self.output_dir, INPUT_WINDOWS_SEGMENT))
+        )
+
+    def test_cached_aligned_inputs(self):
+        """Assert a rerun uses the cached layers warped to the grid."""
+        fine_path = self._create_fine_raster()
+        cache_directory = os.path.join(self.output_dir, "analysis_cache")
+        alignment_tasks = []
+        for suitability_index in (0.0, 1.0):
+            models = [
+                self._create_model(
+                    MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+                ),
+                self._create_model(MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, fine_path),
+            ]
+            context = self._create_context(models, cache_directory)
+            # Only the warped layer can be reused by the second run
+            context.suitability_index = suitability_index
+            engine = ScenarioAnalysisEngine(context)
+            self.assertTrue(engine.run())
+            alignment_tasks.append(
+                [task for task in engine.tasks if task.stage == GRID_ALIGNMENT]
+            )
+
+        self.assertEqual(len(alignment_tasks[0]), 1)
+        self.assertEqual(alignment_tasks[1], [])
+        self.assertEqual(len(engine._aligned_sources), 1)
+
+    def test_cached_scenario_outputs(self):
+        """Assert a rerun with similar inputs uses the cached models."""
+        cache_directory = os.path.join(self.output_dir, "analysis_cache")
+        outputs = []
+        for _ in range(2):
+            models = [
+                self._create_model(
+                    MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+                ),
+                self._create_model(
+                    MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, self.pathway_b_path
+                ),
+            ]
+            engine = ScenarioAnalysisEngine(
+                self._create_context(models, cache_directory)
+            )
+            self.assertTrue(engine.run())
+            output_ds = gdal.Open(engine.output["OUTPUT"])
+            outputs.append(output_ds.GetRasterBand(1).ReadAsArray())
+            output_ds = None
+
+        self.assertEqual(len(engine._normalized_sources), 2)
+        np.testing.assert_array_equal(outputs[0], outputs[1])
+
+    def test_reuse_previous_normalized_models(self):
+        """Assert a rerun with only changed weights reuses the normalized
+        models of the last analysis.
+        """
+        state_path = os.path.join(self.output_dir, "last_analysis.json")
+        engines = []
+        for coefficient in (1.0, 2.0):
+            models = [
+                self._create_model(
+                    MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+                ),
+                self._create_model(
+                    MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, self.pathway_b_path
+                ),
+            ]
+            context = self._create_context(models, state_path=state_path)
+            context.apply_weighting = True
+            context.priority_weights = {
+                MODEL_B_UUID_STR: [PriorityWeight(self.pathway_b_path, coefficient)]
+            }
+            engine = ScenarioAnalysisEngine(context)
+            self.assertTrue(engine.run())
+            engines.append(engine)
+
+        self.assertEqual(len(engines[0]._normalized_sources), 0)
+        self.assertEqual(len(engines[1]._normalized_sources), 2)
+
+        state = load_analysis_state(state_path)
+        previous_state = engines[0]._current_state()
+        changes = state.changes(previous_state)
+        self.assertEqual(changes["pathways"], [])
+        self.assertEqual(changes["implementation_models"], [])
+        self.assertEqual(changes["weights"], [MODEL_B_UUID_STR])
+
+    def test_keep_intermediate_outputs(self):
+        """Assert the intermediate layers are saved when requested."""
+        models = [
+            self._create_model(
+                MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+            )
+        ]
+        context = self._create_context(models)
+        context.intermediate_outputs = IntermediateOutputs.KEEP_ALL
+        engine = ScenarioAnalysisEngine(context)
+        self.assertTrue(engine.run())
+
+        for segment in (
+            "pathways_carbon_layers",
+            "normalized_pathways",
+            "implementation_models",
+            INPUT_WINDOWS_SEGMENT,
+        ):
+            self.assertEqual(len(os.listdir(os.path.join(self.output_dir, segment))), 1)
+
+    def test_output_profile_options(self):
+        """Assert the creation options of the output profiles."""
+        options = OutputProfile(compression="ZSTD").creation_options()
+        self.assertIn("TILED=YES", options)
+        self.assertIn("BLOCKXSIZE=256", options)
+        self.assertIn("COMPRESS=ZSTD", options)
+        self.assertIn("PREDICTOR=3", options)
+
+        options = OutputProfile().creation_options(floating_point=False)
+        self.assertIn("PREDICTOR=2", options)
+
+        options = OutputProfile(tiled=False, compression="NONE").creation_options()
+        self.assertEqual(options, ["BIGTIFF=IF_SAFER"])
+
+        options = OutputProfile(cog=True).creation_options()
+        self.assertIn("OVERVIEWS=AUTO", options)
+        self.assertNotIn("TILED=YES", options)
+
+    def test_cog_outputs(self):
+        """Assert the outputs are written as cloud optimized GeoTIFFs."""
+        models = [
+            self._create_model(
+                MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+            )
+        ]
+        context = self._create_context(models)
+        context.output_profile = OutputProfile(block_size=64, cog=True)
+        engine = ScenarioAnalysisEngine(context)
+        self.assertTrue(engine.run())
+
+        for path in (engine.output["OUTPUT"], models[0].path):
+            ds = gdal.Open(path)
+            image_structure = ds.GetMetadata("IMAGE_STRUCTURE")
+            self.assertEqual(image_structure.get("LAYOUT"), "COG")
+            self.assertEqual(image_structure.get("COMPRESSION"), "DEFLATE")
+            self.assertFalse(os.path.exists(f"{path}.tmp.tif"))
+
+    def test_cancelled_analysis(self):
+        """Assert the analysis stops when the feedback is cancelled."""
+        models = [
+            self._create_model(
+                MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+            )
+        ]
+        context = self._create_context(models)
+        context.feedback.cancel()
+        engine = ScenarioAnalysisEngine(context)
+        self.assertFalse(engine.run())
+        self.assertIsNone(engine.output)
+
+    def test_cancel_running_analysis(self):
+        """Assert the analysis stops at the next tile when cancelled
+        while running and the partial outputs are removed.
+        """
+        models = [
+            self._create_model(
+                MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path
+            ),
+            self._create_model(
+                MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, self.pathway_b_path
+            ),
+        ]
+        for use_processes in (False, True):
+            context = self._create_context(models)
+            context.tile_size = 2
+            context.max_workers = 2
+            context.use_processes = use_processes
+            context.feedback.progressChanged.connect(
+                context.feedback.cancel, type=QtCore.Qt.DirectConnection
+            )
+            engine = ScenarioAnalysisEngine(context)
+            self.assertFalse(engine.run())
+            self.assertIsNone(engine.output)
+            self.assertIn(TaskStatus.SKIPPED, [task.status for task in engine.tasks])
+
+            outputs = []
+            for directory, _, file_names in os.walk(self.output_dir):
+                outputs.extend(
+                    os.path.join(directory, name)
+                    for name in file_names
+                    if name.endswith(".tif")
+                )
+            self.assertEqual(
+                sorted(outputs), sorted([self.pathway_a_path, self.pathway_b_path])
+            )
+            self.assertFalse(
+                os.path.exists(os.path.join(self.output_dir, INPUT_WINDOWS_SEGMENT))
+            )
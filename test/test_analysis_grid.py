@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the analysis grid and input windows.
+"""
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from osgeo import gdal, osr
+
+from cplus_plugin.lib.analysis.grid import (
+    is_aligned,
+    save_grid,
+    snapped_grid,
+    warp_to_grid,
+)
+from cplus_plugin.lib.analysis.kernels import create_window, RasterGrid, source_window
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+REFERENCE_TRANSFORM = (30.0, 0.1, 0.0, -24.0, 0.0, -0.1)
+
+
+class TestAnalysisGrid(TestCase):
+    """Tests for cropping the input layers to the analysis grid."""
+
+    def setUp(self):
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+        self.crs_wkt = srs.ExportToWkt()
+
+        self.path = os.path.join(tempfile.mkdtemp(), "layer.tif")
+        ds = gdal.GetDriverByName("GTiff").Create(
+            self.path, 10, 10, 1, gdal.GDT_Float32
+        )
+        ds.SetGeoTransform(REFERENCE_TRANSFORM)
+        ds.SetProjection(self.crs_wkt)
+        ds.GetRasterBand(1).WriteArray(
+            np.arange(100, dtype=np.float32).reshape((10, 10))
+        )
+        ds = None
+
+    def test_snapped_grid(self):
+        """Assert the grid is snapped to the reference pixels."""
+        grid = snapped_grid(
+            (30.05, -24.73, 30.52, -24.02), self.crs_wkt, REFERENCE_TRANSFORM
+        )
+        self.assertEqual(grid.width, 6)
+        self.assertEqual(grid.height, 8)
+        np.testing.assert_allclose(grid.bounds, (30.0, -24.8, 30.6, -24.0))
+
+    def test_aligned_window(self):
+        """Assert aligned layers are cropped without resampling."""
+        grid = RasterGrid(
+            self.crs_wkt, (30.2, 0.1, 0.0, -24.3, 0.0, -0.1), width=4, height=2
+        )
+        self.assertEqual(source_window(gdal.Open(self.path), grid), [2, 3, 4, 2])
+
+        window = create_window(self.path, grid)
+        values = window.GetRasterBand(1).ReadAsArray()
+        np.testing.assert_array_equal(values, [[32, 33, 34, 35], [42, 43, 44, 45]])
+
+    def test_warped_window(self):
+        """Assert layers not aligned to the grid are warped."""
+        grid = RasterGrid(
+            self.crs_wkt, (30.0, 0.2, 0.0, -24.0, 0.0, -0.2), width=5, height=5
+        )
+        self.assertIsNone(source_window(gdal.Open(self.path), grid))
+
+        window = create_window(self.path, grid)
+        self.assertEqual(window.RasterXSize, 5)
+        self.assertEqual(window.RasterYSize, 5)
+
+    def test_warp_to_grid(self):
+        """Assert layers are warped once to a GeoTIFF on the grid."""
+        grid = RasterGrid(
+            self.crs_wkt, (30.0, 0.05, 0.0, -24.0, 0.0, -0.05), width=20, height=20
+        )
+        self.assertFalse(is_aligned(self.path, grid))
+        output_path = os.path.join(os.path.dirname(self.path), "warped.tif")
+        self.assertTrue(warp_to_grid(self.path, grid, output_path, -9999))
+
+        ds = gdal.Open(output_path)
+        self.assertEqual(ds.GetDriver().ShortName, "GTiff")
+        self.assertEqual((ds.RasterXSize, ds.RasterYSize), (20, 20))
+        self.assertTrue(is_aligned(output_path, grid))
+        values = ds.GetRasterBand(1).ReadAsArray()
+        # Each source pixel covers 2 x 2 grid pixels
+        self.assertEqual(values[0, 0], 0)
+        self.assertEqual(values[1, 1], 0)
+        self.assertEqual(values[2, 2], 11)
+
+    def test_cancel_warp_to_grid(self):
+        """Assert the partial layer is removed if warping is cancelled."""
+        grid = RasterGrid(
+            self.crs_wkt, (30.0, 0.05, 0.0, -24.0, 0.0, -0.05), width=20, height=20
+        )
+        output_path = os.path.join(os.path.dirname(self.path), "cancelled.tif")
+        self.assertFalse(
+            warp_to_grid(self.path, grid, output_path, callback=lambda *args: 0)
+        )
+        self.assertFalse(os.path.exists(output_path))
+
+    def test_missing_layer(self):
+        """Assert layers that cannot be opened are neither aligned nor warped."""
+        grid = RasterGrid(
+            self.crs_wkt, (30.0, 0.05, 0.0, -24.0, 0.0, -0.05), width=20, height=20
+        )
+        missing_path = os.path.join(os.path.dirname(self.path), "missing.tif")
+        output_path = os.path.join(os.path.dirname(self.path), "missing_warped.tif")
+        self.assertFalse(is_aligned(missing_path, grid))
+        self.assertFalse(warp_to_grid(missing_path, grid, output_path))
+        self.assertFalse(os.path.exists(output_path))
+
+    def test_save_grid(self):
+        """Assert the grid is saved as JSON."""
+        grid = snapped_grid(
+            (30.05, -24.73, 30.52, -24.02), self.crs_wkt, REFERENCE_TRANSFORM
+        )
+        path = os.path.join(os.path.dirname(self.path), "grid.json")
+        save_grid(path, grid)
+        with open(path) as grid_file:
+            grid_dict = json.load(grid_file)
+        self.assertEqual(
+            RasterGrid(
+                grid_dict["crs_wkt"],
+                tuple(grid_dict["geo_transform"]),
+                grid_dict["width"],
+                grid_dict["height"],
+            ),
+            grid,
+        )
+        self.assertEqual(grid_dict["bounds"], list(grid.bounds))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the run manifest of the analysis.
+"""
+import json
+import os
+import sys
+import tempfile
+from unittest import TestCase
+import uuid
+
+from cplus_plugin.lib.analysis.manifest import (
+    current_rss,
+    process_peak_rss,
+    RunMetrics,
+    save_run_manifest,
+)
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestRunManifest(TestCase):
+    """Tests for the run metrics and manifest."""
+
+    def test_run_metrics_totals(self):
+        """Assert tile metrics are summed by stage and key."""
+        metrics = RunMetrics()
+        first, second = uuid.uuid4(), uuid.uuid4()
+        metrics.add_tile("pathways", first, 100, 0.5)
+        metrics.add_tile("pathways", first, 100, 0.5)
+        metrics.add_tile("pathways", second, 50, 0.25)
+        metrics.add_tile("outputs", None, 10, 0.1)
+
+        self.assertEqual(
+            metrics.totals("pathways", first),
+            {"tiles": 2, "bytes_read": 200, "tile_cpu_time": 1.0},
+        )
+        self.assertEqual(metrics.totals("pathways")["bytes_read"], 250)
+        self.assertEqual(metrics.totals("outputs")["tiles"], 1)
+        self.assertEqual(metrics.totals("models")["tiles"], 0)
+
+    def test_save(self):
+        """Assert the manifest is saved as JSON."""
+        path = os.path.join(tempfile.mkdtemp(), "run_manifest.json")
+        save_run_manifest(path, {"success": True, "stages": {"outputs": {}}})
+        with open(path) as manifest_file:
+            self.assertEqual(
+                json.load(manifest_file), {"success": True, "stages": {"outputs": {}}}
+            )
+        self.assertFalse(os.path.exists(f"{path}.part"))
+
+    def test_peak_rss(self):
+        """Assert the peak memory is available on Linux."""
+        if not sys.platform.startswith("linux"):
+            self.skipTest("Peak memory is only checked on Linux")
+        self.assertGreater(process_peak_rss(), 0)
+
+    def test_run_peak_rss(self):
+        """Assert the peak memory of the run is sampled while it runs."""
+        if not sys.platform.startswith("linux"):
+            self.skipTest("Peak memory is only checked on Linux")
+        metrics = RunMetrics(sample_interval=0.01)
+        self.assertIsNone(metrics.peak_rss)
+        metrics.start()
+        metrics.stop()
+        metrics.stop()
+
+        self.assertGreater(metrics.peak_rss, 0)
+        self.assertGreater(current_rss(), 0)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for sizing the analysis from the memory budget.
+"""
+from unittest import TestCase
+from uuid import uuid4
+
+from osgeo import gdal
+
+from cplus_plugin.lib.analysis.memory import (
+    GdalCacheReservation,
+    GDAL_CACHE_FRACTION,
+    memory_plan,
+    MIN_TILE_SIZE,
+    tile_pixel_bytes,
+    WORKER_PROCESS_BYTES,
+)
+from cplus_plugin.models.base import ImplementationModel, LayerType, NcsPathway
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+MB = 1024 * 1024
+
+
+class TestAnalysisMemory(TestCase):
+    """Tests for the memory plan of the analysis."""
+
+    def _create_models(self, count, pathway_count=2):
+        return [
+            ImplementationModel(
+                uuid4(),
+                "Model",
+                "",
+                pathways=[
+                    NcsPathway(uuid4(), "Pathway", "", "", LayerType.RASTER, True)
+                    for _ in range(pathway_count)
+                ],
+            )
+            for _ in range(count)
+        ]
+
+    def test_tile_pixel_bytes(self):
+        """Assert the tile memory grows with the number of models."""
+        small = tile_pixel_bytes(self._create_models(2))
+        large = tile_pixel_bytes(self._create_models(20))
+        self.assertGreater(large, small)
+        self.assertGreater(
+            tile_pixel_bytes(self._create_models(2), keep_intermediates=True), small
+        )
+        self.assertGreater(
+            tile_pixel_bytes(self._create_models(2), priority_layers=5), small
+        )
+
+    def test_plan_fits_budget(self):
+        """Assert the tiles in flight and the cache fit the budget."""
+        for budget, model_count in ((512, 2), (512, 40), (8192, 40), (256000, 5)):
+            pixel_bytes = tile_pixel_bytes(self._create_models(model_count))
+            plan = memory_plan(budget * MB, pixel_bytes, 8, 4096)
+            self.assertFalse(plan.over_budget)
+            self.assertEqual(plan.tile_size % MIN_TILE_SIZE, 0)
+            self.assertLessEqual(plan.tile_size, 4096)
+            self.assertEqual(plan.gdal_cache, int(budget * MB * GDAL_CACHE_FRACTION))
+            tiles_memory = plan.tile_size**2 * pixel_bytes * plan.tiles_in_flight
+            self.assertLessEqual(tiles_memory + plan.gdal_cache, budget * MB)
+
+        # Smaller maximum tile sizes are kept
+        self.assertEqual(memory_plan(2048 * MB, 100, 2, 4).tile_size, 4)
+
+    def test_plan_small_budget(self):
+        """Assert fewer tiles are computed at the same time when even
+        the smallest tiles do not fit.
+        """
+        pixel_bytes = tile_pixel_bytes(self._create_models(100, 10))
+        plan = memory_plan(64 * MB, pixel_bytes, 16, 1024)
+        self.assertEqual(plan.tile_size, MIN_TILE_SIZE)
+        self.assertLess(plan.tiles_in_flight, 16)
+        self.assertGreaterEqual(plan.tiles_in_flight, 1)
+        self.assertEqual(plan.workers, plan.tiles_in_flight)
+
+        plan = memory_plan(MB, pixel_bytes, 16, 1024)
+        self.assertTrue(plan.over_budget)
+        self.assertEqual(plan.tiles_in_flight, 1)
+
+    def test_plan_worker_processes(self):
+        """Assert the cache is shared with the worker processes."""
+        plan = memory_plan(4096 * MB, 100, 4, 1024, worker_processes=4)
+        self.assertEqual(plan.tiles_in_flight, 8)
+        self.assertGreater(plan.worker_gdal_cache, 0)
+        self.assertLessEqual(
+            plan.gdal_cache + 4 * plan.worker_gdal_cache,
+            int(4096 * MB * GDAL_CACHE_FRACTION),
+        )
+
+    def test_plan_caps_worker_processes(self):
+        """Assert the worker processes are reduced to fit the budget."""
+        pixel_bytes = 100
+        plan = memory_plan(512 * MB, pixel_bytes, 8, 1024, worker_processes=8)
+        self.assertEqual(plan.worker_processes, 2)
+        self.assertEqual(plan.workers, 2)
+        self.assertFalse(plan.over_budget)
+        tiles_memory = plan.tile_size**2 * pixel_bytes * plan.tiles_in_flight
+        self.assertLessEqual(
+            tiles_memory
+            + plan.gdal_cache
+            + plan.worker_processes * (WORKER_PROCESS_BYTES + plan.worker_gdal_cache),
+            512 * MB,
+        )
+
+        # Tiles are computed in the analysis threads if no process fits
+        plan = memory_plan(128 * MB, pixel_bytes, 8, 1024, worker_processes=8)
+        self.assertEqual(plan.worker_processes, 0)
+        self.assertEqual(plan.worker_gdal_cache, 0)
+        self.assertEqual(plan.workers, 8)
+
+    def test_gdal_cache_reservation(self):
+        """Assert the GDAL cache is restored after the analyses complete."""
+        previous = gdal.GetCacheMax()
+        with GdalCacheReservation(64 * MB):
+            self.assertEqual(gdal.GetCacheMax(), 64 * MB)
+            with GdalCacheReservation(32 * MB):
+                self.assertEqual(gdal.GetCacheMax(), 96 * MB)
+            self.assertEqual(gdal.GetCacheMax(), 64 * MB)
+        self.assertEqual(gdal.GetCacheMax(), previous)
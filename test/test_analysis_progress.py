@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the overall progress of the analysis stages.
+"""
+from unittest import TestCase
+
+from qgis.core import QgsFeedback
+from qgis.PyQt import QtCore
+
+from cplus_plugin.lib.analysis.progress import ProgressAggregator
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestProgressAggregator(TestCase):
+    """Tests for combining the progress of the analysis stages."""
+
+    def setUp(self):
+        self.feedback = QgsFeedback()
+        self.values = []
+        self.feedback.progressChanged.connect(
+            self.values.append, type=QtCore.Qt.DirectConnection
+        )
+
+    def test_weighted_progress(self):
+        """Assert the stages are weighted by their work."""
+        progress = ProgressAggregator(self.feedback, update_interval=0)
+        progress.add_work("statistics", 100)
+        progress.add_work("outputs", 300)
+
+        progress.advance("statistics", 100)
+        self.assertEqual(progress.progress, 25.0)
+        self.assertEqual(progress.stage_progress()["statistics"], 100.0)
+
+        progress.advance("outputs", 150)
+        self.assertEqual(progress.progress, 62.5)
+        self.assertIsNotNone(progress.remaining_time)
+
+        # Work beyond the estimate is ignored
+        progress.advance("statistics", 100)
+        self.assertEqual(progress.progress, 62.5)
+
+        progress.finish()
+        self.assertEqual(self.values, [25.0, 62.5, 100.0])
+
+    def test_throttled_updates(self):
+        """Assert the feedback is updated at most once per interval."""
+        progress = ProgressAggregator(self.feedback, update_interval=60)
+        progress.add_work("outputs", 100)
+        for _ in range(100):
+            progress.advance("outputs", 1)
+
+        self.assertEqual(self.values, [1.0])
+        self.assertEqual(progress.progress, 100.0)
+
+        progress.finish()
+        self.assertEqual(self.values, [1.0, 100.0])
+
+    def test_no_work(self):
+        """Assert the remaining time is unknown before any work is done."""
+        progress = ProgressAggregator(self.feedback)
+        self.assertEqual(progress.progress, 0.0)
+        self.assertIsNone(progress.remaining_time)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the analysis task scheduler.
+"""
+import threading
+from unittest import TestCase
+
+from qgis.core import QgsFeedback
+
+from cplus_plugin.lib.analysis.scheduler import TaskGraph, TaskStatus
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestTaskGraph(TestCase):
+    """Tests for running analysis sub-tasks in dependency order."""
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.executed = []
+
+    def _task(self, name, result=True):
+        def run():
+            with self.lock:
+                self.executed.append(name)
+            return result
+
+        return run
+
+    def test_dependency_order(self):
+        """Assert nodes only run after their dependencies."""
+        graph = TaskGraph(max_workers=4)
+        graph.add_node("pathway_a", self._task("pathway_a"))
+        graph.add_node("pathway_b", self._task("pathway_b"))
+        graph.add_node("model_a", self._task("model_a"), ["pathway_a"])
+        graph.add_node("model_b", self._task("model_b"), ["pathway_a", "pathway_b"])
+        graph.add_node("outputs", self._task("outputs"), ["model_a", "model_b"])
+
+        self.assertTrue(graph.run())
+        self.assertEqual(len(self.executed), 5)
+        self.assertLess(
+            self.executed.index("pathway_a"), self.executed.index("model_a")
+        )
+        self.assertLess(
+            self.executed.index("pathway_b"), self.executed.index("model_b")
+        )
+        self.assertEqual(self.executed[-1], "outputs")
+
+    def test_failed_node(self):
+        """Assert dependents of a failed node are not run."""
+        graph = TaskGraph(max_workers=1)
+        graph.add_node("pathway", self._task("pathway", False))
+        graph.add_node("model", self._task("model"), ["pathway"])
+
+        self.assertFalse(graph.run())
+        self.assertNotIn("model", self.executed)
+        statuses = {node.name: node.status for node in graph.nodes}
+        self.assertEqual(statuses["pathway"], TaskStatus.FAILED)
+        self.assertEqual(statuses["model"], TaskStatus.SKIPPED)
+
+    def test_node_exception(self):
+        """Assert an exception in a node fails the run."""
+
+        def fail():
+            raise RuntimeError("Test error")
+
+        graph = TaskGraph(max_workers=2)
+        graph.add_node("pathway", fail)
+        self.assertFalse(graph.run())
+
+    def test_cancelled_graph(self):
+        """Assert no nodes are run when the feedback is cancelled."""
+        feedback = QgsFeedback()
+        feedback.cancel()
+        graph = TaskGraph(max_workers=2, feedback=feedback)
+        graph.add_node("pathway", self._task("pathway"))
+
+        self.assertFalse(graph.run())
+        self.assertEqual(self.executed, [])
+
+    def test_unknown_dependency(self):
+        """Assert dependencies need to be added before their dependents."""
+        graph = TaskGraph()
+        with self.assertRaises(ValueError):
+            graph.add_node("model", self._task("model"), ["pathway"])
+
+    def test_nodes_run_once(self):
+        """Assert running the graph again does not run completed nodes."""
+        graph = TaskGraph(max_workers=2)
+        graph.add_node("pathway", self._task("pathway"), stage="statistics")
+        graph.add_node("model", self._task("model"), ["pathway"], "statistics")
+        graph.add_node("outputs", self._task("outputs"), ["model"], "outputs")
+
+        self.assertTrue(graph.run())
+        self.assertTrue(graph.run())
+        self.assertEqual(self.executed, ["pathway", "model", "outputs"])
+
+        for node in graph.nodes:
+            self.assertEqual(node.status, TaskStatus.COMPLETED)
+            self.assertGreaterEqual(node.duration, 0.0)
+        self.assertEqual(set(graph.stage_timings().keys()), {"statistics", "outputs"})
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the streaming band statistics.
+"""
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from cplus_plugin.lib.analysis.statistics import (
+    BandStatistics,
+    save_statistics_manifest,
+)
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestBandStatistics(TestCase):
+    """Tests for the statistics accumulated from raster blocks."""
+
+    def test_block_statistics(self):
+        """Assert statistics of several blocks match the whole band."""
+        values = np.array([[1.0, 2.0, np.nan], [4.0, 8.0, 9.0]])
+        stats = BandStatistics()
+        for block in values:
+            stats.update(block)
+
+        valid = values[~np.isnan(values)]
+        self.assertEqual(stats.minimum, 1.0)
+        self.assertEqual(stats.maximum, 9.0)
+        self.assertEqual(stats.count, 5)
+        self.assertAlmostEqual(stats.mean, valid.mean())
+        self.assertAlmostEqual(stats.std_dev, valid.std())
+
+    def test_empty_statistics(self):
+        """Assert blocks without valid values do not change the statistics."""
+        stats = BandStatistics()
+        stats.update(np.array([np.nan, np.nan]))
+        self.assertIsNone(stats.minimum)
+        self.assertIsNone(stats.mean)
+
+    def test_statistics_manifest(self):
+        """Assert statistics are saved in the manifest."""
+        stats = BandStatistics()
+        stats.update(np.array([2.0, 4.0]))
+        path = os.path.join(tempfile.mkdtemp(), "raster_statistics.json")
+        save_statistics_manifest(path, {"output.tif": stats})
+
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+        self.assertEqual(BandStatistics.from_dict(manifest["output.tif"]), stats)
+        self.assertEqual(manifest["output.tif"]["mean"], 3.0)
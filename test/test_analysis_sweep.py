@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the scenario parameter sweep.
+"""
+import csv
+import json
+import os
+import tempfile
+import threading
+from unittest import TestCase
+from uuid import UUID
+
+import numpy as np
+
+from qgis.core import QgsFeedback
+
+from cplus_plugin.definitions.constants import RUN_MANIFEST_FILE_NAME
+from cplus_plugin.lib.analysis.sweep import (
+    parameter_combinations,
+    ScenarioSweep,
+)
+from cplus_plugin.models.analysis import AnalysisContext
+from cplus_plugin.models.base import (
+    ImplementationModel,
+    LayerType,
+    NcsPathway,
+    Scenario,
+    SpatialExtent,
+)
+
+from test_analysis_engine import (
+    create_test_raster,
+    MODEL_A_UUID_STR,
+    MODEL_B_UUID_STR,
+    PATHWAY_A_UUID_STR,
+    PATHWAY_B_UUID_STR,
+)
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestAnalysisSweep(TestCase):
+    """Tests for the analysis of a grid of scenario parameters."""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.context_threads = set()
+        columns = np.tile(np.arange(10, dtype=np.float32), (10, 1))
+
+        self.pathway_a_path = os.path.join(self.output_dir, "pathway_a.tif")
+        create_test_raster(self.pathway_a_path, columns)
+
+        self.pathway_b_path = os.path.join(self.output_dir, "pathway_b.tif")
+        create_test_raster(self.pathway_b_path, 9 - columns)
+
+    def _create_context(self, parameters, scenario_directory) -> AnalysisContext:
+        self.context_threads.add(threading.get_ident())
+        models = []
+        for model_uuid, pathway_uuid, path in (
+            (MODEL_A_UUID_STR, PATHWAY_A_UUID_STR, self.pathway_a_path),
+            (MODEL_B_UUID_STR, PATHWAY_B_UUID_STR, self.pathway_b_path),
+        ):
+            pathway = NcsPathway(
+                UUID(pathway_uuid), "Pathway", "", path, LayerType.RASTER, True
+            )
+            models.append(
+                ImplementationModel(
+                    UUID(model_uuid), model_uuid[:4], "", pathways=[pathway]
+                )
+            )
+
+        scenario = Scenario(
+            UUID("6cf5b355-f605-4de5-98b1-64936d473f82"),
+            "Test Scenario",
+            "Test scenario description",
+            SpatialExtent(bbox=[30.0, 31.0, -25.0, -24.0]),
+            models,
+            [],
+        )
+
+        return AnalysisContext(
+            scenario=scenario,
+            scenario_directory=scenario_directory,
+            base_dir=self.output_dir,
+            carbon_coefficient=0.0,
+            suitability_index=parameters["suitability_index"],
+            ordered_model_ids=[MODEL_A_UUID_STR, MODEL_B_UUID_STR],
+            priority_weights={},
+            apply_weighting=False,
+            feedback=QgsFeedback(),
+        )
+
+    def test_parameter_combinations(self):
+        """Assert the grid is expanded into all the combinations."""
+        combinations = parameter_combinations(
+            {
+                "carbon_coefficient": [0.0, 0.1],
+                "priority_groups": {"Biodiversity": [1, 5], "Livelihood": [2]},
+            }
+        )
+        self.assertEqual(len(combinations), 4)
+        self.assertEqual(
+            combinations[1],
+            {
+                "carbon_coefficient": 0.0,
+                "priority_groups": {"Biodiversity": 5, "Livelihood": 2},
+            },
+        )
+
+    def test_sweep(self):
+        """Assert each combination is analyzed in its own directory
+        and the results are saved in the summary.
+        """
+        combinations = parameter_combinations(
+            {"suitability_index": [0.0, 1.0], "priority_groups": {"Group": [1, 2]}}
+        )
+        sweep_dir = os.path.join(self.output_dir, "sweep")
+        sweep = ScenarioSweep(
+            combinations, self._create_context, sweep_dir, max_parallel=2
+        )
+        self.assertTrue(sweep.run())
+        # Contexts are created before the combinations are analyzed
+        self.assertEqual(self.context_threads, {threading.get_ident()})
+
+        self.assertEqual(len(sweep.results), 4)
+        for result in sweep.results:
+            self.assertTrue(result.success)
+            self.assertTrue(result.output.startswith(result.scenario_directory))
+            self.assertEqual(sum(result.pixel_counts.values()), 100)
+
+        with open(sweep.summary_path) as summary_file:
+            rows = list(csv.DictReader(summary_file))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[3]["suitability_index"], "1.0")
+        self.assertEqual(rows[3]["Group"], "2")
+
+    def test_sweep_shares_normalized_models(self):
+        """Assert the combinations that only differ in the priority
+        groups reuse the normalized models of the first combination
+        even when they do not fit in the analysis cache.
+        """
+        combinations = parameter_combinations(
+            {"suitability_index": [0.0, 1.0], "priority_groups": {"Group": [1, 2, 3]}}
+        )
+        sweep_dir = os.path.join(self.output_dir, "sweep")
+        sweep = ScenarioSweep(
+            combinations, self._create_context, sweep_dir, max_parallel=2, cache_size=1
+        )
+        self.assertTrue(sweep.run())
+
+        computed = []
+        for result in sweep.results:
+            with open(
+                os.path.join(result.scenario_directory, RUN_MANIFEST_FILE_NAME)
+            ) as manifest_file:
+                manifest = json.load(manifest_file)
+            models = manifest["implementation_models"].values()
+            if all(model["computed"] for model in models):
+                computed.append(result.parameters["suitability_index"])
+            else:
+                self.assertFalse(any(model["computed"] for model in models))
+                self.assertEqual(manifest["cache"]["reused_models"], 2)
+
+        # Normalized models are only computed once per suitability index
+        self.assertEqual(sorted(computed), [0.0, 1.0])
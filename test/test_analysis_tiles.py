@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the computation of the analysis stages on tiles.
+"""
+from multiprocessing import spawn
+import os
+import pickle
+import subprocess
+import tempfile
+from unittest import TestCase
+from uuid import uuid4
+
+import numpy as np
+from osgeo import gdal, osr
+
+import cplus_plugin
+
+from cplus_plugin.lib.analysis.kernels import (
+    BandStatistics,
+    highest_position,
+    ModelInputs,
+    nan_sum,
+    normalize,
+    PriorityWeight,
+    RasterGrid,
+    TileProcessor,
+)
+from cplus_plugin.lib.analysis.tiles import (
+    grid_tiles,
+    python_executable,
+    SpawnProcessPool,
+)
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestAnalysisTiles(TestCase):
+    """Tests for the tile computations of the analysis engine."""
+
+    def test_normalize(self):
+        """Assert values are rescaled using the band statistics."""
+        stats = BandStatistics()
+        values = np.array([[2.0, 4.0], [6.0, np.nan]])
+        stats.update(values)
+        self.assertEqual(stats.minimum, 2.0)
+        self.assertEqual(stats.maximum, 6.0)
+
+        normalized = normalize(values, stats, 2.0)
+        np.testing.assert_allclose(normalized[0], [0.0, 1.0])
+        self.assertEqual(normalized[1, 0], 2.0)
+        self.assertTrue(np.isnan(normalized[1, 1]))
+
+    def test_nan_sum(self):
+        """Assert the cell sum ignores no data values."""
+        total = nan_sum([np.array([1.0, np.nan, np.nan]), np.array([2.0, 3.0, np.nan])])
+        np.testing.assert_allclose(total[:2], [3.0, 3.0])
+        self.assertTrue(np.isnan(total[2]))
+
+    def test_highest_position(self):
+        """Assert the position of the highest value is returned."""
+        positions = highest_position(
+            [np.array([1.0, 5.0, np.nan]), np.array([2.0, np.nan, np.nan])]
+        )
+        np.testing.assert_array_equal(positions, [1, 0, -1])
+
+    def test_grid_tiles(self):
+        """Assert the tiles cover the grid and are clipped at the edges."""
+        grid = RasterGrid("", (0.0, 1.0, 0.0, 10.0, 0.0, -1.0), 10, 10)
+        tiles = grid_tiles(grid, 4)
+        self.assertEqual(len(tiles), 9)
+        self.assertEqual(tiles[0], (0, 0, 4, 4))
+        self.assertEqual(tiles[-1], (8, 8, 2, 2))
+        self.assertEqual(sum(tile[2] * tile[3] for tile in tiles), 100)
+
+    def test_pickle_processor(self):
+        """Assert the processor can be sent to worker processes."""
+        processor = TileProcessor(
+            grid=RasterGrid("", (0.0, 1.0, 0.0, 10.0, 0.0, -1.0), 10, 10),
+            windows={},
+            base_dir="",
+            carbon_coefficient=0.0,
+            suitability_index=0.0,
+            normalization_index=1.0,
+            apply_weighting=False,
+            priority_weights={},
+            models=[],
+            pathway_stats={},
+            model_stats={},
+            normalized_sources={},
+            weighted_sources={},
+            model_outputs={},
+            normalized_outputs={},
+            scenario_output="",
+            position_values=np.array([1, 2]),
+        )
+        restored = pickle.loads(pickle.dumps(processor))
+        self.assertEqual(restored.grid, processor.grid)
+        np.testing.assert_array_equal(restored.position_values, [1, 2])
+        self.assertFalse(hasattr(restored._local, "datasets"))
+
+    def test_shared_priority_layers(self):
+        """Assert a priority weighting layer shared by the models is read
+        once per tile.
+        """
+        path = os.path.join(tempfile.mkdtemp(), "priority.tif")
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+        ds = gdal.GetDriverByName("GTiff").Create(path, 2, 2, 1, gdal.GDT_Float32)
+        ds.SetGeoTransform((0.0, 1.0, 0.0, 2.0, 0.0, -1.0))
+        ds.SetProjection(srs.ExportToWkt())
+        ds.GetRasterBand(1).WriteArray(np.ones((2, 2), dtype=np.float32))
+        ds = None
+
+        models = [ModelInputs(uuid4(), "") for _ in range(3)]
+        processor = TileProcessor(
+            grid=RasterGrid(srs.ExportToWkt(), (0.0, 1.0, 0.0, 2.0, 0.0, -1.0), 2, 2),
+            windows={},
+            base_dir="",
+            carbon_coefficient=0.0,
+            suitability_index=0.0,
+            normalization_index=1.0,
+            apply_weighting=True,
+            priority_weights={
+                str(model.uuid): [PriorityWeight(path, index + 1.0)]
+                for index, model in enumerate(models)
+            },
+            models=models,
+            pathway_stats={},
+            model_stats={},
+            normalized_sources={},
+            weighted_sources={},
+            model_outputs={},
+            normalized_outputs={},
+            scenario_output="",
+            position_values=np.array([1, 2, 3]),
+        )
+
+        priority_values = {}
+        values = np.zeros((2, 2))
+        for index, model in enumerate(models):
+            weighted = processor.weighted_implementation_model(
+                model, values, (0, 0, 2, 2), priority_values
+            )
+            np.testing.assert_allclose(weighted, index + 1.0)
+        self.assertEqual(list(priority_values), [path])
+        # Four Float32 pixels
+        self.assertEqual(processor._local.bytes_read, 16)
+
+    def test_python_executable(self):
+        """Assert the worker processes use an existing interpreter."""
+        self.assertTrue(os.path.exists(python_executable()))
+
+    def test_spawn_executable_restored(self):
+        """Assert the process pool restores the interpreter of spawned
+        processes when it is shut down.
+        """
+        previous_executable = spawn.get_executable()
+        pool = SpawnProcessPool(python_executable(), max_workers=1)
+        other_pool = SpawnProcessPool(python_executable(), max_workers=1)
+        self.assertEqual(pool.submit(abs, -1).result(), 1)
+        pool.shutdown()
+        # Still used by the pool that is running
+        self.assertEqual(spawn.get_executable(), python_executable())
+        self.assertEqual(other_pool.submit(abs, -2).result(), 2)
+        other_pool.shutdown()
+        self.assertEqual(spawn.get_executable(), previous_executable)
+
+    def test_worker_imports(self):
+        """Assert the worker processes do not need to import QGIS."""
+        code = (
+            "import sys\n"
+            "import cplus_plugin.lib.analysis.kernels\n"
+            "print(any(name.split('.')[0] == 'qgis' for name in sys.modules))"
+        )
+        output = subprocess.run(
+            [python_executable(), "-c", code],
+            capture_output=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(cplus_plugin.__file__)),
+            text=True,
+        ).stdout
+        self.assertEqual(output.strip(), "False")
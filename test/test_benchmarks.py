@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the synthetic benchmark harness.
+"""
+import os
+import tempfile
+from unittest import TestCase
+
+from osgeo import gdal
+
+from benchmarks.harness import compare_to_baseline, run_benchmark
+from benchmarks.synthetic import (
+    create_synthetic_scenario,
+    NODATA_VALUE,
+    SyntheticProfile,
+)
+from cplus_plugin.lib.analysis.kernels import (
+    MODEL_STATISTICS,
+    OUTPUTS,
+    PATHWAY_STATISTICS,
+)
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestBenchmarks(TestCase):
+    """Tests for the synthetic layers and benchmark results."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.profile = SyntheticProfile(
+            size=40, pathways=3, models=2, priority_layers=2, pathways_per_model=2
+        )
+
+    def test_synthetic_scenario(self):
+        """Assert the layers are created and reused with the same UUIDs."""
+        config = create_synthetic_scenario(self.directory, self.profile)
+        models = config["implementation_models"]
+        self.assertEqual(len(models), 2)
+        self.assertEqual(len(models[0]["pathways"]), 2)
+
+        band = gdal.Open(models[0]["pathways"][0]["path"]).GetRasterBand(1)
+        self.assertEqual((band.XSize, band.YSize), (40, 40))
+        self.assertEqual(band.GetNoDataValue(), NODATA_VALUE)
+        self.assertEqual(len(os.listdir(self.directory)), 3 + 3 + 2)
+
+        self.assertEqual(
+            create_synthetic_scenario(self.directory, self.profile), config
+        )
+
+    def test_run_benchmark(self):
+        """Assert the throughput of each stage is reported."""
+        result = run_benchmark(
+            self.profile, self.directory, os.path.join(self.directory, "outputs")
+        )
+        self.assertTrue(result["success"])
+        self.assertEqual(
+            set(result["stages"]), {PATHWAY_STATISTICS, MODEL_STATISTICS, OUTPUTS}
+        )
+        self.assertEqual(result["stages"][PATHWAY_STATISTICS]["pixels"], 3 * 40 * 40)
+        self.assertEqual(result["stages"][OUTPUTS]["pixels"], 40 * 40)
+        self.assertEqual(compare_to_baseline(result, result), [])
+
+    def test_compare_to_baseline(self):
+        """Assert slower stages and higher memory are regressions."""
+        baseline = {
+            "success": True,
+            "stages": {
+                OUTPUTS: {"pixels_per_second": 1000, "peak_rss": 1000},
+                MODEL_STATISTICS: {"pixels_per_second": 1000, "peak_rss": 1000},
+            },
+        }
+        result = {
+            "success": True,
+            "stages": {
+                OUTPUTS: {"pixels_per_second": 900, "peak_rss": 1100},
+                MODEL_STATISTICS: {"pixels_per_second": 500, "peak_rss": 1500},
+            },
+        }
+        regressions = compare_to_baseline(result, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(MODEL_STATISTICS in message for message in regressions))
+
+        result["success"] = False
+        self.assertEqual(len(compare_to_baseline(result, baseline)), 1)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the command line scenario runner.
+"""
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from qgis.PyQt import QtCore
+
+from cplus_plugin.cli import (
+    configure_settings,
+    create_config_scenario,
+    JsonLinesReporter,
+    load_scenario_config,
+    run_scenario,
+    ScenarioConfigError,
+)
+from cplus_plugin.conf import settings_manager, Settings
+
+from test_analysis_engine import (
+    create_test_raster,
+    MODEL_A_UUID_STR,
+    PATHWAY_A_UUID_STR,
+)
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestCli(TestCase):
+    """Tests for running scenarios from a configuration file."""
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.pathway_path = os.path.join(self.output_dir, "pathway.tif")
+        create_test_raster(
+            self.pathway_path, np.tile(np.arange(10, dtype=np.float32), (10, 1))
+        )
+        self.config = {
+            "name": "Test Scenario",
+            "description": "Test scenario description",
+            "extent": [30.0, 31.0, -25.0, -24.0],
+            "implementation_models": [
+                {
+                    "uuid": MODEL_A_UUID_STR,
+                    "name": "Model",
+                    "pathways": [
+                        {
+                            "uuid": PATHWAY_A_UUID_STR,
+                            "name": "Pathway",
+                            "path": self.pathway_path,
+                            "layer_type": 0,
+                        }
+                    ],
+                }
+            ],
+            "output_directory": os.path.join(self.output_dir, "scenario"),
+        }
+
+    def test_load_invalid_config(self):
+        """Assert invalid scenario files are reported."""
+        config_path = os.path.join(self.output_dir, "scenario.json")
+        with open(config_path, "w") as config_file:
+            config_file.write("[]")
+
+        with self.assertRaises(ScenarioConfigError):
+            load_scenario_config(config_path)
+
+        with self.assertRaises(ScenarioConfigError):
+            load_scenario_config(os.path.join(self.output_dir, "missing.json"))
+
+    def test_create_config_scenario(self):
+        """Assert the scenario models are created from the configuration."""
+        scenario = create_config_scenario(self.config)
+        self.assertEqual(scenario.name, "Test Scenario")
+        self.assertEqual(len(scenario.models), 1)
+        self.assertEqual(len(scenario.models[0].pathways), 1)
+
+        self.config["extent"] = [30.0, 31.0]
+        with self.assertRaises(ScenarioConfigError):
+            create_config_scenario(self.config)
+
+    def test_malformed_config(self):
+        """Assert malformed values are reported as configuration errors."""
+        stream = io.StringIO()
+        self.config["extent"] = [30.0, "east", -25.0, -24.0]
+        with self.assertRaises(ScenarioConfigError):
+            run_scenario(self.config, JsonLinesReporter(stream))
+
+        self.config["extent"] = [30.0, 31.0, -25.0, -24.0]
+        self.config["suitability_index"] = "high"
+        with self.assertRaises(ScenarioConfigError):
+            run_scenario(self.config, JsonLinesReporter(stream))
+
+        # Priority group values of a model defined in the settings
+        del self.config["suitability_index"]
+        pathway = dict(self.config["implementation_models"][0]["pathways"][0])
+        pathway["description"] = "Test pathway"
+        settings_manager.save_ncs_pathway(pathway)
+        settings_manager.save_implementation_model(
+            {
+                "uuid": MODEL_A_UUID_STR,
+                "name": "Model",
+                "description": "Test model",
+                "pathways": [PATHWAY_A_UUID_STR],
+            }
+        )
+        try:
+            self.config["implementation_models"] = [MODEL_A_UUID_STR]
+            for group_values in ({"Biodiversity": "high"}, ["Biodiversity"]):
+                self.config["priority_groups"] = group_values
+                with self.assertRaises(ScenarioConfigError):
+                    run_scenario(self.config, JsonLinesReporter(stream))
+        finally:
+            settings_manager.remove_implementation_model(MODEL_A_UUID_STR)
+            settings_manager.remove_ncs_pathway(PATHWAY_A_UUID_STR)
+
+    def test_run_scenario(self):
+        """Assert the scenario is run and the events are reported."""
+        stream = io.StringIO()
+        self.assertTrue(run_scenario(self.config, JsonLinesReporter(stream)))
+
+        events = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(events[0]["event"], "started")
+        finished = events[-1]
+        self.assertEqual(finished["event"], "finished")
+        self.assertTrue(finished["success"])
+        self.assertTrue(os.path.exists(finished["output"]))
+        self.assertIn("analysis", finished["timings"])
+        self.assertIn("outputs", finished["stage_timings"])
+
+        progress = [
+            event["progress"] for event in events if event["event"] == "progress"
+        ]
+        self.assertEqual(progress, sorted(progress))
+
+    def test_profile_settings(self):
+        """Assert the plugin settings are read from the QGIS profile."""
+        organization = QtCore.QCoreApplication.organizationName()
+        application = QtCore.QCoreApplication.applicationName()
+        default_format = QtCore.QSettings.defaultFormat()
+        settings_path = os.path.dirname(
+            os.path.dirname(
+                QtCore.QSettings(
+                    QtCore.QSettings.IniFormat,
+                    QtCore.QSettings.UserScope,
+                    organization,
+                    application,
+                ).fileName()
+            )
+        )
+
+        profile_dir = os.path.join(self.output_dir, "profile")
+        os.makedirs(os.path.join(profile_dir, "QGIS"))
+        base_dir = os.path.join(self.output_dir, "profile_base_dir")
+        with open(os.path.join(profile_dir, "QGIS", "QGIS3.ini"), "w") as ini_file:
+            ini_file.write(f"[cplus_plugin]\nadvanced\\base_dir={base_dir}\n")
+
+        try:
+            configure_settings(profile_dir)
+            self.assertEqual(settings_manager.get_value(Settings.BASE_DIR), base_dir)
+        finally:
+            QtCore.QCoreApplication.setOrganizationName(organization)
+            QtCore.QCoreApplication.setApplicationName(application)
+            QtCore.QSettings.setDefaultFormat(default_format)
+            QtCore.QSettings.setPath(
+                QtCore.QSettings.IniFormat, QtCore.QSettings.UserScope, settings_path
+            )
+            settings_manager.reload_settings()
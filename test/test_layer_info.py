@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the layer validity and metadata cache.
+"""
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+import zipfile
+
+from cplus_plugin.lib.layer_info import LayerInfoCache
+
+from utilities_for_testing import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+TEST_RASTER = os.path.join(os.path.dirname(__file__), "tenbytenraster.tif")
+
+
+class TestLayerInfoCache(TestCase):
+    """Tests for caching the validity and metadata of layers."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "layer.tif")
+        shutil.copy(TEST_RASTER, self.path)
+
+    def test_raster_info(self):
+        """Assert the metadata of a valid raster is read."""
+        info = LayerInfoCache().get(self.path)
+        self.assertTrue(info.valid)
+        self.assertEqual(info.band_count, 1)
+        self.assertEqual(len(info.extent), 4)
+        self.assertGreater(info.resolution[0], 0)
+        self.assertIsNotNone(info.data_type)
+        self.assertTrue(info.crs_wkt)
+
+    def test_cached_until_changed(self):
+        """Assert the details are reused until the file changes."""
+        cache = LayerInfoCache()
+        info = cache.get(self.path)
+        self.assertIs(cache.get(self.path), info)
+        self.assertEqual(len(cache), 1)
+
+        with open(self.path, "w") as layer_file:
+            layer_file.write("Not a raster")
+        self.assertFalse(cache.get(self.path).valid)
+        self.assertEqual(len(cache), 1)
+
+        cache.invalidate(self.path)
+        self.assertEqual(len(cache), 0)
+
+    def test_missing_layer(self):
+        """Assert missing layers are invalid and not cached."""
+        cache = LayerInfoCache()
+        self.assertFalse(cache.get(os.path.join(self.directory, "none.tif")).valid)
+        self.assertFalse(cache.get("").valid)
+        self.assertEqual(len(cache), 0)
+
+    def test_virtual_file_layer(self):
+        """Assert layers that are not local files are read without
+        being cached.
+        """
+        zip_path = os.path.join(self.directory, "layer.zip")
+        with zipfile.ZipFile(zip_path, "w") as zip_file:
+            zip_file.write(self.path, "layer.tif")
+
+        cache = LayerInfoCache()
+        self.assertTrue(cache.get(f"/vsizip/{zip_path}/layer.tif").valid)
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        """Assert the least recently used layers are removed."""
+        cache = LayerInfoCache(max_entries=1)
+        other_path = os.path.join(self.directory, "other.tif")
+        shutil.copy(TEST_RASTER, other_path)
+        cache.get(self.path)
+        cache.get(other_path)
+        self.assertEqual(len(cache), 1)
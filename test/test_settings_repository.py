@@ -0,0 +1,215 @@
+# coding=utf-8
+"""Tests for the in-memory settings repository.
+
+"""
+
+import unittest
+import uuid
+
+from utilities_for_testing import get_qgis_app
+
+from cplus_plugin.conf import settings_manager, SettingsRepository
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class SettingsRepositoryTest(unittest.TestCase):
+    """Test the indexing of the settings collections."""
+
+    def setUp(self):
+        self.loads = 0
+        self.repository = SettingsRepository()
+
+    def load_layers(self):
+        self.loads += 1
+        return {
+            "b": {"uuid": "b", "name": "Layer", "groups": [{"name": "Biodiversity"}]},
+            "a": {"uuid": "a", "name": "Layer", "groups": [{"name": "Carbon"}]},
+            "c": {"uuid": "c", "name": "Other", "groups": []},
+        }
+
+    def test_collection_loaded_once(self):
+        """Lookups only read the collection the first time it is used."""
+        self.assertEqual(
+            self.repository.get("layers", self.load_layers, "c")["name"], "Other"
+        )
+        self.assertEqual(len(self.repository.values("layers", self.load_layers)), 3)
+        self.assertEqual(
+            self.repository.key_by_name("layers", self.load_layers, "Layer"), "a"
+        )
+        self.assertEqual(self.loads, 1)
+
+    def test_indexes_follow_writes(self):
+        """Name and group indexes are updated when items are saved or removed."""
+        self.assertEqual(
+            self.repository.keys_by_group("layers", self.load_layers, "Carbon"), ["a"]
+        )
+        version = self.repository.version("layers")
+
+        self.repository.put(
+            "layers", "d", {"uuid": "d", "name": "New", "groups": [{"name": "Carbon"}]}
+        )
+        self.repository.remove("layers", "a")
+
+        self.assertEqual(
+            self.repository.keys_by_group("layers", self.load_layers, "Carbon"), ["d"]
+        )
+        self.assertEqual(
+            self.repository.key_by_name("layers", self.load_layers, "Layer"), "b"
+        )
+        self.assertEqual(
+            self.repository.key_by_name("layers", self.load_layers, "New"), "d"
+        )
+        self.assertEqual(self.repository.version("layers"), version + 2)
+        self.assertEqual(self.loads, 1)
+
+    def test_copies_returned(self):
+        """Changing a returned item does not change the repository."""
+        item = self.repository.get("layers", self.load_layers, "c")
+        item["name"] = "Changed"
+
+        self.assertEqual(
+            self.repository.get("layers", self.load_layers, "c")["name"], "Other"
+        )
+
+    def test_clear(self):
+        """Cleared collections are read again when next used."""
+        self.repository.values("layers", self.load_layers)
+        self.repository.clear("layers")
+        self.repository.values("layers", self.load_layers)
+
+        self.assertEqual(self.loads, 2)
+
+    def test_snapshot_versions(self):
+        """Snapshots are only created again when their collections change."""
+        created = []
+
+        def create_names():
+            created.append(True)
+            return [
+                item["name"]
+                for item in self.repository.values("layers", self.load_layers)
+            ]
+
+        snapshot = self.repository.snapshot("names", ["layers"], create_names)
+        self.assertEqual(snapshot.items, ("Layer", "Layer", "Other"))
+        self.assertIs(
+            self.repository.snapshot("names", ["layers"], create_names), snapshot
+        )
+
+        self.repository.put("groups", "g", {"uuid": "g", "name": "Group"})
+        self.assertIs(
+            self.repository.snapshot("names", ["layers"], create_names), snapshot
+        )
+
+        self.repository.remove("layers", "c")
+        updated_snapshot = self.repository.snapshot("names", ["layers"], create_names)
+        self.assertEqual(updated_snapshot.items, ("Layer", "Layer"))
+        self.assertNotEqual(updated_snapshot.version, snapshot.version)
+        self.assertEqual(len(created), 2)
+
+
+class SettingsManagerRepositoryTest(unittest.TestCase):
+    """Test the settings manager lookups after writes."""
+
+    def test_priority_layer_lookups(self):
+        """Priority layers are found by name and group after being saved."""
+        layer = {
+            "uuid": str(uuid.uuid4()),
+            "name": "Repository test layer",
+            "description": "Layer description",
+            "path": "",
+            "selected": False,
+            "groups": [{"name": "Repository test group", "value": "3"}],
+        }
+        settings_manager.save_priority_layer(layer)
+
+        found_layer = settings_manager.find_layer_by_name(layer["name"])
+        self.assertEqual(found_layer["uuid"], layer["uuid"])
+        group_layers = settings_manager.find_layers_by_group("Repository test group")
+        self.assertEqual([item["uuid"] for item in group_layers], [layer["uuid"]])
+
+        layer["groups"] = []
+        settings_manager.save_priority_layer(layer)
+        self.assertEqual(
+            settings_manager.find_layers_by_group("Repository test group"), []
+        )
+
+        settings_manager.delete_priority_layer(layer["uuid"])
+        self.assertIsNone(settings_manager.find_layer_by_name(layer["name"]))
+        self.assertIsNone(
+            settings_manager.get_priority_layer(layer["uuid"]).get("name")
+        )
+
+    def test_ncs_pathway_lookups(self):
+        """NCS pathways are found after being saved and not after removal."""
+        ncs_uuid = str(uuid.uuid4())
+        settings_manager.save_ncs_pathway(
+            {
+                "uuid": ncs_uuid,
+                "name": "Repository test pathway",
+                "description": "Pathway description",
+                "path": "",
+                "layer_type": 0,
+                "user_defined": True,
+                "carbon_paths": [],
+            }
+        )
+        self.assertEqual(
+            settings_manager.get_ncs_pathway_dict(ncs_uuid)["name"],
+            "Repository test pathway",
+        )
+
+        settings_manager.remove_ncs_pathway(ncs_uuid)
+        self.assertEqual(settings_manager.get_ncs_pathway_dict(ncs_uuid), {})
+        self.assertIsNone(settings_manager.get_ncs_pathway(ncs_uuid))
+
+    def test_ncs_pathways_snapshot(self):
+        """NCS pathway objects are shared until a pathway is saved and
+        invalid entries are skipped when loading all the pathways."""
+        ncs_uuid = str(uuid.uuid4())
+        invalid_uuid = str(uuid.uuid4())
+        ncs_pathway = {
+            "uuid": ncs_uuid,
+            "name": "Snapshot test pathway",
+            "description": "Pathway description",
+            "path": "",
+            "layer_type": 0,
+            "user_defined": True,
+            "carbon_paths": [],
+        }
+        settings_manager.save_ncs_pathway(ncs_pathway)
+        settings_manager.set_value(
+            f"{settings_manager.NCS_PATHWAY_BASE}/{invalid_uuid}", "{invalid"
+        )
+
+        snapshot = settings_manager.get_ncs_pathways_snapshot()
+        uuids = [str(ncs.uuid) for ncs in snapshot.items]
+        self.assertIn(ncs_uuid, uuids)
+        self.assertNotIn(invalid_uuid, uuids)
+        self.assertIs(settings_manager.get_ncs_pathways_snapshot(), snapshot)
+
+        # Editable copies do not change the snapshot
+        pathways = settings_manager.get_all_ncs_pathways()
+        for ncs in pathways:
+            ncs.name = "Changed"
+        self.assertIn(
+            "Snapshot test pathway",
+            [ncs.name for ncs in settings_manager.get_ncs_pathways_snapshot().items],
+        )
+
+        ncs_pathway["name"] = "Renamed snapshot test pathway"
+        settings_manager.save_ncs_pathway(ncs_pathway)
+        updated_snapshot = settings_manager.get_ncs_pathways_snapshot()
+        self.assertIsNot(updated_snapshot, snapshot)
+        self.assertIn(
+            "Renamed snapshot test pathway",
+            [ncs.name for ncs in updated_snapshot.items],
+        )
+
+        settings_manager.remove_ncs_pathway(ncs_uuid)
+        settings_manager.remove(f"{settings_manager.NCS_PATHWAY_BASE}/{invalid_uuid}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+# coding=utf-8
+"""Tests for the settings manager transactions.
+
+"""
+
+import unittest
+import uuid
+
+from utilities_for_testing import get_qgis_app
+
+from qgis.core import QgsSettings
+
+from cplus_plugin.conf import settings_manager
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+def stored_value(name):
+    """Reads a plugin setting without the settings manager."""
+    return QgsSettings().value(f"{settings_manager.BASE_GROUP_NAME}/{name}")
+
+
+class SettingsTransactionTest(unittest.TestCase):
+    """Test the buffering of the settings written in a transaction."""
+
+    def setUp(self):
+        self.changes = []
+        settings_manager.settings_changed.connect(self.changes.append)
+
+    def tearDown(self):
+        settings_manager.settings_changed.disconnect(self.changes.append)
+        settings_manager.remove("transaction_test")
+
+    def test_writes_buffered(self):
+        """Values are read back in the transaction and saved once at the end."""
+        settings_manager.set_value("transaction_test/first", "old")
+        self.changes.clear()
+
+        with settings_manager.transaction():
+            settings_manager.set_value("transaction_test/first", "new")
+            settings_manager.set_value("transaction_test/second", "value")
+            settings_manager.set_value("transaction_test/first", "newest")
+
+            self.assertEqual(
+                settings_manager.get_value("transaction_test/first"), "newest"
+            )
+            self.assertEqual(stored_value("transaction_test/first"), "old")
+            self.assertEqual(self.changes, [])
+
+        self.assertEqual(stored_value("transaction_test/first"), "newest")
+        self.assertEqual(stored_value("transaction_test/second"), "value")
+        self.assertEqual(
+            self.changes,
+            [{"transaction_test/first": "newest", "transaction_test/second": "value"}],
+        )
+
+    def test_updated_signal_coalesced(self):
+        """settings_updated is emitted once per setting at the end."""
+        updates = []
+
+        def on_settings_updated(name, value):
+            updates.append((name, value))
+
+        settings_manager.settings_updated.connect(on_settings_updated)
+        try:
+            with settings_manager.transaction():
+                settings_manager.set_value("transaction_test/first", "new")
+                settings_manager.set_value("transaction_test/second", "value")
+                settings_manager.set_value("transaction_test/first", "newest")
+                self.assertEqual(updates, [])
+        finally:
+            settings_manager.settings_updated.disconnect(on_settings_updated)
+
+        self.assertEqual(
+            updates,
+            [
+                ("transaction_test/first", "newest"),
+                ("transaction_test/second", "value"),
+            ],
+        )
+
+    def test_nested_transactions(self):
+        """Only the outermost transaction saves the values."""
+        with settings_manager.transaction():
+            with settings_manager.transaction():
+                settings_manager.set_value("transaction_test/nested", "value")
+            self.assertIsNone(stored_value("transaction_test/nested"))
+
+        self.assertEqual(stored_value("transaction_test/nested"), "value")
+        self.assertEqual(len(self.changes), 1)
+
+    def test_removal_buffered(self):
+        """Removed settings are not read back in the transaction."""
+        settings_manager.set_value("transaction_test/removed", "value")
+
+        with settings_manager.transaction():
+            settings_manager.remove("transaction_test")
+            self.assertIsNone(settings_manager.get_value("transaction_test/removed"))
+            self.assertEqual(stored_value("transaction_test/removed"), "value")
+
+        self.assertIsNone(stored_value("transaction_test/removed"))
+
+    def test_rollback(self):
+        """Values are discarded when the transaction raises an exception."""
+        with self.assertRaises(RuntimeError):
+            with settings_manager.transaction():
+                settings_manager.set_value("transaction_test/rollback", "value")
+                raise RuntimeError("Transaction failed")
+
+        self.assertIsNone(settings_manager.get_value("transaction_test/rollback"))
+        self.assertIsNone(stored_value("transaction_test/rollback"))
+        self.assertEqual(self.changes, [])
+
+    def test_ncs_pathways_buffered(self):
+        """NCS pathways saved in a transaction are read back and saved once."""
+        ncs_uuid = str(uuid.uuid4())
+        with settings_manager.transaction():
+            settings_manager.save_ncs_pathway(
+                {
+                    "uuid": ncs_uuid,
+                    "name": "Transaction test pathway",
+                    "description": "Pathway description",
+                    "path": "",
+                    "layer_type": 0,
+                    "user_defined": True,
+                    "carbon_paths": [],
+                }
+            )
+            self.assertIsNotNone(settings_manager.get_ncs_pathway(ncs_uuid))
+            self.assertIsNone(
+                stored_value(f"{settings_manager.NCS_PATHWAY_BASE}/{ncs_uuid}")
+            )
+
+        self.assertIsNotNone(
+            stored_value(f"{settings_manager.NCS_PATHWAY_BASE}/{ncs_uuid}")
+        )
+        settings_manager.remove_ncs_pathway(ncs_uuid)
+        self.assertIsNone(settings_manager.get_ncs_pathway(ncs_uuid))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+# coding=utf-8
+"""Tests for the plugin startup initialization.
+
+"""
+
+import unittest
+
+from utilities_for_testing import get_qgis_app
+
+from cplus_plugin.conf import settings_manager, Settings
+from cplus_plugin.definitions.constants import UUID_ATTRIBUTE
+from cplus_plugin.definitions.defaults import DEFAULT_NCS_PATHWAYS
+from cplus_plugin.main import initialize_model_settings, model_settings_hash
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class StartupInitializationTest(unittest.TestCase):
+    """Test the model settings initialization at startup."""
+
+    def test_model_settings_hash(self):
+        """The hash depends on the base directory."""
+        self.assertEqual(model_settings_hash("/data"), model_settings_hash("/data"))
+        self.assertNotEqual(model_settings_hash("/data"), model_settings_hash("/other"))
+
+    def test_initialization_skipped(self):
+        """Model settings are only initialized again when they change."""
+        settings_manager.remove(Settings.MODEL_SETTINGS_HASH)
+        defaults_hash = model_settings_hash(
+            settings_manager.get_value(Settings.BASE_DIR)
+        )
+
+        self.assertTrue(initialize_model_settings())
+        self.assertFalse(initialize_model_settings())
+        # The defaults are not changed by the initialization
+        self.assertEqual(
+            model_settings_hash(settings_manager.get_value(Settings.BASE_DIR)),
+            defaults_hash,
+        )
+
+        # Removed default pathways are added again
+        ncs_uuid = DEFAULT_NCS_PATHWAYS[0][UUID_ATTRIBUTE]
+        settings_manager.remove_ncs_pathway(ncs_uuid)
+        self.assertTrue(initialize_model_settings())
+        self.assertIsNotNone(settings_manager.get_ncs_pathway(ncs_uuid))
+
+
+if __name__ == "__main__":
+    unittest.main()